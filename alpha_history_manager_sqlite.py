@@ -5,6 +5,8 @@ import json
 import os
 from datetime import datetime
 
+from telemetry import timed
+
 
 class AlphaHistoryManagerSQLite:
     def __init__(self, db_file="alpha_history.db"):
@@ -33,6 +35,7 @@ class AlphaHistoryManagerSQLite:
         except Exception as e:
             print(f"❌ 初始化数据库时出错: {str(e)}")
             
+    @timed('db.alpha_history.add_alpha_result')
     def add_alpha_result(self, alpha_result):
         """添加 Alpha 测试结果到历史记录"""
         try:
@@ -65,6 +68,7 @@ class AlphaHistoryManagerSQLite:
         except Exception as e:
             print(f"❌ 保存历史记录时出错: {str(e)}")
             
+    @timed('db.alpha_history.get_history')
     def get_history(self, limit=None):
         """获取历史记录"""
         try:
@@ -104,6 +108,7 @@ class AlphaHistoryManagerSQLite:
             print(f"❌ 获取历史记录时出错: {str(e)}")
             return []
             
+    @timed('db.alpha_history.get_successful_alphas')
     def get_successful_alphas(self, limit=None):
         """获取成功的 Alpha 记录"""
         try:
@@ -145,6 +150,7 @@ class AlphaHistoryManagerSQLite:
             print(f"❌ 获取成功Alpha记录时出错: {str(e)}")
             return []
             
+    @timed('db.alpha_history.get_failed_alphas')
     def get_failed_alphas(self, limit=None):
         """获取失败的 Alpha 记录"""
         try:
@@ -186,6 +192,7 @@ class AlphaHistoryManagerSQLite:
             print(f"❌ 获取失败Alpha记录时出错: {str(e)}")
             return []
             
+    @timed('db.alpha_history.clear_history')
     def clear_history(self):
         """清空历史记录"""
         try:
@@ -197,6 +204,7 @@ class AlphaHistoryManagerSQLite:
         except Exception as e:
             print(f"❌ 清空历史记录时出错: {str(e)}")
             
+    @timed('db.alpha_history.get_statistics')
     def get_statistics(self):
         """获取统计信息"""
         try:
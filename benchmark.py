@@ -0,0 +1,182 @@
+"""端到端吞吐量基准测试 - 在本地模拟 Brain API 上驱动 BrainBatchAlpha"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+from brain_batch_alpha import BrainBatchAlpha
+from mock_brain_server import MockBrainServer
+
+
+def classify_request(method, path):
+    """把请求归类到模拟生命周期的某个阶段"""
+
+    if path.startswith('/authentication'):
+        return 'authentication'
+    if path.startswith('/data-fields'):
+        return 'datafields'
+    if path.endswith('/submit'):
+        return 'submit_post' if method == 'POST' else 'submit_poll'
+    if path.startswith('/simulations'):
+        return 'simulation_post' if method == 'POST' else 'simulation_poll'
+    if path.startswith('/alphas/'):
+        return 'alpha_detail'
+    return 'other'
+
+
+def percentile(values, pct):
+    """计算百分位数(最近秩法)"""
+
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class RequestRecorder:
+    """通过 requests 的响应钩子记录每个请求的阶段和耗时"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.latencies = defaultdict(list)
+        self.status_counts = defaultdict(int)
+
+    def __call__(self, response, *args, **kwargs):
+        path = response.request.path_url.split('?')[0]
+        phase = classify_request(response.request.method, path)
+        self.latencies[phase].append(response.elapsed.total_seconds())
+        self.status_counts[response.status_code] += 1
+        return response
+
+    @property
+    def busy_time(self):
+        return sum(sum(values) for values in self.latencies.values())
+
+
+def run_benchmark(server_config, concurrency=3, strategy_mode=1, dataset_name='mixed_pv_fund',
+                  use_multi_simulation=False, submit_count=5, quiet=True, use_screening=False):
+    """运行一次基准测试并返回报告字典"""
+
+    with MockBrainServer(**server_config) as server, tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            with open('brain_credentials.txt', 'w') as f:
+                json.dump(['bench@example.com', 'password'], f)
+
+            client_class = type('BenchmarkBrainBatchAlpha', (BrainBatchAlpha,), {
+                'API_BASE_URL': server.url,
+                'MAX_CONCURRENT_SIMULATIONS': max(concurrency, BrainBatchAlpha.MAX_CONCURRENT_SIMULATIONS),
+            })
+            output = io.StringIO() if quiet else None
+            with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+                brain = client_class(max_concurrent_simulations=concurrency, session_file='brain_session.json')
+                recorder = RequestRecorder(server.url)
+                brain.session.hooks['response'].append(recorder)
+
+                start = time.perf_counter()
+                results = brain.simulate_alphas(None, strategy_mode, dataset_name, [],
+                                                use_screening=use_screening,
+                                                use_multi_simulation=use_multi_simulation)
+                simulate_elapsed = time.perf_counter() - start
+
+                alpha_ids = [result['alpha_id'] for result in results][:submit_count]
+                submit_start = time.perf_counter()
+                successful, failed = brain.submit_multiple_alphas(alpha_ids) if alpha_ids else ([], [])
+                submit_elapsed = time.perf_counter() - submit_start
+                wall = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    phases = {
+        phase: {
+            'count': len(values),
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+        }
+        for phase, values in sorted(recorder.latencies.items())
+    }
+
+    return {
+        'simulations_completed': len(results),
+        'simulate_seconds': simulate_elapsed,
+        'submit_seconds': submit_elapsed,
+        'wall_seconds': wall,
+        'simulations_per_hour': len(results) / simulate_elapsed * 3600 if simulate_elapsed > 0 else 0.0,
+        'submitted': len(successful),
+        'rejected': len(failed),
+        'requests': sum(phase['count'] for phase in phases.values()),
+        'idle_seconds': max(0.0, wall - recorder.busy_time),
+        'idle_ratio': max(0.0, wall - recorder.busy_time) / wall if wall > 0 else 0.0,
+        'status_counts': dict(recorder.status_counts),
+        'phases': phases,
+    }
+
+
+def print_report(report):
+    """打印基准测试报告"""
+
+    print("\n📊 基准测试结果:")
+    print(f"  完成模拟: {report['simulations_completed']} (耗时 {report['simulate_seconds']:.1f} 秒)")
+    print(f"  吞吐量: {report['simulations_per_hour']:.0f} 个模拟/小时")
+    print(f"  提交: 成功 {report['submitted']} / 拒绝 {report['rejected']} (耗时 {report['submit_seconds']:.1f} 秒)")
+    print(f"  请求总数: {report['requests']}  状态码: {report['status_counts']}")
+    print(f"  空闲时间: {report['idle_seconds']:.1f} 秒 ({report['idle_ratio'] * 100:.0f}%)")
+    print("\n⏱️ 各阶段请求延迟:")
+    for phase, stats in report['phases'].items():
+        print(f"  {phase:<16} n={stats['count']:<5} p50={stats['p50'] * 1000:7.1f}ms  p95={stats['p95'] * 1000:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在本地模拟 Brain API 上运行吞吐量基准测试")
+    parser.add_argument('--concurrency', type=int, default=3, help="客户端并发模拟数")
+    parser.add_argument('--queue-depth', type=int, default=3, help="服务端允许的并发模拟数")
+    parser.add_argument('--sim-time', type=float, nargs=2, default=(2.0, 5.0), metavar=('MIN', 'MAX'),
+                        help="单个模拟耗时范围(秒)")
+    parser.add_argument('--latency', type=float, default=0.02, help="每个请求的服务端延迟(秒)")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="随机 429 概率")
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help="随机 5xx 概率")
+    parser.add_argument('--fields', type=int, default=120, help="数据字段数量")
+    parser.add_argument('--strategy-mode', type=int, default=1, help="策略模式 (1-10)")
+    parser.add_argument('--dataset', default='mixed_pv_fund', help="数据集名称")
+    parser.add_argument('--multi', action='store_true', help="使用多模拟模式")
+    parser.add_argument('--screening', action='store_true', help="启用多保真度分阶段筛选")
+    parser.add_argument('--submit', type=int, default=5, help="提交的 Alpha 数量")
+    parser.add_argument('--session-ttl', type=float, default=None, help="会话有效秒数(测试过期重新认证)")
+    parser.add_argument('--seed', type=int, default=None, help="随机种子")
+    parser.add_argument('--json', action='store_true', help="以 JSON 输出报告")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        {
+            'simulation_time': tuple(args.sim_time),
+            'response_latency': args.latency,
+            'max_concurrent': args.queue_depth,
+            'rate_429': args.rate_429,
+            'rate_5xx': args.rate_5xx,
+            'field_count': args.fields,
+            'session_ttl': args.session_ttl,
+            'seed': args.seed,
+        },
+        concurrency=args.concurrency,
+        strategy_mode=args.strategy_mode,
+        dataset_name=args.dataset,
+        use_multi_simulation=args.multi,
+        submit_count=args.submit,
+        use_screening=args.screening,
+    )
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
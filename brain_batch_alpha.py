@@ -1,59 +1,235 @@
 """WorldQuant Brain API 批量处理模块"""
 
+import itertools
 import json
 import os
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from os.path import expanduser
-from time import sleep
+from time import perf_counter
 
 import pandas as pd
-import requests
 from requests.auth import HTTPBasicAuth
 
 from alpha_strategy import AlphaStrategy
 from optimized_alpha_strategy import OptimizedAlphaStrategy
 from alpha_history_manager_sqlite import AlphaHistoryManagerSQLite
+from budget_allocator import SETTINGS_VARIANTS, BudgetAllocator
 from dataset_config import get_dataset_config
+from datafield_catalog import DatafieldCatalog
+from expression_validator import ExpressionValidator
+from fastexpr import iter_unique_expressions
+from genetic_search import GeneticSearch
+from offline_evaluator import OfflineEvaluator
+from pnl_store import PnlStore
+from progress_scheduler import ProgressScheduler
+from qualification import QualificationScorer
+from rate_limiter import GovernedSession, classify_endpoint
+from session_store import SessionStore
+from screening import ScreeningStore, get_schedule, pool_size, promote
+from self_correlation import SelfCorrelationEngine
+from simulation_cache import SimulationCache
+from simulation_journal import SimulationJournal
+from submission_queue import SubmissionQueue
+from surrogate_model import SurrogateModel
+from telemetry import telemetry, timed
 
 
 class BrainBatchAlpha:
     API_BASE_URL = 'https://api.worldquantbrain.com'
-
-    def __init__(self, credentials_file='brain_credentials.txt'):
-        """初始化 API 客户端"""
-
-        self.session = requests.Session()
+    # 平台允许的单用户最大并发模拟数
+    MAX_CONCURRENT_SIMULATIONS = 3
+    # 模拟请求遇到 429 时的最大重试次数
+    MAX_POST_ATTEMPTS = 10
+    # 模拟请求遇到 5xx 时的最大重试次数，以及指数退避的初始与最长等待时间(秒)
+    MAX_POST_SERVER_ERRORS = 4
+    POST_SERVER_ERROR_BACKOFF = 2.0
+    POST_SERVER_ERROR_MAX_DELAY = 30.0
+    # 单个多模拟请求最多包含的表达式数量(平台限制)
+    MULTI_SIMULATION_LIMIT = 10
+    # 数据字段分页大小与并发获取线程数
+    DATAFIELD_PAGE_SIZE = 50
+    DATAFIELD_FETCH_WORKERS = 4
+    # 每轮最多生成的(去重后)表达式数量
+    MAX_STRATEGIES_PER_ROUND = 50
+    # 自适应分配模式: 用 Thompson 采样在模板族 × 数据集 × 设置之间分配每轮名额
+    ADAPTIVE_MODE = 9
+    # 遗传编程模式: 以历史表达式为种群进化新的候选
+    GENETIC_MODE = 10
+    # 遗传编程从历史记录中读取的最大种群来源数量
+    GENETIC_HISTORY_LIMIT = 1000
+    # 默认模拟设置
+    DEFAULT_SIMULATION_SETTINGS = {
+        'instrumentType': 'EQUITY',
+        'region': 'USA',
+        'universe': 'TOP3000',
+        'delay': 1,
+        'decay': 0,
+        'neutralization': 'SUBINDUSTRY',
+        'truncation': 0.08,
+        'pasteurization': 'ON',
+        'unitHandling': 'VERIFY',
+        'nanHandling': 'ON',
+        'language': 'FASTEXPR',
+        'visualization': False,
+    }
+    # 分阶段筛选使用的方案(见 screening.SCREENING_SCHEDULES)
+    SCREENING_SCHEDULE = 'default'
+    # 离线预筛选保留的最低离线 Sharpe
+    OFFLINE_MIN_SHARPE = 0.0
+    # 代理模型的训练样本达到该数量后才用于排序和跳过候选
+    SURROGATE_MIN_HISTORY = 50
+    # 代理模型可用时每轮生成的候选数是模拟数量的倍数，按预测排序后只模拟前面的部分
+    SURROGATE_POOL_FACTOR = 4
+    # 代理模型排序的探索系数: 预测 Sharpe 均值 + 系数 × 标准差
+    SURROGATE_EXPLORATION = 1.0
+    # 预测 Sharpe 的乐观上界(均值 + 2 × 标准差)仍低于该值的候选直接跳过
+    SURROGATE_SKIP_SHARPE = 0.5
+    # 提交请求的最大尝试次数
+    MAX_SUBMIT_ATTEMPTS = 5
+    # 同时进行的提交数量上限
+    MAX_CONCURRENT_SUBMISSIONS = 4
+    # 提交状态中不表示平台明确拒绝的 4xx(会话过期、超时、限流)，按暂时性失败处理
+    SUBMIT_TRANSIENT_STATUSES = (401, 408, 429)
+    # Alpha 资格评估使用的阈值方案(见 qualification.QUALIFICATION_PROFILES)
+    QUALIFICATION_PROFILE = 'default'
+    # 提交前本地自相关检查的阈值
+    SELF_CORRELATION_THRESHOLD = 0.7
+    # 每轮结束时写入遥测快照的目录
+    TELEMETRY_DIR = "telemetry"
+    # 旧版本保存待提交 Alpha ID 的文件，启动时导入提交队列
+    LEGACY_ALPHA_ID_FILE = "alpha_ids.txt"
+    # 等待 Alpha 指标计算完成的最长时间(秒)
+    ALPHA_DETAIL_MAX_WAIT = 120
+    # 模拟完成后是否获取日度 PnL 和年度统计
+    FETCH_RECORDSETS = True
+    RECORDSET_MAX_WAIT = 120
+
+    def __init__(self, credentials_file='brain_credentials.txt', max_concurrent_simulations=None,
+                 offline_data_dir=None, session_file='~/.brain_session.json'):
+        """初始化 API 客户端
+
+        offline_data_dir: 本地面板数据目录，提供时在模拟前用离线评估器预筛选候选
+        session_file: 保存认证会话的文件，有效期内启动时直接复用
+        """
+
+        if max_concurrent_simulations is None:
+            max_concurrent_simulations = self.MAX_CONCURRENT_SIMULATIONS
+        # 并发数不能超过平台限制
+        self.max_concurrent_simulations = max(1, min(max_concurrent_simulations, self.MAX_CONCURRENT_SIMULATIONS))
+
+        # 连接池需要容纳并发的模拟轮询和字段分页请求
+        self.session = GovernedSession(pool_size=self.max_concurrent_simulations + self.DATAFIELD_FETCH_WORKERS + 4)
+        self.session.hooks['response'].append(self._record_response)
+        self.session_store = SessionStore(session_file)
         self._setup_authentication(credentials_file)
+        self.scheduler = ProgressScheduler(self.session)
         self.optimized_strategy_generator = OptimizedAlphaStrategy()
         self.history_manager = AlphaHistoryManagerSQLite()
+        self.simulation_cache = SimulationCache(self.history_manager.db_file)
+        self.datafield_catalog = DatafieldCatalog(self.history_manager.db_file)
+        self.journal = SimulationJournal(self.history_manager.db_file)
+        self.submission_queue = SubmissionQueue(self.history_manager.db_file)
+        self.budget_allocator = BudgetAllocator(self.history_manager.db_file)
+        self._alpha_arms = {}
+        self.genetic_search = None
+        self.surrogate = SurrogateModel(self.history_manager.db_file)
+        self.screening_store = ScreeningStore(self.history_manager.db_file)
+        self.submission_queue.import_file(self.LEGACY_ALPHA_ID_FILE)
+        self.pnl_store = PnlStore(db_file=self.history_manager.db_file)
+        self._recordset_fetches = 0
+        self.self_correlation = None
+        self.qualification_scorer = QualificationScorer(self.QUALIFICATION_PROFILE)
+        self._journal_resumed = False
+        # 从模拟日志恢复的筛选模拟对应的候选，下一次分阶段筛选时重新加入候选池
+        self._screening_carryover = []
+        self.offline_evaluator = None
+        if offline_data_dir:
+            try:
+                self.offline_evaluator = OfflineEvaluator.from_directory(offline_data_dir)
+                print(f"✅ 已加载离线面板数据: {offline_data_dir}")
+            except Exception as e:
+                print(f"⚠️ 加载离线面板数据失败，跳过离线预筛选: {str(e)}")
 
     def _setup_authentication(self, credentials_file):
-        """设置认证"""
+        """设置认证(优先复用保存的会话)"""
 
         try:
             with open(expanduser(credentials_file)) as f:
                 credentials = json.load(f)
             username, password = credentials
-            self.session.auth = HTTPBasicAuth(username, password)
+            self._credentials = (username, password)
 
-            response = self.session.post(f"{self.API_BASE_URL}/authentication")
-            if response.status_code not in [200, 201]:
-                raise Exception(f"认证失败: HTTP {response.status_code}")
+            if self.session_store.load(self.session, username) and self._check_authentication():
+                print("✅ 已复用保存的会话!")
+            else:
+                self.session.cookies.clear()
+                self._authenticate()
+                print("✅ 认证成功!")
 
-            print("✅ 认证成功!")
+            # 会话过期(401)时由会话自动调用重新认证
+            self.session.authenticator = self._authenticate
 
         except Exception as e:
             print(f"❌ 认证错误: {str(e)}")
             raise
 
-    def simulate_alphas(self, datafields=None, strategy_mode=1, dataset_name=None, previous_results=None, use_screening=False):
-        """模拟 Alpha 列表"""
+    @staticmethod
+    def _record_response(response, *args, **kwargs):
+        """记录每个 API 请求的延迟和状态码"""
+
+        endpoint = classify_endpoint(response.request.method, response.url)
+        telemetry.observe('http.request', response.elapsed.total_seconds(), endpoint=endpoint)
+        telemetry.increment('http.responses', endpoint=endpoint, status=response.status_code)
+        if response.status_code == 429:
+            telemetry.increment('http.throttled', endpoint=endpoint)
+
+    def _authenticate(self):
+        """用账号密码创建新会话并保存到磁盘"""
+        username, password = self._credentials
+        response = self.session.post(f"{self.API_BASE_URL}/authentication", auth=HTTPBasicAuth(username, password))
+        if response.status_code not in [200, 201]:
+            raise Exception(f"认证失败: HTTP {response.status_code}")
 
         try:
+            expiry = response.json().get('token', {}).get('expiry')
+        except ValueError:
+            expiry = None
+        self.session_store.save(self.session, username, expiry)
+
+    def _check_authentication(self):
+        """检查当前会话是否仍然有效"""
+        try:
+            response = self.session.get(f"{self.API_BASE_URL}/authentication")
+            if response.status_code != 200:
+                return False
+            expiry = response.json().get('token', {}).get('expiry', 0)
+            return expiry > SessionStore.MIN_REMAINING_SECONDS
+        except Exception:
+            return False
+
+    @timed('simulate_alphas')
+    def simulate_alphas(self, datafields=None, strategy_mode=1, dataset_name=None, previous_results=None, use_screening=False,
+                        use_multi_simulation=False):
+        """模拟 Alpha 列表
+
+        use_screening: 按 SCREENING_SCHEDULE 生成更大的候选池，逐级提高保真度筛选后只完整模拟晋级的候选
+        """
+
+        # 已得到的结果(包括从模拟日志接回的)在任何提前返回或出错时都会返回
+        results = []
+        try:
+            # 先接回上次进程中断时仍在平台上运行的模拟
+            if not self._journal_resumed:
+                self._journal_resumed = True
+                results.extend(self.resume_pending_simulations())
+
             datafields = self._get_datafields_if_none(datafields, dataset_name)
             if not datafields:
                 print("❌ 无法获取数据字段，终止Alpha生成")
-                return []
+                return results
 
             # 如果没有提供previous_results，则从历史记录中加载
             if previous_results is None:
@@ -62,177 +238,716 @@ class BrainBatchAlpha:
                 if not previous_results:
                     print("⚠️ 没有找到历史记录，将使用默认策略生成")
 
-            alpha_list = self._generate_alpha_list(datafields, strategy_mode, previous_results)
+            schedule = get_schedule(self.SCREENING_SCHEDULE) if use_screening else None
+            budget = self.MAX_STRATEGIES_PER_ROUND
+            if schedule:
+                budget = pool_size(schedule, budget, offline_available=self.offline_evaluator is not None)
+
+            # 每轮只训练一次代理模型，生成和排序共用训练结果
+            surrogate_ready = self._surrogate_ready()
+
+            with telemetry.span('phase.strategy_generation'):
+                alpha_list = self._generate_alpha_list(datafields, strategy_mode, previous_results, dataset_name,
+                                                       budget, surrogate_ready)
+            if schedule and self._screening_carryover:
+                # 上次中断的筛选轮次中已经完成的筛选模拟，结果保存在筛选结果表中，直接复用
+                print(f"♻️ 加入上次中断的筛选候选 {len(self._screening_carryover)} 个")
+                alpha_list = self._screening_carryover + alpha_list
+                self._screening_carryover = []
             if not alpha_list:
                 print("❌ 未能生成任何Alpha策略")
-                return []
+                return results
 
-            print(f"\n🚀 开始模拟 {len(alpha_list)} 个 Alpha 表达式...")
-
-            results = []
-            
-            # 如果启用分阶段筛选，先在小样本上测试
-            if use_screening and len(alpha_list) > 10:
-                print("🔍 执行分阶段筛选: 先在小样本(TOP300)上测试...")
-                # 先用少量股票快速筛选
-                screening_results = self._screen_alphas(alpha_list[:20], dataset_name)
-                # 只有通过筛选的才进行完整测试
-                alpha_list = [alpha for i, alpha in enumerate(alpha_list[:20]) if screening_results[i]] + alpha_list[20:]
-                print(f"✅ 筛选完成，剩余 {len(alpha_list)} 个 Alpha 进行完整测试")
-
-            for i, alpha in enumerate(alpha_list, 1):
-                print(f"\n[{i}/{len(alpha_list)}] 正在模拟 Alpha...")
-                result = self._simulate_single_alpha(alpha)
-                if result:
-                    results.append(result)
-                    # 保存到历史记录
-                    self.history_manager.add_alpha_result(result)
-                    # 如果通过检查，也保存ID到alpha_ids.txt
-                    if result.get('passed_all_checks'):
-                        self._save_alpha_id(result['alpha_id'], result)
+            # 本地静态校验: 解析别名，拒绝运算符、参数、字段或单位有误的表达式
+            with telemetry.span('phase.validation'):
+                alpha_list = self._validate_alphas(alpha_list, datafields)
+            if not alpha_list:
+                print("❌ 没有通过静态校验的Alpha表达式")
+                return results
 
-                if i < len(alpha_list):
-                    sleep(5)
+            print(f"\n🚀 开始模拟 {len(alpha_list)} 个 Alpha 表达式...")
 
+            # 先查询模拟缓存，已模拟过的表达式直接使用缓存结果
+            with telemetry.span('phase.cache_lookup'):
+                cached_results, alpha_list = self._split_cached_alphas(alpha_list)
+            results.extend(cached_results)
+
+            # 代理模型按预测排序，可能的赢家和不确定性高的候选先模拟，明显的输家跳过
+            if surrogate_ready:
+                with telemetry.span('phase.surrogate_ranking'):
+                    alpha_list = self._prioritize_by_surrogate(alpha_list, budget)
+
+            if schedule:
+                # 连续减半: 低保真度上大量筛选，逐级晋级，只有通过全部阶梯的候选做完整模拟
+                with telemetry.span('phase.screening'):
+                    alpha_list = self._screen_alphas(alpha_list, schedule)
+            elif self.offline_evaluator is not None:
+                # 有本地面板数据时，先离线评估并排序，淘汰明显无效的候选
+                with telemetry.span('phase.offline_prescreen'):
+                    alpha_list = self._prescreen_offline(alpha_list)
+
+            # 写入模拟日志后再提交，进程中断时可以恢复
+            self.journal.enqueue(alpha_list)
+            labels = {'strategy_mode': strategy_mode, 'dataset': dataset_name or 'default'}
+            for alpha, result in self._run_simulations(alpha_list, use_multi_simulation):
+                results.append(result)
+                telemetry.increment('alphas.simulated', **labels)
+                if result.get('passed_all_checks'):
+                    telemetry.increment('alphas.qualified', **labels)
+                self._credit_arm(alpha, result)
+                with telemetry.span('phase.persist'):
+                    self._persist_result(alpha, result)
+
+            with telemetry.span('phase.recordset_drain'):
+                self._drain_recordset_fetches()
             return results
 
         except Exception as e:
             print(f"❌ 模拟过程出错: {str(e)}")
+            return results
+
+        finally:
+            self._dump_telemetry()
+
+    def _dump_telemetry(self):
+        """每轮结束时把累计的遥测快照写入 JSON 文件"""
+
+        telemetry.increment('rounds')
+        path = os.path.join(self.TELEMETRY_DIR, f"round_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        telemetry.dump_json(path)
+
+    def collect_metrics(self):
+        """刷新需要实时查询的仪表(供指标导出器在每次抓取前调用)"""
+        for state, count in self.submission_queue.get_statistics().items():
+            telemetry.set_gauge('submission_queue.depth', count, state=state)
+        telemetry.set_gauge('scheduler.pending_tasks', len(self.scheduler))
+        for endpoint, stats in self.session.governor.get_statistics().items():
+            telemetry.set_gauge('rate_limit.rate', stats['rate'], endpoint=endpoint)
+
+        _, counters, _ = telemetry.items()
+        for (name, labels), simulated in counters.items():
+            if name == 'alphas.simulated' and simulated:
+                qualified = counters.get(('alphas.qualified', labels), 0)
+                telemetry.set_gauge('alphas.qualification_rate', qualified / simulated, **dict(labels))
+
+    def _persist_result(self, alpha, result):
+        """把模拟结果写入缓存和历史记录"""
+
+        self.simulation_cache.put(alpha, result)
+        # 保存到历史记录
+        self.history_manager.add_alpha_result(result)
+        # 如果通过检查，加入提交队列
+        if result.get('passed_all_checks'):
+            self._save_alpha_id(result['alpha_id'], result)
+        self.journal.mark_persisted(alpha)
+
+        alpha_id = result.get('alpha_id')
+        if self.FETCH_RECORDSETS and alpha_id and not self.pnl_store.has(alpha_id):
+            self._fetch_recordsets(alpha_id)
+
+    def _fetch_recordsets(self, alpha_id):
+        """在调度器上获取 Alpha 的日度 PnL 和年度统计，与其余模拟的轮询同时进行"""
+
+        def store_pnl(resp):
+            days, values = PnlStore.daily_pnl_from_recordset(resp.json())
+            self.pnl_store.put_pnl(alpha_id, days, values)
+
+        def store_yearly_stats(resp):
+            self.pnl_store.put_yearly_stats(alpha_id, resp.json())
+
+        for name, store in (('pnl', store_pnl), ('yearly-stats', store_yearly_stats)):
+            self._recordset_fetches += 1
+            self.scheduler.watch(
+                f"{self.API_BASE_URL}/alphas/{alpha_id}/recordsets/{name}",
+                on_complete=lambda resp, store=store: self._on_recordset_done(alpha_id, store, resp),
+                on_error=lambda e, name=name: self._on_recordset_done(alpha_id, None, e, name),
+                is_ready=lambda resp: resp.status_code == 200 and bool(resp.content),
+                max_wait=self.RECORDSET_MAX_WAIT
+            )
+
+    def _on_recordset_done(self, alpha_id, store, outcome, name=None):
+        """保存获取到的 recordset，出错时只记录不影响主流程"""
+
+        self._recordset_fetches -= 1
+        try:
+            if store is None:
+                raise outcome
+            store(outcome)
+        except Exception as e:
+            print(f"⚠️ 获取 Alpha {alpha_id} 的 {name or 'recordset'} 失败: {str(e)}")
+
+    def _drain_recordset_fetches(self):
+        """等待所有进行中的 recordset 获取完成"""
+
+        while self._recordset_fetches > 0 and self.scheduler.step():
+            pass
+
+    def resume_pending_simulations(self):
+        """恢复模拟日志中已提交但结果尚未入库的模拟
+
+        重新轮询保存的 Location URL 而不是重新提交，返回恢复得到的结果列表。
+        """
+
+        entries = self.journal.get_outstanding()
+        self.journal.purge_finished()
+        if not entries:
             return []
 
-    def _screen_alphas(self, alpha_list, dataset_name):
-        """在小样本上快速筛选Alpha"""
-        screening_results = []
-        
-        # 修改数据集配置为小样本
-        screening_config = get_dataset_config(dataset_name).copy()
-        screening_config['universe'] = 'TOP300'  # 使用较小的股票池进行筛选
-        
-        for alpha in alpha_list:
-            try:
-                # 修改Alpha设置使用小样本
-                screening_alpha = alpha.copy()
-                screening_alpha['settings'] = screening_alpha['settings'].copy()
-                screening_alpha['settings']['universe'] = 'TOP300'
-                
-                print(f"  筛选: {alpha.get('regular', 'Unknown')[:50]}...")
-                
-                # 发送模拟请求
-                sim_resp = self.session.post(
-                    f"{self.API_BASE_URL}/simulations",
-                    json=screening_alpha
+        print(f"\n♻️ 发现 {len(entries)} 个未完成的模拟，正在恢复...")
+        results = []
+        for entry, alpha_data in self._run_in_flight(entries, self._resume_journal_entry, len(entries)):
+            alpha = entry['alpha']
+            if entry['fidelity']:
+                self._resume_screening_entry(entry, alpha_data)
+                continue
+            if entry['state'] == 'scored':
+                result = entry['result']
+            else:
+                result = self._build_alpha_result(alpha, alpha_data)
+            if result:
+                self.journal.mark_scored(alpha, result)
+                results.append(result)
+                self._persist_result(alpha, result)
+            else:
+                self.journal.mark_failed(alpha)
+
+        self._drain_recordset_fetches()
+        print(f"✅ 恢复完成，获得 {len(results)} 个结果")
+        return results
+
+    def _resume_screening_entry(self, entry, alpha_data):
+        """保存恢复得到的筛选指标，并把原始候选留到下一次分阶段筛选"""
+
+        alpha = entry['alpha']
+        is_data = (alpha_data or {}).get('is', {})
+        if not is_data:
+            self.journal.mark_failed(alpha)
+            return
+        self.screening_store.put(SimulationCache.make_key(alpha), entry['fidelity'], alpha['regular'], is_data,
+                                 alpha_data.get('id'))
+        self.journal.mark_persisted(alpha)
+        if entry['candidate']:
+            self._screening_carryover.append(entry['candidate'])
+
+    def _resume_journal_entry(self, entry, on_done):
+        """按日志中的状态从中断处继续一个模拟"""
+
+        alpha = entry['alpha']
+        if entry['state'] == 'scored':
+            on_done(entry, None)
+            return
+
+        done = lambda _, alpha_data: on_done(entry, alpha_data)
+        on_error = lambda e: self._on_task_error(entry, e, on_done)
+
+        if entry['state'] == 'completed':
+            self._watch_alpha_detail(alpha, entry['alpha_id'], done)
+        elif entry['child_index'] is None:
+            self.scheduler.watch(
+                entry['location'],
+                on_complete=lambda resp: self._on_simulation_complete(alpha, resp, done),
+                on_error=on_error
+            )
+        else:
+            # 多模拟: 先等父模拟完成，再跟踪对应序号的子模拟
+            def on_parent_complete(resp):
+                children = resp.json().get('children', [])
+                if entry['child_index'] >= len(children):
+                    on_done(entry, None)
+                    return
+                self.scheduler.watch(
+                    f"{self.API_BASE_URL}/simulations/{children[entry['child_index']]}",
+                    on_complete=lambda child_resp: self._on_simulation_complete(alpha, child_resp, done),
+                    on_error=on_error
                 )
 
-                if sim_resp.status_code != 201:
-                    screening_results.append(False)
-                    continue
+            self.scheduler.watch(entry['location'], on_complete=on_parent_complete, on_error=on_error)
 
-                sim_progress_url = sim_resp.headers['Location']
-                
-                # 等待模拟完成
-                while True:
-                    sim_progress_resp = self.session.get(sim_progress_url)
-                    retry_after_sec = float(sim_progress_resp.headers.get("Retry-After", 0))
-
-                    if retry_after_sec == 0:  # simulation done!
-                        alpha_id = sim_progress_resp.json()['alpha']
-                        
-                        # 获取 Alpha 详情
-                        alpha_url = f"{self.API_BASE_URL}/alphas/{alpha_id}"
-                        alpha_detail = self.session.get(alpha_url)
-                        alpha_data = alpha_detail.json()
-
-                        # 检查基本指标
-                        is_data = alpha_data.get('is', {})
-                        if not is_data:
-                            screening_results.append(False)
-                            break
-
-                        sharpe = float(is_data.get('sharpe', 0))
-                        fitness = float(is_data.get('fitness', 0))
-                        
-                        # 筛选标准相对宽松
-                        is_promising = sharpe > 0.5 and fitness > 0.3
-                        screening_results.append(is_promising)
-                        break
-
-                    sleep(retry_after_sec)
-                    
-            except Exception as e:
-                screening_results.append(False)
-                
-        return screening_results
+    def _validate_alphas(self, alpha_list, datafields):
+        """用运算符目录、数据字段目录和单位推断校验候选，别名改写为标准运算符
 
-    def _simulate_single_alpha(self, alpha):
-        """模拟单个 Alpha"""
+        已知字段为本轮的数据字段加上字段目录中同一地区和延迟下的全部字段。
+        """
+        settings = self.DEFAULT_SIMULATION_SETTINGS
+        known_fields = set(datafields or []) | self.datafield_catalog.get_field_ids(settings['region'], settings['delay'])
+        validator = ExpressionValidator(known_fields)
+
+        kept = []
+        rewritten = 0
+        reasons = {}
+        for alpha in alpha_list:
+            expression, issues = validator.check(alpha['regular'])
+            if issues:
+                telemetry.increment('validation.rejected', kind=issues[0].kind)
+                reasons[issues[0].kind] = reasons.get(issues[0].kind, 0) + 1
+                self._alpha_arms.pop(SimulationCache.make_key(alpha), None)
+                continue
+            if expression != alpha['regular']:
+                arm = self._alpha_arms.pop(SimulationCache.make_key(alpha), None)
+                alpha = {**alpha, 'regular': expression}
+                if arm:
+                    self._alpha_arms[SimulationCache.make_key(alpha)] = arm
+                rewritten += 1
+            kept.append(alpha)
+
+        summary = '，'.join(f"{kind} {count} 个" for kind, count in sorted(reasons.items(), key=lambda item: -item[1]))
+        print(f"🧪 静态校验: 改写别名 {rewritten} 个，拒绝 {len(alpha_list) - len(kept)} 个"
+              f"{f' ({summary})' if summary else ''}，剩余 {len(kept)} 个")
+        return kept
+
+    def _split_cached_alphas(self, alpha_list):
+        """把 Alpha 列表拆分为缓存命中的结果和仍需模拟的 Alpha，并报告本轮命中率"""
+
+        self.simulation_cache.reset_stats()
+        self.simulation_cache.purge_expired()
+
+        cached_results = []
+        remaining = []
+        for alpha in alpha_list:
+            cached = self.simulation_cache.get(alpha, self.qualification_scorer)
+            if cached:
+                cached_results.append(cached)
+            else:
+                remaining.append(alpha)
+
+        stats = self.simulation_cache.get_statistics()
+        print(f"🗃️ 模拟缓存命中 {stats['hits']}/{stats['hits'] + stats['misses']} "
+              f"({stats['hit_rate'] * 100:.1f}%)，需要模拟 {len(remaining)} 个")
+        return cached_results, remaining
+
+    def _prescreen_offline(self, alpha_list):
+        """用离线评估器给候选排序，淘汰离线 Sharpe 低于阈值的候选
+
+        离线无法评估(字段或运算符缺失)的候选保留并排在最后。
+        """
 
+        alphas_by_expression = {alpha['regular']: alpha for alpha in alpha_list}
+        ranked = self.offline_evaluator.rank_candidates(list(alphas_by_expression))
+
+        kept = [
+            alphas_by_expression[expression] for expression, metrics in ranked
+            if metrics is None or metrics['sharpe'] >= self.OFFLINE_MIN_SHARPE
+        ]
+        evaluated = sum(1 for _, metrics in ranked if metrics is not None)
+        print(f"🧮 离线预筛选: 评估 {evaluated} 个，淘汰 {len(alpha_list) - len(kept)} 个，剩余 {len(kept)} 个")
+        return kept
+
+    def _surrogate_ready(self):
+        """用新增的历史记录增量训练代理模型，样本足够时返回 True"""
         try:
-            print(f"表达式: {alpha.get('regular', 'Unknown')}")
+            self.surrogate.train()
+        except Exception as e:
+            print(f"⚠️ 训练代理模型时出错: {str(e)}")
+            return False
+        return len(self.surrogate) >= self.SURROGATE_MIN_HISTORY
+
+    def _prioritize_by_surrogate(self, alpha_list, limit=None):
+        """按代理模型预测的 Sharpe 乐观估计排序，跳过明显的输家，最多保留 limit 个
 
-            # 发送模拟请求
+        保留的候选按模拟设置重新分组(组按其中最靠前的候选排序，组内保持预测顺序)，
+        多模拟模式下相同设置的表达式仍然相邻，可以打包到同一个请求中。
+        """
+
+        ranked, skipped = self.surrogate.rank(
+            [alpha['regular'] for alpha in alpha_list],
+            exploration=self.SURROGATE_EXPLORATION,
+            skip_below=self.SURROGATE_SKIP_SHARPE
+        )
+        alphas_by_expression = {}
+        for alpha in alpha_list:
+            alphas_by_expression.setdefault(alpha['regular'], []).append(alpha)
+        kept = [alpha for expression in dict.fromkeys(ranked) for alpha in alphas_by_expression[expression]]
+        if limit is not None:
+            kept = kept[:limit]
+        groups = {}
+        for alpha in kept:
+            groups.setdefault(json.dumps(alpha.get('settings', {}), sort_keys=True), []).append(alpha)
+        kept = [alpha for group in groups.values() for alpha in group]
+        print(f"🔮 代理模型排序: 训练样本 {len(self.surrogate)} 个，跳过 {len(skipped)} 个明显的输家，"
+              f"保留 {len(kept)}/{len(alpha_list)} 个")
+        return kept
+
+    def _run_simulations(self, alpha_list, use_multi_simulation=False):
+        """保持多个模拟同时进行，按完成顺序逐个返回 (Alpha, 结果)"""
+
+        total = len(alpha_list)
+        if use_multi_simulation:
+            # 把相同设置的表达式打包成多模拟请求，每个请求占用一个并发名额
+            items = [
+                alpha_list[i:i + self.MULTI_SIMULATION_LIMIT]
+                for i in range(0, total, self.MULTI_SIMULATION_LIMIT)
+            ]
+            launch = self._launch_multi_simulation
+            print(f"📦 使用多模拟模式: {total} 个表达式打包为 {len(items)} 个请求")
+        else:
+            items = alpha_list
+            launch = self._launch_simulation
+
+        workers = min(self.max_concurrent_simulations, len(items))
+        print(f"⚙️ 并发模拟数: {workers}")
+
+        done = 0
+        for item, outcome in self._run_in_flight(items, launch, workers):
+            outcomes = outcome if use_multi_simulation else [(item, outcome)]
+            for alpha, alpha_data in outcomes:
+                done += 1
+                print(f"\n[{done}/{total}] Alpha 模拟完成")
+                print(f"表达式: {alpha.get('regular', 'Unknown')}")
+                result = self._build_alpha_result(alpha, alpha_data)
+                if result:
+                    telemetry.increment('simulations.completed')
+                    self.journal.mark_scored(alpha, result)
+                    yield alpha, result
+                else:
+                    telemetry.increment('simulations.failed')
+                    self.journal.mark_failed(alpha)
+
+    def _run_in_flight(self, items, launch, limit):
+        """在统一调度器上保持最多 limit 个任务同时进行，按完成顺序产出 (任务, 结果)
+
+        launch(item, on_done) 负责发起任务，任务结束时调用 on_done(item, outcome)。
+        """
+
+        pending = deque(items)
+        finished = deque()
+        in_flight = 0
+
+        def on_done(item, outcome):
+            nonlocal in_flight
+            in_flight -= 1
+            finished.append((item, outcome))
+
+        while pending or in_flight or finished:
+            while pending and in_flight < limit:
+                in_flight += 1
+                launch(pending.popleft(), on_done)
+
+            if finished:
+                yield finished.popleft()
+            elif not self.scheduler.step():
+                break
+
+    def _post_retry_delay(self, response, attempt, server_errors):
+        """模拟请求可以重新排期时返回等待秒数，否则返回 None
+
+        429 按 Retry-After 等待；5xx 按有上限的指数退避加随机抖动等待。
+        会话层的自动重试不会重试 POST，所以 5xx 在这里处理。
+        """
+        if response.status_code == 429 and attempt < self.MAX_POST_ATTEMPTS:
+            return float(response.headers.get("Retry-After", 5))
+        if response.status_code >= 500 and server_errors < self.MAX_POST_SERVER_ERRORS:
+            telemetry.increment('simulations.post_server_errors')
+            backoff = min(self.POST_SERVER_ERROR_BACKOFF * 2 ** server_errors, self.POST_SERVER_ERROR_MAX_DELAY)
+            print(f"⚠️ 模拟请求返回 {response.status_code}，{backoff:.0f} 秒内重试")
+            return random.uniform(backoff / 2, backoff)
+        return None
+
+    def _launch_simulation(self, alpha, on_done, attempt=0, server_errors=0):
+        """发送模拟请求并把进度 URL 交给调度器跟踪
+
+        完成时调用 on_done(alpha, alpha_data)，失败时 alpha_data 为 None。
+        """
+
+        try:
             sim_resp = self.session.post(
                 f"{self.API_BASE_URL}/simulations",
                 json=alpha
             )
 
+            # 达到并发上限或平台暂时出错时重新排期，而不是阻塞等待
+            retry_after = self._post_retry_delay(sim_resp, attempt, server_errors)
+            if retry_after is not None:
+                self.scheduler.call_later(
+                    retry_after, self._launch_simulation, alpha, on_done,
+                    attempt + 1, server_errors + (sim_resp.status_code >= 500)
+                )
+                return
+
             if sim_resp.status_code != 201:
                 print(f"❌ 模拟请求失败 (状态码: {sim_resp.status_code})")
-                return None
+                on_done(alpha, None)
+                return
+
+            sim_progress_url = sim_resp.headers['Location']
+            self.journal.mark_posted(alpha, sim_progress_url)
+            on_done = self._track_in_flight(on_done, 1)
+            posted_at = perf_counter()
+
+            def on_progress_complete(resp):
+                telemetry.observe('simulation.queue_wait', perf_counter() - posted_at)
+                self._on_simulation_complete(alpha, resp, on_done)
+
+            self.scheduler.watch(
+                sim_progress_url,
+                on_complete=on_progress_complete,
+                on_error=lambda e: self._on_task_error(alpha, e, on_done)
+            )
 
-            try:
-                sim_progress_url = sim_resp.headers['Location']
-                start_time = datetime.now()
-                total_wait = 0
-
-                while True:
-                    sim_progress_resp = self.session.get(sim_progress_url)
-                    retry_after_sec = float(sim_progress_resp.headers.get("Retry-After", 0))
-
-                    if retry_after_sec == 0:  # simulation done!
-                        alpha_id = sim_progress_resp.json()['alpha']
-                        print(f"✅ 获得 Alpha ID: {alpha_id}")
-
-                        # 等待一下让指标计算完成
-                        sleep(3)
-
-                        # 获取 Alpha 详情
-                        alpha_url = f"{self.API_BASE_URL}/alphas/{alpha_id}"
-                        alpha_detail = self.session.get(alpha_url)
-                        alpha_data = alpha_detail.json()
-
-                        # 检查是否有 is 字段
-                        if 'is' not in alpha_data:
-                            print("❌ 无法获取指标数据")
-                            return None
-
-                        is_qualified = self.check_alpha_qualification(alpha_data)
-
-                        return {
-                            'expression': alpha.get('regular'),
-                            'alpha_id': alpha_id,
-                            'passed_all_checks': is_qualified,
-                            'metrics': alpha_data.get('is', {}),
-                            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        }
-
-                    # 更新等待时间和进度
-                    total_wait += retry_after_sec
-                    elapsed = (datetime.now() - start_time).total_seconds()
-                    progress = min(95, (elapsed / 30) * 100)  # 假设通常需要 30 秒完成
-
-                    print(f"⏳ 等待模拟结果... ({elapsed:.1f} 秒 | 进度约 {progress:.0f}%)")
-                    sleep(retry_after_sec)
-
-            except KeyError:
-                print("❌ 无法获取模拟进度 URL")
-                return None
+        except KeyError:
+            print("❌ 无法获取模拟进度 URL")
+            on_done(alpha, None)
+        except Exception as e:
+            self._on_task_error(alpha, e, on_done)
+
+    @staticmethod
+    def _track_in_flight(on_done, count):
+        """统计已被平台接受、尚未结束的模拟数量，返回包装后的 on_done"""
+
+        telemetry.increment('simulations.started', count)
+        telemetry.add_gauge('simulations.in_flight', count)
+
+        def finished(*args):
+            telemetry.add_gauge('simulations.in_flight', -count)
+            on_done(*args)
+
+        return finished
+
+    def _on_simulation_complete(self, alpha, sim_progress_resp, on_done):
+        """模拟完成后，通过就绪检查等待指标计算完成再获取 Alpha 详情"""
+
+        alpha_id = sim_progress_resp.json().get('alpha')
+        if not alpha_id:
+            print(f"❌ 模拟未生成 Alpha (状态: {sim_progress_resp.json().get('status', 'Unknown')})")
+            on_done(alpha, None)
+            return
+
+        print(f"✅ 获得 Alpha ID: {alpha_id}")
+        self.journal.mark_completed(alpha, alpha_id)
+        self._watch_alpha_detail(alpha, alpha_id, on_done)
+
+    def _watch_alpha_detail(self, alpha, alpha_id, on_done):
+        """等待 Alpha 指标计算完成后获取详情"""
+
+        started = perf_counter()
+
+        def on_complete(resp):
+            telemetry.observe('simulation.detail_wait', perf_counter() - started)
+            on_done(alpha, dict(resp.json(), id=alpha_id))
+
+        self.scheduler.watch(
+            f"{self.API_BASE_URL}/alphas/{alpha_id}",
+            on_complete=on_complete,
+            on_error=lambda e: self._on_task_error(alpha, e, on_done),
+            is_ready=self._alpha_metrics_ready,
+            max_wait=self.ALPHA_DETAIL_MAX_WAIT
+        )
+
+    def _launch_multi_simulation(self, batch, on_done, attempt=0, server_errors=0):
+        """以一个多模拟请求发送一批表达式
+
+        平台返回一个父进度 URL，完成后展开其中的子模拟并逐个获取 Alpha 详情。
+        全部子模拟结束时调用 on_done(batch, [(alpha, alpha_data), ...])。
+        """
+
+        # 多模拟至少需要两个表达式，单个表达式走普通模拟
+        if len(batch) < 2:
+            self._launch_simulation(batch[0], lambda alpha, alpha_data: on_done(batch, [(alpha, alpha_data)]))
+            return
+
+        try:
+            sim_resp = self.session.post(
+                f"{self.API_BASE_URL}/simulations",
+                json=batch
+            )
+
+            retry_after = self._post_retry_delay(sim_resp, attempt, server_errors)
+            if retry_after is not None:
+                self.scheduler.call_later(
+                    retry_after, self._launch_multi_simulation, batch, on_done,
+                    attempt + 1, server_errors + (sim_resp.status_code >= 500)
+                )
+                return
+
+            if sim_resp.status_code != 201:
+                print(f"❌ 多模拟请求失败 (状态码: {sim_resp.status_code})")
+                on_done(batch, [(alpha, None) for alpha in batch])
+                return
+
+            for index, alpha in enumerate(batch):
+                self.journal.mark_posted(alpha, sim_resp.headers['Location'], child_index=index)
+            on_done = self._track_in_flight(on_done, len(batch))
+            posted_at = perf_counter()
+
+            def on_parent_complete(resp):
+                telemetry.observe('simulation.queue_wait', perf_counter() - posted_at, multi=True)
+                self._on_multi_simulation_complete(batch, resp, on_done)
+
+            self.scheduler.watch(
+                sim_resp.headers['Location'],
+                on_complete=on_parent_complete,
+                on_error=lambda e: self._on_multi_simulation_error(batch, e, on_done)
+            )
+
+        except Exception as e:
+            self._on_multi_simulation_error(batch, e, on_done)
+
+    def _on_multi_simulation_complete(self, batch, parent_resp, on_done):
+        """展开父模拟中的子模拟，子模拟与请求中的表达式按顺序一一对应"""
+
+        children = parent_resp.json().get('children', [])
+        if not children:
+            print(f"❌ 多模拟未返回子模拟 (状态: {parent_resp.json().get('status', 'Unknown')})")
+            on_done(batch, [(alpha, None) for alpha in batch])
+            return
+
+        outcomes = [None] * len(batch)
+        remaining = len(batch)
+
+        def child_done(index, alpha_data):
+            nonlocal remaining
+            outcomes[index] = (batch[index], alpha_data)
+            remaining -= 1
+            if remaining == 0:
+                on_done(batch, outcomes)
+
+        for index, alpha in enumerate(batch):
+            if index >= len(children):
+                child_done(index, None)
+                continue
+            self.scheduler.watch(
+                f"{self.API_BASE_URL}/simulations/{children[index]}",
+                on_complete=lambda resp, index=index, alpha=alpha: self._on_simulation_complete(
+                    alpha, resp, lambda _, alpha_data, index=index: child_done(index, alpha_data)),
+                on_error=lambda e, index=index: child_done(index, None)
+            )
+
+    def _on_multi_simulation_error(self, batch, error, on_done):
+        """多模拟出错时整批标记为失败"""
+
+        print(f"⚠️ 多模拟失败: {str(error)}")
+        on_done(batch, [(alpha, None) for alpha in batch])
+
+    @staticmethod
+    def _alpha_metrics_ready(alpha_detail):
+        """判断 Alpha 详情中的指标是否已经计算完成"""
+
+        if alpha_detail.status_code != 200:
+            return False
+        is_data = alpha_detail.json().get('is') or {}
+        return is_data.get('sharpe') is not None
+
+    def _on_task_error(self, item, error, on_done):
+        """调度任务出错时记录并标记为失败"""
+
+        print(f"⚠️ Alpha 模拟失败: {str(error)}")
+        on_done(item, None)
+
+    def _build_alpha_result(self, alpha, alpha_data):
+        """根据 Alpha 详情构建结果记录"""
+
+        # 检查是否有 is 字段
+        if not alpha_data or 'is' not in alpha_data:
+            print("❌ 无法获取指标数据")
+            return None
+
+        is_qualified = self.check_alpha_qualification(alpha_data)
+
+        return {
+            'expression': alpha.get('regular'),
+            'alpha_id': alpha_data.get('id'),
+            'passed_all_checks': is_qualified,
+            'metrics': alpha_data.get('is', {}),
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    @timed('screen_alphas')
+    def _screen_alphas(self, alpha_list, schedule):
+        """按筛选方案逐级提高保真度，每级只让排名靠前的候选晋级，返回需要完整模拟的 Alpha"""
+
+        survivors = list(alpha_list)
+        print(f"🔍 执行分阶段筛选: {schedule.get('description', '')}")
+        for rung in schedule['rungs']:
+            if not survivors:
+                break
+            if rung.get('offline'):
+                if self.offline_evaluator is None:
+                    continue
+                keys, metrics = self._screen_offline(survivors, rung)
+            else:
+                keys, metrics = self._screen_on_platform(survivors, rung)
+
+            promoted = promote(list(range(len(survivors))), metrics, rung)
+            self.screening_store.mark_promoted([keys[index] for index in promoted], rung['name'])
+            telemetry.increment('screening.evaluated', len(survivors), fidelity=rung['name'])
+            telemetry.increment('screening.promoted', len(promoted), fidelity=rung['name'])
+            print(f"  🪜 {rung['name']}: 评估 {len(survivors)} 个，晋级 {len(promoted)} 个")
+            survivors = [survivors[index] for index in promoted]
+
+        print(f"✅ 筛选完成，{len(survivors)}/{len(alpha_list)} 个 Alpha 进行完整测试")
+        return survivors
+
+    def _screen_offline(self, alpha_list, rung):
+        """离线级: 在本地面板的最近 recent_days 个交易日上评估"""
+
+        keys = [SimulationCache.make_key(alpha) for alpha in alpha_list]
+        metrics = []
+        for alpha, key in zip(alpha_list, keys):
+            metric = self.screening_store.get(key, rung['name'])
+            if metric is None:
+                try:
+                    metric = self.offline_evaluator.score(alpha['regular'], recent_days=rung.get('recent_days'))
+                except ValueError:
+                    metric = None
+                if metric is not None:
+                    self.screening_store.put(key, rung['name'], alpha['regular'], metric)
+            metrics.append(metric)
+        return keys, metrics
+
+    def _screen_on_platform(self, alpha_list, rung):
+        """平台级: 用覆盖后的模拟设置(如更小的股票池)模拟，已筛选过的组合直接复用结果"""
+
+        screening_alphas = [
+            {**alpha, 'settings': {**alpha['settings'], **rung.get('settings', {})}} for alpha in alpha_list
+        ]
+        keys = [SimulationCache.make_key(alpha) for alpha in screening_alphas]
+        metrics = [self.screening_store.get(key, rung['name']) for key in keys]
+        pending = [(index, alpha) for index, alpha in enumerate(screening_alphas) if metrics[index] is None]
+
+        # 筛选模拟同样写入模拟日志，进程中断后可以恢复已提交的筛选模拟
+        self.journal.enqueue_screening([(alpha, alpha_list[index]) for index, alpha in pending], rung['name'])
+
+        def launch(item, on_done):
+            _, screening_alpha = item
+            print(f"  筛选[{rung['name']}]: {screening_alpha.get('regular', 'Unknown')[:50]}...")
+            self._launch_simulation(screening_alpha, lambda _, alpha_data: on_done(item, alpha_data))
+
+        for (index, screening_alpha), alpha_data in self._run_in_flight(
+                pending, launch, self.max_concurrent_simulations):
+            is_data = (alpha_data or {}).get('is', {})
+            if not is_data:
+                self.journal.mark_failed(screening_alpha)
+                continue
+            metrics[index] = is_data
+            self.screening_store.put(keys[index], rung['name'], screening_alpha['regular'], is_data,
+                                     alpha_data.get('id'))
+            self.journal.mark_persisted(screening_alpha)
+        return keys, metrics
+
+    @timed('simulate_single_alpha')
+    def _simulate_single_alpha(self, alpha):
+        """模拟单个 Alpha"""
+
+        try:
+            print(f"表达式: {alpha.get('regular', 'Unknown')}")
+
+            cached = self.simulation_cache.get(alpha, self.qualification_scorer)
+            if cached:
+                print(f"🗃️ 命中模拟缓存: {cached['alpha_id']}")
+                return cached
+
+            for _, alpha_data in self._run_in_flight([alpha], self._launch_simulation, 1):
+                result = self._build_alpha_result(alpha, alpha_data)
+                if result:
+                    self.simulation_cache.put(alpha, result)
+                return result
+            return None
 
         except Exception as e:
             print(f"⚠️ Alpha 模拟失败: {str(e)}")
             return None
 
     def check_alpha_qualification(self, alpha_data):
-        """检查 Alpha 是否满足所有提交条件"""
+        """检查 Alpha 是否满足当前阈值方案的提交条件"""
 
         try:
             # 从 'is' 字段获取指标
@@ -241,211 +956,199 @@ class BrainBatchAlpha:
                 print("❌ 无法获取指标数据")
                 return False
 
-            # 获取指标值
-            sharpe = float(is_data.get('sharpe', 0))
-            fitness = float(is_data.get('fitness', 0))
-            turnover = float(is_data.get('turnover', 0))
-            ic_mean = float(is_data.get('margin', 0))  # margin 对应 IC Mean
-
-            # 获取子宇宙 Sharpe
-            sub_universe_check = next(
-                (
-                    check for check in is_data.get('checks', [])
-                    if check['name'] == 'LOW_SUB_UNIVERSE_SHARPE'
-                ),
-                {}
-            )
-            subuniverse_sharpe = float(sub_universe_check.get('value', 0))
-            required_subuniverse_sharpe = float(sub_universe_check.get('limit', 0))
-
-            # 获取其他重要指标
-            returns = float(is_data.get('returns', 0))
-            drawdown = float(is_data.get('drawdown', 0))
-            capacity = float(is_data.get('capacity', 0))
-
-            # 打印指标
-            print("\n📊 Alpha 指标详情:")
-            print(f"  Sharpe: {sharpe:.3f} (>1.5)")
-            print(f"  Fitness: {fitness:.3f} (>1.0)")
-            print(f"  Turnover: {turnover:.3f} (0.1-0.9)")
-            print(f"  IC Mean: {ic_mean:.3f} (>0.02)")
-            print(f"  子宇宙 Sharpe: {subuniverse_sharpe:.3f} (>{required_subuniverse_sharpe:.3f})")
-            print(f"  收益率: {returns:.3f} (>0.05)")
-            print(f"  最大回撤: {drawdown:.3f} (<0.5)")
-            print(f"  容量: {capacity:.0f} (>1000000)")
-
-            print("\n📝 指标评估结果:")
-
-            # 检查每个指标并输出结果
-            is_qualified = True
-            near_qualified = 0  # 接近合格的指标数
-            total_checks = 8    # 总检查项数
-
-            # Sharpe ratio检查 (要求>1.5)
-            if sharpe >= 1.5:
-                print("✅ Sharpe ratio 达标")
-            elif sharpe >= 1.3:
-                print("⚠️ Sharpe ratio 接近达标 (>=1.3)")
-                near_qualified += 1
-            else:
-                print("❌ Sharpe ratio 不达标 (<1.3)")
-                is_qualified = False
-
-            # Fitness检查 (要求>1.0)
-            if fitness >= 1.0:
-                print("✅ Fitness 达标")
-            elif fitness >= 0.8:
-                print("⚠️ Fitness 接近达标 (>=0.8)")
-                near_qualified += 1
-            else:
-                print("❌ Fitness 不达标 (<0.8)")
-                is_qualified = False
-
-            # Turnover检查 (要求0.1-0.9)
-            if 0.1 <= turnover <= 0.9:
-                print("✅ Turnover 达标")
-            elif 0.05 <= turnover <= 0.95:
-                print("⚠️ Turnover 接近达标 (0.05-0.95)")
-                near_qualified += 1
-            else:
-                print("❌ Turnover 不在合理范围")
-                is_qualified = False
-
-            # IC Mean检查 (要求>0.02)
-            if ic_mean >= 0.02:
-                print("✅ IC Mean 达标")
-            elif ic_mean >= 0.015:
-                print("⚠️ IC Mean 接近达标 (>=0.015)")
-                near_qualified += 1
-            else:
-                print("❌ IC Mean 不达标 (<0.015)")
-                is_qualified = False
-
-            # 子宇宙 Sharpe检查
-            if subuniverse_sharpe >= required_subuniverse_sharpe:
-                print(f"✅ 子宇宙 Sharpe 达标 ({subuniverse_sharpe:.3f} > {required_subuniverse_sharpe:.3f})")
-            elif subuniverse_sharpe >= required_subuniverse_sharpe * 0.8:
-                print(f"⚠️ 子宇宙 Sharpe 接近达标 ({subuniverse_sharpe:.3f} > {required_subuniverse_sharpe * 0.8:.3f})")
-                near_qualified += 1
-            else:
-                print(f"❌ 子宇宙 Sharpe 不达标 ({subuniverse_sharpe:.3f} < {required_subuniverse_sharpe:.3f})")
-                is_qualified = False
-
-            # 收益率检查 (要求>0.05)
-            if returns >= 0.05:
-                print("✅ 收益率达标")
-            elif returns >= 0.03:
-                print("⚠️ 收益率接近达标 (>=0.03)")
-                near_qualified += 1
-            else:
-                print("❌ 收益率不达标 (<0.03)")
-                is_qualified = False
-
-            # 最大回撤检查 (要求<0.5)
-            if drawdown <= 0.5:
-                print("✅ 最大回撤达标")
-            elif drawdown <= 0.6:
-                print("⚠️ 最大回撤接近达标 (<=0.6)")
-                near_qualified += 1
-            else:
-                print("❌ 最大回撤过大 (>0.6)")
-                is_qualified = False
-
-            # 容量检查 (要求>1000000)
-            if capacity >= 1000000:
-                print("✅ 容量达标")
-            elif capacity >= 500000:
-                print("⚠️ 容量接近达标 (>=500000)")
-                near_qualified += 1
-            else:
-                print("❌ 容量不足 (<500000)")
-                is_qualified = False
-
-            print("\n🔍 检查项结果:")
-            checks = is_data.get('checks', [])
-            additional_failures = 0
-            for check in checks:
-                name = check.get('name')
-                result = check.get('result')
-                value = check.get('value', 'N/A')
-                limit = check.get('limit', 'N/A')
-
-                if result == 'PASS':
-                    print(f"✅ {name}: {value} (限制: {limit})")
-                elif result == 'FAIL':
-                    print(f"❌ {name}: {value} (限制: {limit})")
-                    # 对于额外的检查项，我们不直接导致整个Alpha不合格，但记录下来
-                    additional_failures += 1
-                elif result == 'PENDING':
-                    print(f"⚠️ {name}: 检查尚未完成")
-
-            print("\n📋 最终评判:")
-            # 如果80%以上的指标达标或接近达标，也认为是高质量Alpha
-            if is_qualified:
+            scored = self.qualification_scorer.score_records([alpha_data]).iloc[0]
+            icons = {'pass': '✅', 'near': '⚠️', 'fail': '❌'}
+            print("📊 " + " | ".join(
+                f"{icons[scored[f'status_{name}']]} {name} {scored[name]:.3g}"
+                for name in self.qualification_scorer.profile['checks']
+            ))
+
+            failed_checks = [check.get('name') for check in is_data.get('checks', []) if check.get('result') == 'FAIL']
+            if failed_checks:
+                # 平台检查项不直接导致不合格，只做记录
+                print(f"🔍 未通过的平台检查: {', '.join(failed_checks)}")
+
+            if scored['status'] == 'pass':
                 print("✅ Alpha 满足所有条件，可以提交!")
-            elif near_qualified >= total_checks * 0.75:  # 75%以上的指标达标或接近达标
-                print("🔶 Alpha 接近合格标准，建议保存以供进一步分析!")
+            elif scored['status'] == 'near_pass':
                 # 仍然保存接近合格的Alpha
-                return True
+                print("🔶 Alpha 接近合格标准，建议保存以供进一步分析!")
             else:
                 print("❌ Alpha 未达到提交标准")
 
-            return is_qualified
+            return bool(scored['qualified'])
 
         except Exception as e:
             print(f"❌ 检查 Alpha 资格时出错: {str(e)}")
             return False
 
+    @timed('submit_alpha')
     def submit_alpha(self, alpha_id):
         """提交单个 Alpha"""
 
-        submit_url = f"{self.API_BASE_URL}/alphas/{alpha_id}/submit"
+        for _, (success, _) in self._run_in_flight([alpha_id], self._launch_submission, 1):
+            return success
+        return False
+
+    def _launch_submission(self, alpha_id, on_done, attempt=0):
+        """发送提交请求并把提交状态交给调度器跟踪
 
-        for attempt in range(5):
-            print(f"🔄 第 {attempt + 1} 次尝试提交 Alpha {alpha_id}")
+        完成时调用 on_done(alpha_id, (是否成功, 拒绝原因))。平台明确拒绝(检查未通过，或
+        SUBMIT_TRANSIENT_STATUSES 以外的 4xx)时拒绝原因为字符串，网络错误、限流、重试耗尽等
+        暂时性失败时为 None。
+        """
 
+        submit_url = f"{self.API_BASE_URL}/alphas/{alpha_id}/submit"
+        print(f"🔄 第 {attempt + 1} 次尝试提交 Alpha {alpha_id}")
+
+        try:
             # POST 请求
             res = self.session.post(submit_url)
             if res.status_code == 201:
                 print("✅ POST: 成功，等待提交完成...")
             elif res.status_code in [400, 403]:
                 print(f"❌ 提交被拒绝 ({res.status_code})")
-                return False
+                on_done(alpha_id, (False, f"HTTP {res.status_code}"))
+                return
+            elif attempt + 1 < self.MAX_SUBMIT_ATTEMPTS:
+                retry_after = float(res.headers.get('Retry-After', 3))
+                self.scheduler.call_later(retry_after, self._launch_submission, alpha_id, on_done, attempt + 1)
+                return
             else:
-                sleep(3)
-                continue
-
-            # 检查提交状态
-            while True:
-                res = self.session.get(submit_url)
-                retry = float(res.headers.get('Retry-After', 0))
+                on_done(alpha_id, (False, None))
+                return
 
-                if retry == 0:
-                    if res.status_code == 200:
-                        print("✅ 提交成功!")
-                        return True
-                    return False
+        except Exception as e:
+            print(f"❌ 提交 Alpha {alpha_id} 时出错: {str(e)}")
+            on_done(alpha_id, (False, None))
+            return
 
-                sleep(retry)
+        def on_complete(res):
+            if res.status_code == 200:
+                print(f"✅ Alpha {alpha_id} 提交成功!")
+                on_done(alpha_id, (True, None))
+                return
 
-        return False
+            failed_checks = []
+            try:
+                checks = (res.json() or {}).get('is', {}).get('checks', [])
+                failed_checks = [check.get('name') for check in checks if check.get('result') == 'FAIL']
+            except ValueError:
+                pass
+            print(f"❌ Alpha {alpha_id} 提交未通过 ({res.status_code})"
+                  + (f": {', '.join(failed_checks)}" if failed_checks else ""))
+            # 检查未通过或 4xx 是平台的明确拒绝；限流、会话过期等 4xx 和其余状态码按暂时性失败处理
+            if failed_checks or (400 <= res.status_code < 500
+                                 and res.status_code not in self.SUBMIT_TRANSIENT_STATUSES):
+                on_done(alpha_id, (False, ', '.join(failed_checks) or f"HTTP {res.status_code}"))
+            else:
+                on_done(alpha_id, (False, None))
 
-    def submit_multiple_alphas(self, alpha_ids):
+        def on_error(e):
+            # 错误状态码(如检查未通过的 403)带有响应，与完成时一样判断是否为明确拒绝
+            if getattr(e, 'response', None) is not None:
+                on_complete(e.response)
+            else:
+                on_done(alpha_id, (False, None))
+
+        # 检查提交状态
+        self.scheduler.watch(submit_url, on_complete=on_complete, on_error=on_error)
+
+    def iter_submissions(self, alpha_ids, max_concurrent=None):
+        """流水线提交多个 Alpha，按完成顺序产出 (alpha_id, 是否成功, 拒绝原因)
+
+        最多 max_concurrent 个提交同时进行，请求间隔由会话的速率控制器统一管理。
+        拒绝原因只在平台明确拒绝时为字符串，暂时性失败时为 None。
+        """
+
+        if max_concurrent is None:
+            max_concurrent = self.MAX_CONCURRENT_SUBMISSIONS
+        alpha_ids = list(dict.fromkeys(alpha_ids))  # 去重并保持顺序
+        if not alpha_ids:
+            return
+        for alpha_id, (success, rejection) in self._run_in_flight(
+                alpha_ids, self._launch_submission, max(1, min(max_concurrent, len(alpha_ids)))):
+            if success:
+                telemetry.increment('submissions.succeeded')
+            else:
+                telemetry.increment('submissions.rejected' if rejection else 'submissions.failed')
+            if success and self.self_correlation is not None:
+                self.self_correlation.add([alpha_id])
+            yield alpha_id, success, rejection
+
+    def _get_self_correlation_engine(self):
+        """获取自相关引擎，首次使用时用提交队列中已提交的 Alpha 建立组合"""
+
+        if self.self_correlation is None:
+            self.self_correlation = SelfCorrelationEngine(self.pnl_store, self.SELF_CORRELATION_THRESHOLD)
+            submitted = [entry['alpha_id'] for entry in self.submission_queue.get_entries('submitted')]
+            loaded = self.self_correlation.add(submitted)
+            print(f"🔗 自相关组合: 已加载 {loaded}/{len(submitted)} 个已提交 Alpha 的 PnL")
+        return self.self_correlation
+
+    def _filter_self_correlated(self, alpha_ids):
+        """提交前剔除与已提交组合(或本批中排在前面的候选)相关性过高的 Alpha
+
+        返回 (保留的 alpha_id 列表, {被剔除的 alpha_id: (相关系数, 最相关的 alpha_id)})。
+        """
+
+        kept, dropped = self._get_self_correlation_engine().filter_candidates(alpha_ids)
+        telemetry.increment('submissions.self_correlation_rejected', len(dropped))
+        for alpha_id, (corr, peer) in dropped.items():
+            print(f"🔗 跳过 Alpha {alpha_id}: 与 {peer} 的相关性 {corr:.3f} 超过 {self.SELF_CORRELATION_THRESHOLD}")
+        return kept, dropped
+
+    def submit_multiple_alphas(self, alpha_ids, max_concurrent=None):
         """批量提交 Alpha"""
         successful = []
         failed = []
 
-        for alpha_id in alpha_ids:
-            if self.submit_alpha(alpha_id):
-                successful.append(alpha_id)
-            else:
+        total = len(set(alpha_ids))
+        alpha_ids, dropped = self._filter_self_correlated(alpha_ids)
+        failed.extend(dropped)
+        for alpha_id, success, _ in self.iter_submissions(alpha_ids, max_concurrent):
+            (successful if success else failed).append(alpha_id)
+            print(f"📬 提交进度: {len(successful) + len(failed)}/{total} (成功 {len(successful)}, 失败 {len(failed)})")
+
+        return successful, failed
+
+    def submit_queued_alphas(self, limit, max_concurrent=None):
+        """从提交队列认领最多 limit 个 Alpha 并提交，返回 (成功列表, 失败列表)"""
+
+        alpha_ids = self.submission_queue.claim(limit)
+        if not alpha_ids:
+            print("❌ 提交队列中没有待提交的Alpha")
+            return [], []
+
+        successful = []
+        failed = []
+        try:
+            candidates, dropped = self._filter_self_correlated(alpha_ids)
+            for alpha_id, (corr, peer) in dropped.items():
+                self.submission_queue.mark_rejected(alpha_id, f"SELF_CORRELATION {corr:.3f} ({peer})")
                 failed.append(alpha_id)
 
-            if alpha_id != alpha_ids[-1]:
-                sleep(10)
+            for alpha_id, success, rejection in self.iter_submissions(candidates, max_concurrent):
+                if success:
+                    self.submission_queue.mark_submitted(alpha_id)
+                    successful.append(alpha_id)
+                else:
+                    # 平台明确拒绝的不再重试，暂时性失败放回队列等待重试
+                    if rejection:
+                        self.submission_queue.mark_rejected(alpha_id, rejection)
+                    else:
+                        self.submission_queue.mark_failed(alpha_id)
+                    failed.append(alpha_id)
+        finally:
+            # 中断时把尚未得到结果的认领放回队列
+            self.submission_queue.release([
+                alpha_id for alpha_id in alpha_ids if alpha_id not in successful and alpha_id not in failed
+            ])
 
+        print(f"📬 本次提交: 成功 {len(successful)} 个, 失败 {len(failed)} 个")
         return successful, failed
 
+    @timed('get_datafields')
     def _get_datafields_if_none(self, datafields=None, dataset_name=None):
         """获取数据字段列表"""
 
@@ -469,6 +1172,14 @@ class BrainBatchAlpha:
                 'delay': '1',
                 'universe': config['universe']
             }
+            catalog_key = self.datafield_catalog.make_key(
+                search_scope['region'], search_scope['delay'], search_scope['universe'], config['id'])
+
+            # 本地目录未过期时直接使用，不再访问 API
+            cached = self.datafield_catalog.get_entry(catalog_key)
+            if cached and cached['fresh'] and cached['fields']:
+                print(f"🗂️ 使用本地数据字段目录 ({len(cached['fields'])} 个字段，更新于 {cached['fetched_at']})")
+                return self._select_datafields(cached['fields'], config)
 
             url_template = (
                 f"{self.API_BASE_URL}/data-fields?"
@@ -477,7 +1188,7 @@ class BrainBatchAlpha:
                 f"&delay={search_scope['delay']}"
                 f"&universe={search_scope['universe']}"
                 f"&dataset.id={config['id']}"
-                "&limit=50&offset={offset}"
+                f"&limit={self.DATAFIELD_PAGE_SIZE}&offset={{offset}}"
             )
 
             print(f"🔍 正在获取数据集 '{dataset_name}' 的字段信息...")
@@ -485,99 +1196,42 @@ class BrainBatchAlpha:
             # 获取总数
             initial_resp = self.session.get(url_template.format(offset=0))
             if initial_resp.status_code != 200:
-                print("⚠️ 获取数据字段失败，尝试使用配置中的默认字段...")
-                default_fields = config.get('default_fields', [])
-                if default_fields:
-                    print(f"✅ 使用配置中的默认字段: {', '.join(default_fields)}")
-                    return default_fields
-                else:
-                    # 使用全局默认字段
-                    fallback_fields = [
-                        'close', 'open', 'high', 'low', 'volume', 
-                        'returns', 'vwap', 'turnover', 'cap', 'market_cap'
-                    ]
-                    print(f"⚠️ 使用全局默认字段: {', '.join(fallback_fields)}")
-                    return fallback_fields
-
-            total_count = initial_resp.json().get('count', 0)
+                if cached and cached['fields']:
+                    print("⚠️ 获取数据字段失败，使用已过期的本地目录...")
+                    return self._select_datafields(cached['fields'], config)
+                return self._fallback_datafields(config, "⚠️ 获取数据字段失败，尝试使用配置中的默认字段...")
+
+            initial_data = initial_resp.json()
+            total_count = initial_data.get('count', 0)
             print(f"📊 数据集 {dataset_name} 总共有 {total_count} 个字段")
 
             if total_count == 0:
-                print("⚠️ 数据集没有任何字段，尝试使用配置中的默认字段...")
-                default_fields = config.get('default_fields', [])
-                if default_fields:
-                    print(f"✅ 使用配置中的默认字段: {', '.join(default_fields)}")
-                    return default_fields
-                else:
-                    # 使用全局默认字段
-                    fallback_fields = [
-                        'close', 'open', 'high', 'low', 'volume', 
-                        'returns', 'vwap', 'turnover', 'cap', 'market_cap'
-                    ]
-                    print(f"⚠️ 使用全局默认字段: {', '.join(fallback_fields)}")
-                    return fallback_fields
-
-            # 获取所有数据字段
-            all_fields = []
-            for offset in range(0, total_count, 50):
-                resp = self.session.get(url_template.format(offset=offset))
-                if resp.status_code != 200:
-                    print(f"⚠️ 获取字段偏移量 {offset} 时出错")
-                    continue
-                resp_data = resp.json()
-                if 'results' in resp_data:
-                    all_fields.extend(resp_data['results'])
-                else:
-                    print(f"⚠️ 响应中没有找到 'results' 字段，偏移量: {offset}")
-
-            # 尝试多种方式获取字段
-            matrix_fields = []
-            numeric_fields = []
-            all_field_ids = []
-            
-            for field in all_fields:
-                field_id = field.get('id')
-                field_type = field.get('type')
-                
-                if field_id:
-                    all_field_ids.append(field_id)
-                    
-                if field_type == 'MATRIX':
-                    matrix_fields.append(field_id)
-                elif field_type == 'FLOAT' or field_type == 'INTEGER':
-                    numeric_fields.append(field_id)
-
-            # 按优先级选择字段
-            selected_fields = []
-            if matrix_fields:
-                selected_fields = matrix_fields
-                print(f"✅ 找到 {len(matrix_fields)} 个MATRIX类型字段")
-            elif numeric_fields:
-                selected_fields = numeric_fields[:20]  # 限制数量
-                print(f"✅ 找到 {len(numeric_fields)} 个数值类型字段，使用前20个")
-            elif all_field_ids:
-                selected_fields = all_field_ids[:20]  # 限制数量
-                print(f"✅ 找到 {len(all_field_ids)} 个字段，使用前20个")
-            else:
-                # 使用数据集配置中的默认字段
-                default_fields = config.get('default_fields', [])
-                if default_fields:
-                    selected_fields = default_fields
-                    print(f"⚠️ 未找到合适的字段，使用配置中的默认字段: {', '.join(default_fields)}")
-                else:
-                    # 使用全局默认字段
-                    selected_fields = [
-                        'close', 'open', 'high', 'low', 'volume', 
-                        'returns', 'vwap', 'turnover', 'cap', 'market_cap'
-                    ]
-                    print(f"⚠️ 未找到合适的字段，使用全局默认字段: {', '.join(selected_fields)}")
-
-            if not selected_fields:
-                print("❌ 未能获取到任何可用的数据字段")
-                return None
-
-            print(f"✅ 最终获取到 {len(selected_fields)} 个数据字段")
-            return selected_fields
+                return self._fallback_datafields(config, "⚠️ 数据集没有任何字段，尝试使用配置中的默认字段...")
+
+            # 目录已过期但字段总数没有变化时，认为目录未变，只刷新有效期
+            if cached and cached['fields'] and cached['total_count'] == total_count:
+                self.datafield_catalog.touch(catalog_key)
+                print("🗂️ 字段总数未变化，继续使用本地数据字段目录")
+                return self._select_datafields(cached['fields'], config)
+
+            # 第一页之后的分页并发获取
+            all_fields = list(initial_data.get('results', []))
+            offsets = list(range(self.DATAFIELD_PAGE_SIZE, total_count, self.DATAFIELD_PAGE_SIZE))
+            complete = True
+            if offsets:
+                with ThreadPoolExecutor(max_workers=min(self.DATAFIELD_FETCH_WORKERS, len(offsets))) as executor:
+                    pages = executor.map(lambda offset: self._fetch_datafield_page(url_template, offset), offsets)
+                    for page in pages:
+                        if page is None:
+                            complete = False
+                        else:
+                            all_fields.extend(page)
+
+            # 只有完整获取的目录才写入缓存
+            if complete:
+                self.datafield_catalog.store(catalog_key, all_fields, total_count)
+
+            return self._select_datafields(all_fields, config)
 
         except Exception as e:
             print(f"❌ 获取数据字段时出错: {str(e)}")
@@ -596,12 +1250,167 @@ class BrainBatchAlpha:
                 print(f"⚠️ 使用全局默认字段作为备选方案: {', '.join(fallback_fields)}")
                 return fallback_fields
 
-    def _generate_alpha_list(self, datafields, strategy_mode, previous_results=None):
-        """生成 Alpha 表达式列表"""
+    def _fetch_datafield_page(self, url_template, offset):
+        """获取一页数据字段，失败时返回 None"""
+
+        try:
+            resp = self.session.get(url_template.format(offset=offset))
+            if resp.status_code != 200:
+                print(f"⚠️ 获取字段偏移量 {offset} 时出错")
+                return None
+            resp_data = resp.json()
+            if 'results' not in resp_data:
+                print(f"⚠️ 响应中没有找到 'results' 字段，偏移量: {offset}")
+                return None
+            return resp_data['results']
+        except Exception as e:
+            print(f"⚠️ 获取字段偏移量 {offset} 时出错: {str(e)}")
+            return None
+
+    def _fallback_datafields(self, config, message):
+        """无法从 API 获取字段时使用配置中的默认字段"""
+
+        print(message)
+        default_fields = config.get('default_fields', [])
+        if default_fields:
+            print(f"✅ 使用配置中的默认字段: {', '.join(default_fields)}")
+            return default_fields
+        else:
+            # 使用全局默认字段
+            fallback_fields = [
+                'close', 'open', 'high', 'low', 'volume', 
+                'returns', 'vwap', 'turnover', 'cap', 'market_cap'
+            ]
+            print(f"⚠️ 使用全局默认字段: {', '.join(fallback_fields)}")
+            return fallback_fields
+
+    def _select_datafields(self, all_fields, config):
+        """从字段目录中按类型优先级选择字段"""
+
+        # 尝试多种方式获取字段
+        matrix_fields = []
+        numeric_fields = []
+        all_field_ids = []
+        
+        for field in all_fields:
+            field_id = field.get('id')
+            field_type = field.get('type')
+            
+            if field_id:
+                all_field_ids.append(field_id)
+                
+            if field_type == 'MATRIX':
+                matrix_fields.append(field_id)
+            elif field_type == 'FLOAT' or field_type == 'INTEGER':
+                numeric_fields.append(field_id)
+
+        # 按优先级选择字段
+        selected_fields = []
+        if matrix_fields:
+            selected_fields = matrix_fields
+            print(f"✅ 找到 {len(matrix_fields)} 个MATRIX类型字段")
+        elif numeric_fields:
+            selected_fields = numeric_fields[:20]  # 限制数量
+            print(f"✅ 找到 {len(numeric_fields)} 个数值类型字段，使用前20个")
+        elif all_field_ids:
+            selected_fields = all_field_ids[:20]  # 限制数量
+            print(f"✅ 找到 {len(all_field_ids)} 个字段，使用前20个")
+        else:
+            # 使用数据集配置中的默认字段
+            default_fields = config.get('default_fields', [])
+            if default_fields:
+                selected_fields = default_fields
+                print(f"⚠️ 未找到合适的字段，使用配置中的默认字段: {', '.join(default_fields)}")
+            else:
+                # 使用全局默认字段
+                selected_fields = [
+                    'close', 'open', 'high', 'low', 'volume', 
+                    'returns', 'vwap', 'turnover', 'cap', 'market_cap'
+                ]
+                print(f"⚠️ 未找到合适的字段，使用全局默认字段: {', '.join(selected_fields)}")
+
+        if not selected_fields:
+            print("❌ 未能获取到任何可用的数据字段")
+            return None
+
+        print(f"✅ 最终获取到 {len(selected_fields)} 个数据字段")
+        return selected_fields
+
+    def _build_simulation_data(self, expression, settings=None):
+        """构建模拟请求，settings 覆盖默认模拟设置中的对应字段"""
+        return {
+            'type': 'REGULAR',
+            'settings': {**self.DEFAULT_SIMULATION_SETTINGS, **(settings or {})},
+            'regular': expression
+        }
+
+    def _generate_adaptive_alpha_list(self, datafields, dataset_name, budget=None):
+        """自适应分配模式: 按各臂的后验把本轮名额分给模板族 × 设置变体"""
+        dataset = dataset_name or 'default'
+        space = self.optimized_strategy_generator.get_search_space(datafields)
+        allocation = self.budget_allocator.allocate(
+            [family.name for family in space.families], dataset, budget or self.MAX_STRATEGIES_PER_ROUND)
+
+        print("🎰 本轮名额分配:")
+        for (family, variant), count in sorted(allocation.items(), key=lambda item: -item[1])[:5]:
+            print(f"  {family} / {variant}: {count}")
+
+        self._alpha_arms = {}
+        alpha_list = []
+        # 按设置变体分组排列，多模拟模式下同一请求内的设置一致
+        for (family, variant), count in sorted(allocation.items(), key=lambda item: item[0][::-1]):
+            expressions = self.optimized_strategy_generator.generate_family_strategy(datafields, family)
+            for expression in itertools.islice(expressions, count):
+                alpha = self._build_simulation_data(expression, SETTINGS_VARIANTS[variant])
+                self._alpha_arms[SimulationCache.make_key(alpha)] = (family, dataset, variant)
+                alpha_list.append(alpha)
+
+        print(f"生成了 {len(alpha_list)} 个Alpha表达式")
+        return alpha_list
+
+    def _evolve_candidates(self, datafields, count):
+        """遗传编程模式: 用历史记录更新种群，进化后返回尚未模拟的候选"""
+        if self.genetic_search is None or self.genetic_search.datafields != list(datafields):
+            self.genetic_search = GeneticSearch(datafields, evaluator=self.offline_evaluator)
+        self.genetic_search.seed_population(self.history_manager.get_history(self.GENETIC_HISTORY_LIMIT))
+        candidates = self.genetic_search.propose(count)
+        print(f"🧬 遗传搜索: 归档 {len(self.genetic_search.archive)} 个个体，提出 {len(candidates)} 个候选")
+        return candidates
+
+    def _credit_arm(self, alpha, result):
+        """把新模拟的结果记入对应臂的后验(非自适应模式生成的 Alpha 不做处理)"""
+        arm = self._alpha_arms.pop(SimulationCache.make_key(alpha), None)
+        if arm:
+            self.budget_allocator.update(*arm, result.get('passed_all_checks'),
+                                         (result.get('metrics') or {}).get('sharpe'))
+
+    def _generate_alpha_list(self, datafields, strategy_mode, previous_results=None, dataset_name=None, budget=None,
+                             surrogate_ready=False):
+        """生成 Alpha 表达式列表，budget 默认为 MAX_STRATEGIES_PER_ROUND
+
+        surrogate_ready: 本轮代理模型是否可用(由调用方训练后传入)
+        """
         try:
-            # 对于所有策略模式，都使用优化策略生成器并传入历史结果
-            strategies = self.optimized_strategy_generator.get_optimized_simulation_data(
-                datafields, strategy_mode, previous_results)
+            if strategy_mode == self.ADAPTIVE_MODE:
+                return self._generate_adaptive_alpha_list(datafields, dataset_name, budget)
+
+            # 策略生成器是惰性的: 边生成边按结构哈希去重，凑满本轮数量后即停止，
+            # 开销只与本轮数量有关，而与字段数 × 模板数无关
+            budget = budget or self.MAX_STRATEGIES_PER_ROUND
+            # 代理模型可用时多生成一些候选，模拟前按预测排序后截取
+            if surrogate_ready:
+                budget *= self.SURROGATE_POOL_FACTOR
+
+            if strategy_mode == self.GENETIC_MODE:
+                source = self._evolve_candidates(datafields, budget)
+                if not source:
+                    print("⚠️ 历史记录不足以组成种群，先用基础策略生成初始种群...")
+                    source = self.optimized_strategy_generator.get_optimized_simulation_data(datafields, 1)
+            else:
+                # 对于其他策略模式，都使用优化策略生成器并传入历史结果
+                source = self.optimized_strategy_generator.get_optimized_simulation_data(
+                    datafields, strategy_mode, previous_results)
+            strategies = list(iter_unique_expressions(source, limit=budget))
             
             # 如果优化策略生成器没有返回任何策略，则使用基础策略生成器作为备选方案
             if not strategies:
@@ -609,85 +1418,35 @@ class BrainBatchAlpha:
                 # 初始化策略生成器
                 strategy_generator = AlphaStrategy()
                 # 生成策略列表
-                strategies = strategy_generator.get_simulation_data(datafields, strategy_mode)
+                strategies = list(iter_unique_expressions(
+                    strategy_generator.get_simulation_data(datafields, strategy_mode), limit=budget))
                 
                 # 如果仍然没有策略，则生成一些默认策略
                 if not strategies:
                     print("⚠️ 基础策略生成器未生成任何策略，生成默认策略...")
-                    strategies = self._generate_default_strategies(datafields)
+                    strategies = list(iter_unique_expressions(self._generate_default_strategies(datafields), limit=budget))
 
-            # 限制策略数量，避免过多的策略导致处理时间过长
-            if len(strategies) > 50:
-                print(f"⚠️ 策略数量过多 ({len(strategies)})，限制为50个")
-                strategies = strategies[:50]
-            elif len(strategies) == 0:
+            if not strategies:
                 print("❌ 未能生成任何策略")
                 return []
 
             print(f"生成了 {len(strategies)} 个Alpha表达式")
 
             # 转换为 API 所需的格式
-            alpha_list = []
-            for strategy in strategies:
-                simulation_data = {
-                    'type': 'REGULAR',
-                    'settings': {
-                        'instrumentType': 'EQUITY',
-                        'region': 'USA',
-                        'universe': 'TOP3000',
-                        'delay': 1,
-                        'decay': 0,
-                        'neutralization': 'SUBINDUSTRY',
-                        'truncation': 0.08,
-                        'pasteurization': 'ON',
-                        'unitHandling': 'VERIFY',
-                        'nanHandling': 'ON',
-                        'language': 'FASTEXPR',
-                        'visualization': False,
-                    },
-                    'regular': strategy
-                }
-                alpha_list.append(simulation_data)
-
-            return alpha_list
+            return [self._build_simulation_data(strategy) for strategy in strategies]
 
         except Exception as e:
             print(f"❌ 生成 Alpha 列表失败: {str(e)}")
             # 出错时生成默认策略
             try:
                 default_strategies = self._generate_default_strategies(datafields if datafields else [])
-                alpha_list = []
-                for strategy in default_strategies:
-                    simulation_data = {
-                        'type': 'REGULAR',
-                        'settings': {
-                            'instrumentType': 'EQUITY',
-                            'region': 'USA',
-                            'universe': 'TOP3000',
-                            'delay': 1,
-                            'decay': 0,
-                            'neutralization': 'SUBINDUSTRY',
-                            'truncation': 0.08,
-                            'pasteurization': 'ON',
-                            'unitHandling': 'VERIFY',
-                            'nanHandling': 'ON',
-                            'language': 'FASTEXPR',
-                            'visualization': False,
-                        },
-                        'regular': strategy
-                    }
-                    alpha_list.append(simulation_data)
-                return alpha_list
+                return [self._build_simulation_data(strategy) for strategy in default_strategies]
             except:
                 return []
             
     def _save_alpha_id(self, alpha_id, alpha_data):
-        """保存 Alpha ID 到文件"""
-        try:
-            with open("alpha_ids.txt", "a") as f:
-                f.write(f"{alpha_id}\n")
-        except Exception as e:
-            print(f"❌ 保存 Alpha ID 时出错: {str(e)}")
+        """把 Alpha ID 加入提交队列(重复的 ID 会被忽略)"""
+        self.submission_queue.add(alpha_id, alpha_data.get('expression'))
             
     def _generate_default_strategies(self, datafields):
         """生成默认策略，确保始终有策略可以测试"""
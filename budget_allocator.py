@@ -0,0 +1,160 @@
+"""模拟预算分配模块 - 用 Thompson 采样在模板族 × 数据集 × 模拟设置之间分配每轮的模拟名额"""
+
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+
+
+# 参与分配的模拟设置变体，值为覆盖默认模拟设置的字段
+SETTINGS_VARIANTS = {
+    'subindustry': {'neutralization': 'SUBINDUSTRY', 'decay': 0},
+    'industry_decay4': {'neutralization': 'INDUSTRY', 'decay': 4},
+    'market_decay8': {'neutralization': 'MARKET', 'decay': 8, 'truncation': 0.05},
+}
+
+
+def make_arm_key(family, dataset, settings):
+    return f"{family}|{dataset}|{settings}"
+
+
+class BudgetAllocator:
+    """多臂老虎机预算分配器，后验存储在 alpha_history.db 中
+
+    每个臂是 (模板族, 数据集, 设置变体) 的组合。合格率使用 Beta(1 + 合格数, 1 + 不合格数)
+    后验，Sharpe 均值使用以 0 为先验均值的正态近似后验。每个名额独立地从各臂的后验中
+    抽样并分给得分最高的臂(概率匹配)，表现好的臂得到更多名额，不确定的臂仍有机会被探索。
+    """
+
+    TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+    # 得分 = 合格率抽样 + SHARPE_WEIGHT × Sharpe 均值抽样
+    SHARPE_WEIGHT = 0.05
+    # Sharpe 先验: 均值 0、标准差 1，相当于 1 个伪观测
+    SHARPE_PRIOR_STD = 1.0
+
+    def __init__(self, db_file="alpha_history.db", seed=None):
+        """初始化分配器"""
+        self.db_file = db_file
+        self.rng = np.random.default_rng(seed)
+        self.init_database()
+
+    def init_database(self):
+        """初始化后验表"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS bandit_arms (
+                        arm_key TEXT PRIMARY KEY,
+                        family TEXT,
+                        dataset TEXT,
+                        settings TEXT,
+                        trials INTEGER DEFAULT 0,
+                        successes INTEGER DEFAULT 0,
+                        sharpe_sum REAL DEFAULT 0,
+                        sharpe_sq_sum REAL DEFAULT 0,
+                        updated_at TEXT
+                    )
+                ''')
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 初始化预算分配表时出错: {str(e)}")
+
+    def get_arms(self, dataset=None):
+        """读取各臂的统计，返回 {arm_key: 统计字典}"""
+        query = 'SELECT arm_key, family, dataset, settings, trials, successes, sharpe_sum, sharpe_sq_sum FROM bandit_arms'
+        params = []
+        if dataset is not None:
+            query += ' WHERE dataset = ?'
+            params.append(dataset)
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                return {
+                    row[0]: {
+                        'family': row[1], 'dataset': row[2], 'settings': row[3], 'trials': row[4],
+                        'successes': row[5], 'sharpe_sum': row[6], 'sharpe_sq_sum': row[7],
+                    }
+                    for row in conn.execute(query, params)
+                }
+        except Exception as e:
+            print(f"⚠️ 读取预算分配统计时出错: {str(e)}")
+            return {}
+
+    def update(self, family, dataset, settings, qualified, sharpe=None):
+        """记录一次模拟的结果"""
+        sharpe = float(sharpe or 0.0)
+        now = datetime.now().strftime(self.TIME_FORMAT)
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                conn.execute('''
+                    INSERT INTO bandit_arms
+                    (arm_key, family, dataset, settings, trials, successes, sharpe_sum, sharpe_sq_sum, updated_at)
+                    VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+                    ON CONFLICT(arm_key) DO UPDATE SET
+                        trials = trials + 1,
+                        successes = successes + excluded.successes,
+                        sharpe_sum = sharpe_sum + excluded.sharpe_sum,
+                        sharpe_sq_sum = sharpe_sq_sum + excluded.sharpe_sq_sum,
+                        updated_at = excluded.updated_at
+                ''', (make_arm_key(family, dataset, settings), family, dataset, settings,
+                      int(bool(qualified)), sharpe, sharpe * sharpe, now))
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 更新预算分配统计时出错: {str(e)}")
+
+    def _posterior_draws(self, stats, draws):
+        """为每个臂抽取 draws 个得分，返回形状为 (draws, 臂数) 的矩阵"""
+        trials = np.array([s['trials'] for s in stats], dtype=float)
+        successes = np.array([s['successes'] for s in stats], dtype=float)
+        sharpe_sum = np.array([s['sharpe_sum'] for s in stats], dtype=float)
+        sharpe_sq_sum = np.array([s['sharpe_sq_sum'] for s in stats], dtype=float)
+
+        rates = self.rng.beta(1 + successes, 1 + trials - successes, size=(draws, len(stats)))
+
+        # 先验作为一个均值为 0 的伪观测；观测方差不足时使用先验方差
+        mean = sharpe_sum / (trials + 1)
+        variance = np.where(
+            trials > 1,
+            (sharpe_sq_sum - sharpe_sum ** 2 / np.maximum(trials, 1)) / np.maximum(trials - 1, 1),
+            self.SHARPE_PRIOR_STD ** 2
+        )
+        std = np.sqrt(np.maximum(variance, 1e-6) / (trials + 1))
+        sharpes = self.rng.normal(mean, std, size=(draws, len(stats)))
+        return rates + self.SHARPE_WEIGHT * sharpes
+
+    def allocate(self, families, dataset, slots, settings=None):
+        """把 slots 个名额分配给各臂
+
+        families: 候选模板族名称列表
+        settings: 候选设置变体名称列表，默认使用全部 SETTINGS_VARIANTS
+        返回 {(模板族, 设置变体): 名额数}，只包含分到名额的臂。
+        """
+        settings = list(settings or SETTINGS_VARIANTS)
+        arms = [(family, variant) for family in families for variant in settings]
+        if not arms or slots <= 0:
+            return {}
+
+        known = self.get_arms(dataset)
+        empty = {'trials': 0, 'successes': 0, 'sharpe_sum': 0.0, 'sharpe_sq_sum': 0.0}
+        stats = [known.get(make_arm_key(family, dataset, variant), empty) for family, variant in arms]
+
+        winners = self._posterior_draws(stats, slots).argmax(axis=1)
+        counts = np.bincount(winners, minlength=len(arms))
+        return {arms[i]: int(count) for i, count in enumerate(counts) if count}
+
+    def get_summary(self, dataset=None):
+        """按后验合格率均值排序的各臂统计"""
+        summary = []
+        for stats in self.get_arms(dataset).values():
+            trials = stats['trials']
+            summary.append({
+                'family': stats['family'],
+                'dataset': stats['dataset'],
+                'settings': stats['settings'],
+                'trials': trials,
+                'qualified': stats['successes'],
+                'expected_rate': (1 + stats['successes']) / (2 + trials),
+                'mean_sharpe': stats['sharpe_sum'] / trials if trials else None,
+            })
+        summary.sort(key=lambda item: item['expected_rate'], reverse=True)
+        return summary
@@ -0,0 +1,174 @@
+"""数据字段目录缓存模块 - 在本地持久化 /data-fields 的查询结果"""
+
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+
+class DatafieldCatalog:
+    """按 (region, delay, universe, dataset.id) 缓存数据字段目录，存储在 alpha_history.db 中"""
+
+    TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+    def __init__(self, db_file="alpha_history.db", ttl_hours=24):
+        """初始化数据字段目录
+
+        ttl_hours: 目录有效小时数，过期后需要向服务端确认是否有变化
+        """
+        self.db_file = db_file
+        self.ttl_hours = ttl_hours
+        self.init_database()
+
+    def init_database(self):
+        """初始化目录表"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS datafield_catalog (
+                        region TEXT,
+                        delay TEXT,
+                        universe TEXT,
+                        dataset_id TEXT,
+                        field_id TEXT,
+                        type TEXT,
+                        coverage REAL,
+                        description TEXT,
+                        raw TEXT,  -- JSON格式存储完整字段信息
+                        PRIMARY KEY (region, delay, universe, dataset_id, field_id)
+                    )
+                ''')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS datafield_catalog_meta (
+                        region TEXT,
+                        delay TEXT,
+                        universe TEXT,
+                        dataset_id TEXT,
+                        total_count INTEGER,
+                        fetched_at TEXT,
+                        PRIMARY KEY (region, delay, universe, dataset_id)
+                    )
+                ''')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_datafield_catalog_field ON datafield_catalog (field_id)')
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 初始化数据字段目录时出错: {str(e)}")
+
+    @staticmethod
+    def make_key(region, delay, universe, dataset_id):
+        """生成目录键"""
+        return (str(region), str(delay), str(universe), str(dataset_id))
+
+    def get_entry(self, key):
+        """获取目录条目
+
+        返回 {'fields': [...], 'total_count': n, 'fetched_at': ..., 'fresh': bool}，不存在时返回 None
+        """
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT total_count, fetched_at FROM datafield_catalog_meta
+                    WHERE region = ? AND delay = ? AND universe = ? AND dataset_id = ?
+                ''', key)
+                meta = cursor.fetchone()
+                if meta is None:
+                    return None
+
+                cursor.execute('''
+                    SELECT raw FROM datafield_catalog
+                    WHERE region = ? AND delay = ? AND universe = ? AND dataset_id = ?
+                    ORDER BY rowid  -- 保持 API 返回的顺序
+                ''', key)
+                fields = [json.loads(row[0]) for row in cursor.fetchall()]
+
+        except Exception as e:
+            print(f"⚠️ 读取数据字段目录时出错: {str(e)}")
+            return None
+
+        cutoff = (datetime.now() - timedelta(hours=self.ttl_hours)).strftime(self.TIME_FORMAT)
+        return {
+            'fields': fields,
+            'total_count': meta[0],
+            'fetched_at': meta[1],
+            'fresh': meta[1] >= cutoff
+        }
+
+    def store(self, key, fields, total_count):
+        """用完整的字段列表替换目录条目"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    DELETE FROM datafield_catalog
+                    WHERE region = ? AND delay = ? AND universe = ? AND dataset_id = ?
+                ''', key)
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO datafield_catalog
+                    (region, delay, universe, dataset_id, field_id, type, coverage, description, raw)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [
+                    key + (
+                        field.get('id'),
+                        field.get('type'),
+                        field.get('coverage'),
+                        field.get('description'),
+                        json.dumps(field, ensure_ascii=False)
+                    )
+                    for field in fields if field.get('id')
+                ])
+                cursor.execute('''
+                    INSERT OR REPLACE INTO datafield_catalog_meta
+                    (region, delay, universe, dataset_id, total_count, fetched_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', key + (total_count, datetime.now().strftime(self.TIME_FORMAT)))
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 保存数据字段目录时出错: {str(e)}")
+
+    def touch(self, key):
+        """确认目录没有变化后刷新有效期"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    UPDATE datafield_catalog_meta SET fetched_at = ?
+                    WHERE region = ? AND delay = ? AND universe = ? AND dataset_id = ?
+                ''', (datetime.now().strftime(self.TIME_FORMAT),) + key)
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 更新数据字段目录时出错: {str(e)}")
+
+    def invalidate(self, key=None):
+        """使目录失效，key 为 None 时清空全部目录"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                if key is None:
+                    cursor.execute('DELETE FROM datafield_catalog')
+                    cursor.execute('DELETE FROM datafield_catalog_meta')
+                else:
+                    where = 'WHERE region = ? AND delay = ? AND universe = ? AND dataset_id = ?'
+                    cursor.execute(f'DELETE FROM datafield_catalog {where}', key)
+                    cursor.execute(f'DELETE FROM datafield_catalog_meta {where}', key)
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 清除数据字段目录时出错: {str(e)}")
+
+    def get_field_ids(self, region=None, delay=None, universe=None):
+        """获取目录中所有已知字段 ID(可按范围过滤)"""
+        conditions = []
+        params = []
+        for column, value in (('region', region), ('delay', delay), ('universe', universe)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(str(value))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'SELECT DISTINCT field_id FROM datafield_catalog {where}', params)
+                return {row[0] for row in cursor.fetchall()}
+        except Exception as e:
+            print(f"⚠️ 读取数据字段目录时出错: {str(e)}")
+            return set()
@@ -0,0 +1,365 @@
+"""表达式静态校验模块 - 在模拟前检查运算符、参数个数、字段和单位，本地拒绝无效候选"""
+
+import re
+from collections import namedtuple
+
+from fastexpr import (
+    BinaryOp, Call, Conditional, FastExprSyntaxError, Identifier, NaryOp, Number, String, UnaryOp,
+    parse, resolve_aliases, to_expression,
+)
+from offline_evaluator import GROUP_NAMES
+
+
+ValidationIssue = namedtuple('ValidationIssue', ['kind', 'message'])   # kind: syntax/operator/arity/argument/field/unit
+OperatorSpec = namedtuple('OperatorSpec', ['params', 'kwargs', 'unit'])
+
+
+def _spec(signature, unit, kwargs=()):
+    """签名中的参数类型: x 数据, w 窗口(正整数常量), c 常量, g 分组; 后缀 ? 为可选, * 为可重复"""
+    return OperatorSpec(tuple(part.strip() for part in signature.split(',')), frozenset(kwargs), unit)
+
+
+# 运算符目录(别名解析之后的名称)。unit 为结果单位的推导规则:
+# first 同第一个参数, second 同第二个参数, same 各数据参数单位须一致, none 无量纲,
+# unknown 无法推断, product/ratio 两参数单位相乘/相除, inverse 取倒数, power 乘方, sqrt 开方
+OPERATOR_CATALOG = {
+    # 时间序列
+    'delay': _spec('x, w', 'first'),
+    'ts_delta': _spec('x, w', 'first'),
+    'ts_mean': _spec('x, w', 'first'),
+    'ts_sum': _spec('x, w', 'first'),
+    'ts_std_dev': _spec('x, w', 'first'),
+    'ts_min': _spec('x, w', 'first'),
+    'ts_max': _spec('x, w', 'first'),
+    'ts_median': _spec('x, w', 'first'),
+    'ts_av_diff': _spec('x, w', 'first'),
+    'ts_backfill': _spec('x, w', 'first'),
+    'ts_decay_linear': _spec('x, w', 'first', ('dense',)),
+    'ts_decay_exp_window': _spec('x, w, c?', 'first', ('factor',)),
+    'ts_product': _spec('x, w', 'unknown'),
+    'ts_rank': _spec('x, w', 'none', ('constant',)),
+    'ts_zscore': _spec('x, w', 'none'),
+    'ts_scale': _spec('x, w', 'none', ('constant',)),
+    'ts_arg_max': _spec('x, w', 'none'),
+    'ts_arg_min': _spec('x, w', 'none'),
+    'ts_count_nans': _spec('x, w', 'none'),
+    'ts_corr': _spec('x, x, w', 'none'),
+    'ts_covariance': _spec('x, x, w', 'product'),
+    'ts_regression': _spec('x, x, w', 'unknown', ('lag', 'rettype')),
+    # 截面
+    'rank': _spec('x', 'none', ('rate',)),
+    'zscore': _spec('x', 'none'),
+    'scale': _spec('x', 'none', ('scale', 'longscale', 'shortscale')),
+    'normalize': _spec('x', 'none', ('useStd', 'limit')),
+    'quantile': _spec('x', 'none', ('driver', 'sigma')),
+    'winsorize': _spec('x', 'first', ('std',)),
+    'regression_neut': _spec('x, x', 'first'),
+    'vector_neut': _spec('x, x', 'first'),
+    'bucket': _spec('x', 'none', ('range', 'buckets', 'skipBoth', 'NANGroup')),
+    'densify': _spec('x', 'none'),
+    # 分组
+    'group_rank': _spec('x, g', 'none'),
+    'group_zscore': _spec('x, g', 'none'),
+    'group_scale': _spec('x, g', 'none'),
+    'group_neutralize': _spec('x, g', 'first'),
+    'group_backfill': _spec('x, g, w', 'first', ('std',)),
+    'group_mean': _spec('x, x?, g', 'first'),
+    'group_std_dev': _spec('x, g', 'first'),
+    # 条件
+    'if_else': _spec('x, x, x', 'if_else'),
+    'trade_when': _spec('x, x, x', 'second'),
+    # 逐元素
+    'abs': _spec('x', 'first'),
+    'sign': _spec('x', 'none'),
+    'log': _spec('x', 'unknown'),
+    'sqrt': _spec('x', 'sqrt'),
+    'inverse': _spec('x', 'inverse'),
+    'reverse': _spec('x', 'first'),
+    'power': _spec('x, x', 'power'),
+    'signed_power': _spec('x, x', 'power'),
+    'max': _spec('x, x, x*', 'same'),
+    'min': _spec('x, x, x*', 'same'),
+    'add': _spec('x, x, x*', 'same', ('filter',)),
+    'subtract': _spec('x, x', 'same', ('filter',)),
+    'multiply': _spec('x, x, x*', 'product', ('filter',)),
+    'divide': _spec('x, x', 'ratio'),
+}
+
+# 可以作为分组参数的运算符(返回分组编号)
+GROUP_OPERATORS = {'bucket', 'densify'}
+
+# 价量数据集中总是可用的字段(所有数据集的模拟都可以引用)
+BUILTIN_FIELDS = {'open', 'high', 'low', 'close', 'vwap', 'volume', 'returns', 'adv20', 'cap', 'sharesout'}
+
+# 单位以 ((量纲, 指数), ...) 表示: 价格 = 货币 / 股
+DIMENSIONLESS = ()
+PRICE = (('currency', 1), ('shares', -1))
+SHARES = (('shares', 1),)
+CURRENCY = (('currency', 1),)
+
+FIELD_UNITS = {
+    'open': PRICE, 'high': PRICE, 'low': PRICE, 'close': PRICE, 'vwap': PRICE, 'eps': PRICE,
+    'volume': SHARES, 'adv20': SHARES, 'sharesout': SHARES,
+    'cap': CURRENCY, 'market_cap': CURRENCY, 'assets': CURRENCY, 'liabilities': CURRENCY,
+    'revenue': CURRENCY, 'netincome': CURRENCY, 'cash': CURRENCY, 'debt': CURRENCY,
+    'equity': CURRENCY, 'bookvalue': CURRENCY,
+    'returns': DIMENSIONLESS, 'turnover': DIMENSIONLESS, 'volatility': DIMENSIONLESS,
+}
+
+# 按字段名推断单位的规则(未匹配的字段单位未知，不参与单位检查)
+FIELD_UNIT_PATTERNS = (
+    (re.compile(r'(_ratio|_yield|_pct)$'), DIMENSIONLESS),
+    (re.compile(r'(bvps|eps|dps|cfps|sps|_per_share)(_|$)'), PRICE),
+)
+
+# 数值常量的单位: 与任何单位兼容
+_CONSTANT = 'constant'
+
+
+def _combine(left, right, sign):
+    """单位相乘(sign=1)或相除(sign=-1)"""
+    if left is None or right is None:
+        return None
+    left = DIMENSIONLESS if left == _CONSTANT else left
+    right = DIMENSIONLESS if right == _CONSTANT else right
+    exponents = dict(left)
+    for dimension, exponent in right:
+        exponents[dimension] = exponents.get(dimension, 0) + sign * exponent
+    return tuple(sorted((dimension, exponent) for dimension, exponent in exponents.items() if exponent))
+
+
+def _scale(unit, factor):
+    """单位的指数乘以 factor，结果不是整数指数时返回 None"""
+    if unit is None or unit == _CONSTANT:
+        return unit
+    scaled = []
+    for dimension, exponent in unit:
+        value = exponent * factor
+        if value != int(value):
+            return None
+        scaled.append((dimension, int(value)))
+    return tuple(scaled)
+
+
+def _format_unit(unit):
+    if not unit:
+        return "无量纲"
+    return '·'.join(dimension if exponent == 1 else f"{dimension}^{exponent}" for dimension, exponent in unit)
+
+
+def _constant_value(node):
+    if isinstance(node, Number):
+        return node.value
+    if isinstance(node, UnaryOp) and node.op == '-' and isinstance(node.operand, Number):
+        return -node.operand.value
+    return None
+
+
+class ExpressionValidator:
+    """基于语法树的静态校验器
+
+    先解析别名(mean → ts_mean、correlation → ts_corr 等)，再对照运算符目录检查名称、
+    参数个数与参数类型，对照已知字段集合检查字段，并推断单位，拒绝价格与成交量相加
+    之类在 unitHandling=VERIFY 下会出错的运算。
+    """
+
+    def __init__(self, known_fields=None, field_units=None):
+        """初始化校验器
+
+        known_fields: 可用字段集合(会自动加入 BUILTIN_FIELDS)，为 None 时不检查字段
+        field_units: 覆盖或补充 FIELD_UNITS 的 {字段: 单位}
+        """
+        self.known_fields = None if known_fields is None else set(known_fields) | BUILTIN_FIELDS
+        self.field_units = {**FIELD_UNITS, **(field_units or {})}
+
+    def field_unit(self, name):
+        """推断字段的单位，无法推断时返回 None"""
+        if name in self.field_units:
+            return self.field_units[name]
+        for pattern, unit in FIELD_UNIT_PATTERNS:
+            if pattern.search(name):
+                return unit
+        return None
+
+    def check(self, expression):
+        """校验表达式，返回 (解析别名后的表达式, 问题列表)
+
+        表达式不含别名时原样返回，避免改变模拟缓存的键。
+        """
+        try:
+            tree = parse(expression)
+        except FastExprSyntaxError as e:
+            return expression, [ValidationIssue('syntax', str(e))]
+        resolved = resolve_aliases(tree)
+        issues = []
+        self._unit(resolved, issues)
+        return (expression if resolved == tree else to_expression(resolved)), issues
+
+    def is_valid(self, expression):
+        return not self.check(expression)[1]
+
+    def filter_candidates(self, expressions):
+        """按顺序校验候选，返回 (通过校验的表达式列表, {被拒绝的表达式: 问题列表})"""
+        kept = []
+        rejected = {}
+        for expression in expressions:
+            normalized, issues = self.check(expression)
+            if issues:
+                rejected[expression] = issues
+            else:
+                kept.append(normalized)
+        return kept, rejected
+
+    def _unit(self, node, issues):
+        """递归检查节点并返回其单位(None 表示未知)"""
+        if isinstance(node, Number):
+            return _CONSTANT
+        if isinstance(node, String):
+            issues.append(ValidationIssue('argument', f"字符串 {node.value!r} 只能用作关键字参数"))
+            return None
+        if isinstance(node, Identifier):
+            return self._field_unit(node.name, issues)
+        if isinstance(node, Call):
+            return self._call_unit(node, issues)
+        if isinstance(node, UnaryOp):
+            unit = self._unit(node.operand, issues)
+            return DIMENSIONLESS if node.op == '!' else unit
+        if isinstance(node, BinaryOp):
+            return self._binary_unit(node.op, self._unit(node.left, issues), self._unit(node.right, issues), issues)
+        if isinstance(node, NaryOp):
+            units = [self._unit(operand, issues) for operand in node.operands]
+            result = units[0]
+            for unit in units[1:]:
+                result = self._binary_unit(node.op, result, unit, issues)
+            return result
+        if isinstance(node, Conditional):
+            self._unit(node.condition, issues)
+            return self._same_unit('?:', [self._unit(node.if_true, issues), self._unit(node.if_false, issues)], issues)
+        issues.append(ValidationIssue('syntax', f"未知的节点类型: {type(node).__name__}"))
+        return None
+
+    def _field_unit(self, name, issues):
+        if name in GROUP_NAMES:
+            issues.append(ValidationIssue('argument', f"分组 {name} 只能用作分组参数"))
+            return None
+        if self.known_fields is not None and name not in self.known_fields:
+            issues.append(ValidationIssue('field', f"数据集中没有字段: {name}"))
+            return None
+        return self.field_unit(name)
+
+    def _same_unit(self, op, units, issues):
+        """加减、比较、分支等要求各操作数单位一致，常量和未知单位与任何单位兼容"""
+        known = [unit for unit in units if unit is not None and unit != _CONSTANT]
+        if any(unit is None for unit in units):
+            return None
+        if not known:
+            return _CONSTANT
+        for unit in known[1:]:
+            if unit != known[0]:
+                issues.append(ValidationIssue(
+                    'unit', f"{op} 的操作数单位不一致: {_format_unit(known[0])} 与 {_format_unit(unit)}"))
+                return None
+        return known[0]
+
+    def _binary_unit(self, op, left, right, issues):
+        if op == '*':
+            return _combine(left, right, 1)
+        if op == '/':
+            return _combine(left, right, -1)
+        if op == '^':
+            return DIMENSIONLESS if left in (DIMENSIONLESS, _CONSTANT) else None
+        unit = self._same_unit(op, [left, right], issues)
+        if op in ('+', '-'):
+            return unit
+        # 比较和逻辑运算的结果是 0/1
+        return DIMENSIONLESS
+
+    def _call_unit(self, node, issues):
+        spec = OPERATOR_CATALOG.get(node.name)
+        if spec is None:
+            issues.append(ValidationIssue('operator', f"未知的运算符: {node.name}"))
+            for arg in node.args:
+                self._unit(arg, issues)
+            return None
+
+        for key, _ in node.kwargs:
+            if key not in spec.kwargs:
+                issues.append(ValidationIssue('arity', f"{node.name} 不支持关键字参数 {key}"))
+
+        kinds = self._match_params(node, spec, issues)
+        if kinds is None:
+            return None
+
+        units = []
+        for arg, kind in zip(node.args, kinds):
+            if kind == 'w':
+                value = _constant_value(arg)
+                if value is None or value <= 0 or value != int(value):
+                    issues.append(ValidationIssue('argument', f"{node.name} 的窗口参数必须是正整数常量: {to_expression(arg)}"))
+                units.append(_CONSTANT)
+            elif kind == 'c':
+                if _constant_value(arg) is None:
+                    issues.append(ValidationIssue('argument', f"{node.name} 的参数必须是常量: {to_expression(arg)}"))
+                units.append(_CONSTANT)
+            elif kind == 'g':
+                self._check_group(node.name, arg, issues)
+                units.append(None)
+            else:
+                units.append(self._unit(arg, issues))
+
+        return self._result_unit(node.name, spec.unit, units, issues)
+
+    @staticmethod
+    def _match_params(node, spec, issues):
+        """按签名把位置参数对应到参数类型，个数不符时记录问题并返回 None"""
+        required = [kind for kind in spec.params if not kind.endswith(('?', '*'))]
+        optional = [kind.rstrip('?') for kind in spec.params if not kind.endswith('*')]
+        repeated = next((kind.rstrip('*') for kind in spec.params if kind.endswith('*')), None)
+        count = len(node.args)
+        if count == len(optional):
+            return optional
+        if count == len(required):
+            return required
+        if repeated and count > len(optional):
+            return optional + [repeated] * (count - len(optional))
+        expected = f"{len(required)}" if len(required) == len(optional) else f"{len(required)}-{len(optional)}"
+        if repeated:
+            expected = f"至少 {len(required)}"
+        issues.append(ValidationIssue('arity', f"{node.name} 需要 {expected} 个位置参数，实际为 {count} 个"))
+        return None
+
+    def _check_group(self, name, arg, issues):
+        if isinstance(arg, Identifier):
+            if arg.name in GROUP_NAMES or self.known_fields is None or arg.name in self.known_fields:
+                return
+            issues.append(ValidationIssue('field', f"{name} 的分组字段不存在: {arg.name}"))
+        elif isinstance(arg, Call) and arg.name in GROUP_OPERATORS:
+            self._unit(arg, issues)
+        else:
+            issues.append(ValidationIssue('argument', f"{name} 的分组参数无效: {to_expression(arg)}"))
+
+    def _result_unit(self, name, rule, units, issues):
+        if rule == 'first':
+            return units[0]
+        if rule == 'second':
+            return units[1]
+        if rule == 'none':
+            return DIMENSIONLESS
+        if rule == 'same':
+            return self._same_unit(name, units, issues)
+        if rule == 'if_else':
+            return self._same_unit(name, units[1:], issues)
+        if rule == 'product':
+            result = units[0]
+            for unit in units[1:]:
+                result = _combine(result, unit, 1)
+            return result
+        if rule == 'ratio':
+            return _combine(units[0], units[1], -1)
+        if rule == 'inverse':
+            return _combine(DIMENSIONLESS, units[0], -1)
+        if rule == 'sqrt':
+            return _scale(units[0], 0.5)
+        if rule == 'power':
+            return DIMENSIONLESS if units[0] in (DIMENSIONLESS, _CONSTANT) else None
+        return None
@@ -0,0 +1,471 @@
+"""FASTEXPR 表达式解析模块 - 词法/语法分析、规范化与结构哈希"""
+
+import hashlib
+import math
+import re
+from collections import namedtuple
+
+
+# 语法树节点
+Number = namedtuple('Number', ['value'])
+Identifier = namedtuple('Identifier', ['name'])
+String = namedtuple('String', ['value'])
+Call = namedtuple('Call', ['name', 'args', 'kwargs'])          # kwargs: ((名称, 节点), ...)
+UnaryOp = namedtuple('UnaryOp', ['op', 'operand'])
+BinaryOp = namedtuple('BinaryOp', ['op', 'left', 'right'])
+NaryOp = namedtuple('NaryOp', ['op', 'operands'])              # 规范化后的 + / * 多元运算
+Conditional = namedtuple('Conditional', ['condition', 'if_true', 'if_false'])
+
+Token = namedtuple('Token', ['kind', 'value', 'pos'])
+
+
+class FastExprSyntaxError(ValueError):
+    """表达式语法错误"""
+
+
+# 运算符优先级(数值越大结合越紧)
+BINARY_PRECEDENCE = {
+    '||': 2,
+    '&&': 3,
+    '==': 4, '!=': 4,
+    '<': 5, '<=': 5, '>': 5, '>=': 5,
+    '+': 6, '-': 6,
+    '*': 7, '/': 7,
+    '^': 8,
+}
+RIGHT_ASSOCIATIVE = {'^'}
+CONDITIONAL_PRECEDENCE = 1
+UNARY_PRECEDENCE = 9
+ATOM_PRECEDENCE = 10
+
+# 可交换的二元运算符(规范化时对操作数排序)
+COMMUTATIVE_OPERATORS = {'+', '*', '==', '!=', '&&', '||'}
+
+# 运算符别名 -> 规范名称
+OPERATOR_ALIASES = {
+    'mean': 'ts_mean',
+    'std': 'ts_std_dev',
+    'stddev': 'ts_std_dev',
+    'ts_std': 'ts_std_dev',
+    'ts_stddev': 'ts_std_dev',
+    'correlation': 'ts_corr',
+    'ts_correlation': 'ts_corr',
+    'covariance': 'ts_covariance',
+    'delta': 'ts_delta',
+    'sum': 'ts_sum',
+    'product': 'ts_product',
+    'decay_linear': 'ts_decay_linear',
+    'ts_decay': 'ts_decay_linear',
+}
+
+# 等价于中缀运算的函数形式
+FUNCTION_OPERATORS = {
+    'add': '+',
+    'subtract': '-',
+    'multiply': '*',
+    'divide': '/',
+}
+
+# 可对常量参数直接求值的纯函数
+FOLDABLE_FUNCTIONS = {
+    'abs': abs,
+    'sign': lambda x: float((x > 0) - (x < 0)),
+    'log': math.log,
+    'sqrt': math.sqrt,
+    'power': math.pow,
+}
+
+_TOKEN_PATTERN = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<number>(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_.]*)
+  | (?P<string>'[^']*'|"[^"]*")
+  | (?P<op>&&|\|\||==|!=|<=|>=|[-+*/^<>!?:,()=])
+''', re.VERBOSE)
+
+
+def tokenize(expression):
+    """把表达式拆分为词法单元"""
+    tokens = []
+    pos = 0
+    while pos < len(expression):
+        match = _TOKEN_PATTERN.match(expression, pos)
+        if not match:
+            raise FastExprSyntaxError(f"无法识别的字符 {expression[pos]!r} (位置 {pos})")
+        kind = match.lastgroup
+        if kind != 'ws':
+            tokens.append(Token(kind, match.group(kind), pos))
+        pos = match.end()
+    tokens.append(Token('end', '', pos))
+    return tokens
+
+
+class _Parser:
+    """递归下降 + 优先级爬升的语法分析器"""
+
+    def __init__(self, expression):
+        self.tokens = tokenize(expression)
+        self.index = 0
+
+    def peek(self, offset=0):
+        return self.tokens[min(self.index + offset, len(self.tokens) - 1)]
+
+    def advance(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def expect(self, value):
+        token = self.advance()
+        if token.value != value:
+            raise FastExprSyntaxError(f"期望 {value!r}，实际为 {token.value or '结尾'!r} (位置 {token.pos})")
+        return token
+
+    def parse(self):
+        node = self.parse_expression()
+        token = self.peek()
+        if token.kind != 'end':
+            raise FastExprSyntaxError(f"多余的内容 {token.value!r} (位置 {token.pos})")
+        return node
+
+    def parse_expression(self, min_precedence=CONDITIONAL_PRECEDENCE):
+        left = self.parse_unary()
+
+        while True:
+            token = self.peek()
+            if token.kind != 'op':
+                break
+
+            if token.value == '?' and min_precedence <= CONDITIONAL_PRECEDENCE:
+                self.advance()
+                if_true = self.parse_expression()
+                self.expect(':')
+                if_false = self.parse_expression(CONDITIONAL_PRECEDENCE)
+                left = Conditional(left, if_true, if_false)
+                continue
+
+            precedence = BINARY_PRECEDENCE.get(token.value)
+            if precedence is None or precedence < min_precedence:
+                break
+
+            self.advance()
+            next_precedence = precedence if token.value in RIGHT_ASSOCIATIVE else precedence + 1
+            right = self.parse_expression(next_precedence)
+            left = BinaryOp(token.value, left, right)
+
+        return left
+
+    def parse_unary(self):
+        token = self.peek()
+        if token.kind == 'op' and token.value in ('-', '+', '!'):
+            self.advance()
+            operand = self.parse_expression(UNARY_PRECEDENCE)
+            return UnaryOp(token.value, operand)
+        return self.parse_primary()
+
+    def parse_primary(self):
+        token = self.advance()
+
+        if token.kind == 'number':
+            return Number(float(token.value))
+
+        if token.kind == 'string':
+            return String(token.value[1:-1])
+
+        if token.kind == 'ident':
+            if self.peek().value == '(':
+                return self.parse_call(token.value)
+            return Identifier(token.value)
+
+        if token.value == '(':
+            node = self.parse_expression()
+            self.expect(')')
+            return node
+
+        raise FastExprSyntaxError(f"意外的 {token.value or '结尾'!r} (位置 {token.pos})")
+
+    def parse_call(self, name):
+        self.expect('(')
+        args = []
+        kwargs = []
+        if self.peek().value != ')':
+            while True:
+                # 关键字参数形如 range='0,1,0.1'
+                if self.peek().kind == 'ident' and self.peek(1).value == '=':
+                    key = self.advance().value
+                    self.advance()
+                    kwargs.append((key, self.parse_expression()))
+                else:
+                    if kwargs:
+                        raise FastExprSyntaxError(f"{name} 的位置参数不能出现在关键字参数之后")
+                    args.append(self.parse_expression())
+                if self.peek().value != ',':
+                    break
+                self.advance()
+        self.expect(')')
+        return Call(name, tuple(args), tuple(kwargs))
+
+
+def parse(expression):
+    """解析表达式为语法树"""
+    return _Parser(expression).parse()
+
+
+def _format_number(value):
+    if math.isfinite(value) and value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _precedence(node):
+    if isinstance(node, (BinaryOp, NaryOp)):
+        return BINARY_PRECEDENCE[node.op]
+    if isinstance(node, UnaryOp):
+        return UNARY_PRECEDENCE
+    if isinstance(node, Conditional):
+        return CONDITIONAL_PRECEDENCE
+    if isinstance(node, Number) and node.value < 0:
+        return UNARY_PRECEDENCE
+    return ATOM_PRECEDENCE
+
+
+def _wrap(node, parent_precedence, strict=False):
+    text = to_expression(node)
+    precedence = _precedence(node)
+    if precedence < parent_precedence or (strict and precedence == parent_precedence):
+        return f"({text})"
+    return text
+
+
+def _negated_term(node):
+    """若节点是 -1 * x 形式的乘积则返回 x，否则返回 None"""
+    if isinstance(node, NaryOp) and node.op == '*' and isinstance(node.operands[0], Number) \
+            and node.operands[0].value == -1:
+        rest = node.operands[1:]
+        return rest[0] if len(rest) == 1 else NaryOp('*', rest)
+    return None
+
+
+def to_expression(node):
+    """把语法树还原为表达式字符串(只保留必要的括号)"""
+    if isinstance(node, Number):
+        return _format_number(node.value)
+    if isinstance(node, Identifier):
+        return node.name
+    if isinstance(node, String):
+        return f"'{node.value}'"
+    if isinstance(node, Call):
+        parts = [to_expression(arg) for arg in node.args]
+        parts.extend(f"{key}={to_expression(value)}" for key, value in node.kwargs)
+        return f"{node.name}({', '.join(parts)})"
+    if isinstance(node, UnaryOp):
+        return f"{node.op}{_wrap(node.operand, UNARY_PRECEDENCE)}"
+    if isinstance(node, BinaryOp):
+        precedence = BINARY_PRECEDENCE[node.op]
+        right_assoc = node.op in RIGHT_ASSOCIATIVE
+        left = _wrap(node.left, precedence, strict=right_assoc)
+        right = _wrap(node.right, precedence, strict=not right_assoc)
+        return f"{left} {node.op} {right}"
+    if isinstance(node, NaryOp):
+        precedence = BINARY_PRECEDENCE[node.op]
+        text = _wrap(node.operands[0], precedence)
+        for operand in node.operands[1:]:
+            negated = _negated_term(operand) if node.op == '+' else None
+            if negated is not None:
+                text += f" - {_wrap(negated, precedence, strict=True)}"
+            else:
+                text += f" {node.op} {_wrap(operand, precedence)}"
+        return text
+    if isinstance(node, Conditional):
+        condition = _wrap(node.condition, CONDITIONAL_PRECEDENCE + 1)
+        if_true = _wrap(node.if_true, CONDITIONAL_PRECEDENCE)
+        if_false = _wrap(node.if_false, CONDITIONAL_PRECEDENCE)
+        return f"{condition} ? {if_true} : {if_false}"
+    raise TypeError(f"未知的节点类型: {type(node).__name__}")
+
+
+def resolve_aliases(node):
+    """只把运算符别名替换为规范名称，不改变表达式的其余结构"""
+    if isinstance(node, Call):
+        return Call(
+            OPERATOR_ALIASES.get(node.name, node.name),
+            tuple(resolve_aliases(arg) for arg in node.args),
+            tuple((key, resolve_aliases(value)) for key, value in node.kwargs)
+        )
+    if isinstance(node, UnaryOp):
+        return UnaryOp(node.op, resolve_aliases(node.operand))
+    if isinstance(node, BinaryOp):
+        return BinaryOp(node.op, resolve_aliases(node.left), resolve_aliases(node.right))
+    if isinstance(node, NaryOp):
+        return NaryOp(node.op, tuple(resolve_aliases(operand) for operand in node.operands))
+    if isinstance(node, Conditional):
+        return Conditional(*(resolve_aliases(child) for child in node))
+    return node
+
+
+def _sort_key(node):
+    # 常量排在最前，其余按规范字符串排序(取反项与原项相邻)
+    negated = _negated_term(node)
+    if negated is not None:
+        return (True, to_expression(negated), 1)
+    return (not isinstance(node, Number), to_expression(node), 0)
+
+
+def _fold_binary(op, left, right):
+    """对两个常量执行二元运算，无法安全求值时返回 None"""
+    a, b = left.value, right.value
+    try:
+        if op == '-':
+            return Number(a - b)
+        if op == '/':
+            return Number(a / b) if b != 0 else None
+        if op == '^':
+            return Number(math.pow(a, b))
+        if op in ('<', '<=', '>', '>=', '==', '!='):
+            result = {'<': a < b, '<=': a <= b, '>': a > b, '>=': a >= b, '==': a == b, '!=': a != b}[op]
+            return Number(float(result))
+    except (OverflowError, ValueError):
+        return None
+    return None
+
+
+def _make_nary(op, operands):
+    """构建规范的 + / * 多元运算：展开嵌套、合并常量、排序操作数"""
+    flat = []
+    for operand in operands:
+        if isinstance(operand, NaryOp) and operand.op == op:
+            flat.extend(operand.operands)
+        else:
+            flat.append(operand)
+
+    identity = 0.0 if op == '+' else 1.0
+    constant = identity
+    terms = []
+    for operand in flat:
+        if isinstance(operand, Number):
+            constant = constant + operand.value if op == '+' else constant * operand.value
+        else:
+            terms.append(operand)
+
+    terms.sort(key=_sort_key)
+    if constant != identity or not terms:
+        terms.insert(0, Number(constant))
+    if len(terms) == 1:
+        return terms[0]
+    return NaryOp(op, tuple(terms))
+
+
+def _negate(node):
+    # 对和取反时分配到每一项，使 a - (b - c) 与 a - b + c 等价
+    if isinstance(node, NaryOp) and node.op == '+':
+        return _make_nary('+', [_negate(operand) for operand in node.operands])
+    return _make_nary('*', [Number(-1.0), node])
+
+
+def canonicalize(node):
+    """生成规范化语法树
+
+    规则：运算符别名替换为规范名称、add/multiply 等函数形式转为中缀运算、
+    减法转为加上相反数、可交换运算的操作数排序、常量折叠。
+    """
+    if isinstance(node, (Number, Identifier, String)):
+        return node
+
+    if isinstance(node, UnaryOp):
+        operand = canonicalize(node.operand)
+        if node.op == '+':
+            return operand
+        if node.op == '-':
+            return _negate(operand)
+        if isinstance(operand, Number):
+            return Number(float(not operand.value))
+        return UnaryOp(node.op, operand)
+
+    if isinstance(node, Call):
+        name = OPERATOR_ALIASES.get(node.name, node.name)
+        args = tuple(canonicalize(arg) for arg in node.args)
+        kwargs = tuple(sorted((key, canonicalize(value)) for key, value in node.kwargs))
+        if name in FUNCTION_OPERATORS and len(args) == 2 and not kwargs:
+            return canonicalize(BinaryOp(FUNCTION_OPERATORS[name], *node.args))
+        if name in FOLDABLE_FUNCTIONS and args and not kwargs and all(isinstance(a, Number) for a in args):
+            try:
+                return Number(float(FOLDABLE_FUNCTIONS[name](*(a.value for a in args))))
+            except (TypeError, ValueError, OverflowError):
+                pass
+        return Call(name, args, kwargs)
+
+    if isinstance(node, BinaryOp):
+        left = canonicalize(node.left)
+        right = canonicalize(node.right)
+        if node.op == '+':
+            return _make_nary('+', [left, right])
+        if node.op == '-':
+            return _make_nary('+', [left, _negate(right)])
+        if node.op == '*':
+            return _make_nary('*', [left, right])
+        if node.op == '/' and isinstance(right, Number) and right.value == 1:
+            return left
+        if isinstance(left, Number) and isinstance(right, Number):
+            folded = _fold_binary(node.op, left, right)
+            if folded is not None:
+                return folded
+        if node.op in COMMUTATIVE_OPERATORS and _sort_key(right) < _sort_key(left):
+            left, right = right, left
+        return BinaryOp(node.op, left, right)
+
+    if isinstance(node, NaryOp):
+        return _make_nary(node.op, [canonicalize(operand) for operand in node.operands])
+
+    if isinstance(node, Conditional):
+        condition = canonicalize(node.condition)
+        if_true = canonicalize(node.if_true)
+        if_false = canonicalize(node.if_false)
+        if isinstance(condition, Number):
+            return if_true if condition.value else if_false
+        return Conditional(condition, if_true, if_false)
+
+    raise TypeError(f"未知的节点类型: {type(node).__name__}")
+
+
+def canonical_form(expression):
+    """返回表达式的规范字符串"""
+    return to_expression(canonicalize(parse(expression)))
+
+
+def structural_hash(expression):
+    """返回表达式的稳定结构哈希，语义等价的写法得到相同的哈希
+
+    无法解析的表达式退化为按去除空白后的字符串计算哈希。
+    """
+    try:
+        key = canonical_form(expression)
+    except FastExprSyntaxError:
+        key = ''.join(expression.split())
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def iter_unique_expressions(expressions, limit=None, seen=None):
+    """惰性地按结构哈希去重，产出 limit 个不重复的表达式后停止
+
+    expressions 可以是任意可迭代对象(包括生成器)，只会消费到凑满 limit 为止；
+    seen 为已出现的结构哈希集合，传入时可在多次调用之间共享。
+    """
+    seen = set() if seen is None else seen
+    remaining = limit
+    if remaining is not None and remaining <= 0:
+        return
+    for expression in expressions:
+        key = structural_hash(expression)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield expression
+        if remaining is not None:
+            remaining -= 1
+            if remaining == 0:
+                return
+
+
+def deduplicate_expressions(expressions):
+    """按结构哈希去重，保留每组等价表达式中第一次出现的写法"""
+    return list(iter_unique_expressions(expressions))
@@ -0,0 +1,337 @@
+"""遗传编程模块 - 在 FASTEXPR 语法树上做子树交叉、点变异和提升，进化出新的候选表达式"""
+
+import random
+
+from fastexpr import (
+    BinaryOp, Call, Conditional, FastExprSyntaxError, Identifier, NaryOp, Number, String, UnaryOp,
+    parse, resolve_aliases, structural_hash, to_expression,
+)
+from offline_evaluator import GROUP_NAMES, UnsupportedExpressionError
+
+
+# 点变异时可以互相替换的运算符(同组内参数形式相同)
+OPERATOR_GROUPS = [
+    ('ts_mean', 'ts_sum', 'ts_std_dev', 'ts_zscore', 'ts_rank', 'ts_delta', 'ts_min', 'ts_max', 'ts_decay_linear'),
+    ('rank', 'zscore', 'scale'),
+    ('group_rank', 'group_neutralize', 'group_zscore'),
+    ('ts_corr', 'ts_covariance'),
+    ('regression_neut', 'vector_neut'),
+]
+BINARY_SWAPS = ('+', '-', '*', '/')
+# 变异窗口时的候选取值
+WINDOWS = (3, 5, 10, 20, 40, 60, 120, 252)
+# 参数中含有时间窗口的运算符(数值参数视为窗口)
+WINDOW_OPERATORS = {name for group in OPERATOR_GROUPS[:1] + OPERATOR_GROUPS[3:4] for name in group} | {
+    'delay', 'ts_decay_exp_window', 'ts_product',
+}
+# 引用字段时不参与字段变异的标识符
+RESERVED_IDENTIFIERS = GROUP_NAMES | {'nan'}
+
+
+def _children(node):
+    if isinstance(node, Call):
+        return list(node.args)
+    if isinstance(node, UnaryOp):
+        return [node.operand]
+    if isinstance(node, BinaryOp):
+        return [node.left, node.right]
+    if isinstance(node, NaryOp):
+        return list(node.operands)
+    if isinstance(node, Conditional):
+        return list(node)
+    return []
+
+
+def _with_child(node, index, child):
+    if isinstance(node, Call):
+        args = list(node.args)
+        args[index] = child
+        return node._replace(args=tuple(args))
+    if isinstance(node, UnaryOp):
+        return node._replace(operand=child)
+    if isinstance(node, BinaryOp):
+        return node._replace(left=child) if index == 0 else node._replace(right=child)
+    if isinstance(node, NaryOp):
+        operands = list(node.operands)
+        operands[index] = child
+        return node._replace(operands=tuple(operands))
+    return node._replace(**{node._fields[index]: child})
+
+
+def _walk(node, path=(), parent=None):
+    """先序遍历，产出 (路径, 节点, 父节点)"""
+    yield path, node, parent
+    for index, child in enumerate(_children(node)):
+        yield from _walk(child, path + (index,), node)
+
+
+def _replace_at(node, path, new):
+    if not path:
+        return new
+    index = path[0]
+    return _with_child(node, index, _replace_at(_children(node)[index], path[1:], new))
+
+
+def _is_window(node, parent):
+    return isinstance(node, Number) and isinstance(parent, Call) and parent.name in WINDOW_OPERATORS \
+        and node.value >= 1 and node.value == int(node.value)
+
+
+def _is_field(node):
+    return isinstance(node, Identifier) and node.name not in RESERVED_IDENTIFIERS
+
+
+def _is_signal(node):
+    """能作为信号子树参与交叉/提升的节点(排除窗口、分组名、字符串等参数)"""
+    if isinstance(node, (Number, String)):
+        return False
+    if isinstance(node, Identifier):
+        return _is_field(node)
+    return True
+
+
+def _skeleton(node):
+    """把字段和数值抽象掉后的结构，用于限制同构个体的数量(保持多样性)"""
+    if isinstance(node, Identifier):
+        return 'x' if _is_field(node) else node.name
+    if isinstance(node, Number):
+        return 'n'
+    if isinstance(node, String):
+        return 's'
+    if isinstance(node, Call):
+        return f"{node.name}({','.join(_skeleton(arg) for arg in node.args)})"
+    if isinstance(node, UnaryOp):
+        return f"{node.op}{_skeleton(node.operand)}"
+    if isinstance(node, BinaryOp):
+        return f"({_skeleton(node.left)}{node.op}{_skeleton(node.right)})"
+    return f"[{','.join(_skeleton(child) for child in _children(node))}]"
+
+
+class GeneticSearch:
+    """基于历史记录的遗传编程搜索
+
+    种群来自 alpha_history.db 中已模拟的表达式，适应度取自保存的指标(Sharpe)、
+    离线评估或两者(已模拟的个体用平台指标，其余用离线 Sharpe)。每代按锦标赛选择
+    父代，通过子树交叉、点变异(运算符/窗口/字段)和提升产生子代；精英直接保留，
+    结构哈希去重并限制同构个体数量以保持多样性。归档在实例中跨轮次保留。
+    没有离线评估器时子代无法评估，只进化一代，子代直接作为候选交给平台模拟。
+    """
+
+    FITNESS_SOURCES = ('history', 'offline', 'both')
+
+    def __init__(self, datafields, evaluator=None, fitness_source='both', population_size=60, elite_count=6,
+                 generations=5, tournament_size=3, crossover_rate=0.5, mutation_rate=0.4, max_nodes=40,
+                 niche_limit=3, seed=None):
+        """初始化遗传搜索
+
+        evaluator: 离线评估器(OfflineEvaluator)，为 None 时只能使用保存的指标
+        fitness_source: 适应度来源，history / offline / both
+        generations: 每次 propose 前进化的代数
+        niche_limit: 种群中同一结构(忽略字段和数值)的个体数上限
+        """
+        if fitness_source not in self.FITNESS_SOURCES:
+            raise ValueError(f"未知的适应度来源: {fitness_source} (可选: {', '.join(self.FITNESS_SOURCES)})")
+        self.datafields = list(datafields)
+        self.evaluator = evaluator if fitness_source != 'history' else None
+        self.fitness_source = fitness_source
+        self.population_size = population_size
+        self.elite_count = elite_count
+        self.generations = generations
+        self.tournament_size = tournament_size
+        self.crossover_rate = crossover_rate
+        self.mutation_rate = mutation_rate
+        self.max_nodes = max_nodes
+        self.niche_limit = niche_limit
+        self.rng = random.Random(seed)
+        # 归档: 结构哈希 -> {'expression', 'tree', 'fitness', 'simulated'}
+        self.archive = {}
+        self.proposed = set()
+
+    # ---------- 种群与适应度 ----------
+
+    def _offline_fitness(self, expression):
+        if self.evaluator is None:
+            return None
+        try:
+            return self.evaluator.score(expression)['sharpe']
+        except (UnsupportedExpressionError, ValueError, TypeError):
+            return None
+
+    def _add(self, expression, tree=None, metrics=None, simulated=False):
+        """把个体加入归档，返回归档条目；无法解析的表达式返回 None"""
+        key = structural_hash(expression)
+        entry = self.archive.get(key)
+        if entry is None:
+            try:
+                tree = tree or resolve_aliases(parse(expression))
+            except FastExprSyntaxError:
+                return None
+            entry = self.archive[key] = {'expression': expression, 'tree': tree, 'fitness': None, 'simulated': False}
+            if self.fitness_source != 'history':
+                entry['fitness'] = self._offline_fitness(expression)
+
+        if simulated:
+            entry['simulated'] = True
+            metrics = metrics or {}
+            if self.fitness_source != 'offline' and metrics.get('sharpe') is not None:
+                entry['fitness'] = float(metrics['sharpe'])
+            elif entry['fitness'] is None:
+                entry['fitness'] = self._offline_fitness(expression)
+        return entry
+
+    def seed_population(self, records):
+        """用历史记录(含 expression 和 metrics)更新归档，返回加入的个体数"""
+        added = 0
+        for record in records:
+            expression = record.get('expression')
+            if expression and self._add(expression, metrics=record.get('metrics'), simulated=True):
+                added += 1
+        return added
+
+    def _population(self):
+        """按适应度从归档中选出种群: 精英在前，同构个体不超过 niche_limit"""
+        ranked = sorted(
+            (entry for entry in self.archive.values() if entry['fitness'] is not None),
+            key=lambda entry: entry['fitness'], reverse=True
+        )
+        population = []
+        niches = {}
+        for entry in ranked:
+            niche = _skeleton(entry['tree'])
+            if niches.get(niche, 0) >= self.niche_limit:
+                continue
+            niches[niche] = niches.get(niche, 0) + 1
+            population.append(entry)
+            if len(population) >= self.population_size:
+                break
+        return population
+
+    # ---------- 遗传算子 ----------
+
+    def _select(self, population):
+        """锦标赛选择"""
+        contenders = self.rng.sample(population, min(self.tournament_size, len(population)))
+        return max(contenders, key=lambda entry: entry['fitness'])['tree']
+
+    def _signal_paths(self, tree, include_root=True):
+        return [path for path, node, parent in _walk(tree) if (path or include_root) and _is_signal(node)]
+
+    def crossover(self, first, second):
+        """子树交叉: 用 second 的随机信号子树替换 first 的随机信号子树"""
+        target = self._signal_paths(first, include_root=False)
+        donors = self._signal_paths(second)
+        if not target or not donors:
+            return first
+        donor_path = self.rng.choice(donors)
+        donor = next(node for path, node, _ in _walk(second) if path == donor_path)
+        return _replace_at(first, self.rng.choice(target), donor)
+
+    def mutate(self, tree):
+        """点变异: 随机替换一个运算符、窗口或字段"""
+        sites = []
+        for path, node, parent in _walk(tree):
+            if isinstance(node, Call) and any(node.name in group for group in OPERATOR_GROUPS):
+                sites.append(('operator', path, node))
+            elif isinstance(node, BinaryOp) and node.op in BINARY_SWAPS:
+                sites.append(('binary', path, node))
+            elif _is_window(node, parent):
+                sites.append(('window', path, node))
+            elif _is_field(node) and self.datafields:
+                sites.append(('field', path, node))
+        if not sites:
+            return tree
+
+        kind, path, node = self.rng.choice(sites)
+        if kind == 'operator':
+            group = next(group for group in OPERATOR_GROUPS if node.name in group)
+            replacement = node._replace(name=self.rng.choice([name for name in group if name != node.name]))
+        elif kind == 'binary':
+            replacement = node._replace(op=self.rng.choice([op for op in BINARY_SWAPS if op != node.op]))
+        elif kind == 'window':
+            replacement = Number(float(self.rng.choice([w for w in WINDOWS if w != node.value])))
+        else:
+            replacement = Identifier(self.rng.choice(self.datafields))
+        return _replace_at(tree, path, replacement)
+
+    def hoist(self, tree):
+        """提升: 用一个非叶子的信号子树取代整棵树，缩短表达式"""
+        paths = [
+            path for path, node, parent in _walk(tree)
+            if path and _is_signal(node) and _children(node)
+        ]
+        if not paths:
+            return tree
+        chosen = self.rng.choice(paths)
+        return next(node for path, node, _ in _walk(tree) if path == chosen)
+
+    def _offspring(self, population):
+        """产生一个子代"""
+        tree = self._select(population)
+        roll = self.rng.random()
+        if roll < self.crossover_rate:
+            tree = self.crossover(tree, self._select(population))
+        elif roll < self.crossover_rate + self.mutation_rate:
+            tree = self.mutate(tree)
+        else:
+            tree = self.hoist(tree)
+        # 变异之外的算子之后再以一定概率变异一次，避免子代与父代相同
+        if roll < self.crossover_rate and self.rng.random() < self.mutation_rate:
+            tree = self.mutate(tree)
+        return tree
+
+    def _valid(self, tree):
+        size = sum(1 for _ in _walk(tree))
+        return 1 < size <= self.max_nodes or _is_field(tree)
+
+    # ---------- 进化 ----------
+
+    def evolve(self, generations=None):
+        """进化若干代，返回本次新产生的个体数"""
+        generations = self.generations if generations is None else generations
+        if self.evaluator is None:
+            # 子代无法离线评估，只进化一代
+            generations = min(generations, 1)
+
+        created = 0
+        for _ in range(generations):
+            population = self._population()
+            if len(population) < 2:
+                break
+            attempts = 0
+            produced = 0
+            while produced < self.population_size - self.elite_count and attempts < self.population_size * 10:
+                attempts += 1
+                tree = self._offspring(population)
+                if not self._valid(tree):
+                    continue
+                expression = to_expression(tree)
+                if structural_hash(expression) in self.archive:
+                    continue
+                if self._add(expression, tree) is not None:
+                    produced += 1
+            created += produced
+        return created
+
+    def propose(self, count):
+        """进化后返回最多 count 个尚未模拟、也未提出过的候选，按适应度从高到低
+
+        没有离线适应度的子代排在有适应度的候选之后。
+        """
+        self.evolve()
+        candidates = [
+            entry for key, entry in self.archive.items()
+            if not entry['simulated'] and key not in self.proposed
+        ]
+        candidates.sort(key=lambda entry: (entry['fitness'] is not None, entry['fitness'] or 0.0), reverse=True)
+        chosen = []
+        niches = {}
+        for entry in candidates:
+            niche = _skeleton(entry['tree'])
+            if niches.get(niche, 0) >= self.niche_limit:
+                continue
+            niches[niche] = niches.get(niche, 0) + 1
+            chosen.append(entry['expression'])
+            if len(chosen) >= count:
+                break
+        self.proposed.update(structural_hash(expression) for expression in chosen)
+        return chosen
@@ -1,43 +1,28 @@
 """WorldQuant Brain 批量 Alpha 生成系统"""
 
-import os
 import json
 
 from brain_batch_alpha import BrainBatchAlpha
 from dataset_config import get_dataset_by_index, get_dataset_list, get_dataset_recommendation
 from alpha_history_manager_sqlite import AlphaHistoryManagerSQLite
-
-STORAGE_ALPHA_ID_PATH = "alpha_ids.txt"
+from qualification import QUALIFICATION_PROFILES, rescore_history
+from metrics_exporter import start_exporter
+from telemetry import telemetry
 
 
 def submit_alpha_ids(brain, num_to_submit=2):
-    """提交保存的 Alpha ID"""
+    """提交队列中保存的 Alpha ID"""
     try:
-        if not os.path.exists(STORAGE_ALPHA_ID_PATH):
-            print("❌ 没有找到保存的Alpha ID文件")
-            return
-
-        with open(STORAGE_ALPHA_ID_PATH, 'r') as f:
-            alpha_ids = [line.strip() for line in f.readlines() if line.strip()]
-
-        if not alpha_ids:
+        pending = brain.submission_queue.get_entries('pending')
+        if not pending:
             print("❌ 没有可提交的Alpha ID")
             return
 
-        print("\n📝 已保存的Alpha ID列表:")
-        for i, alpha_id in enumerate(alpha_ids, 1):
-            print(f"{i}. {alpha_id}")
-
-        if num_to_submit > len(alpha_ids):
-            num_to_submit = len(alpha_ids)
+        print("\n📝 待提交的Alpha ID列表:")
+        for i, entry in enumerate(pending, 1):
+            print(f"{i}. {entry['alpha_id']}")
 
-        selected_ids = alpha_ids[:num_to_submit]
-        successful, failed = brain.submit_multiple_alphas(selected_ids)
-
-        # 更新 alpha_ids.txt
-        remaining_ids = [id for id in alpha_ids if id not in successful]
-        with open(STORAGE_ALPHA_ID_PATH, 'w') as f:
-            f.writelines([f"{id}\n" for id in remaining_ids])
+        brain.submit_queued_alphas(num_to_submit)
 
     except Exception as e:
         print(f"❌ 提交 Alpha 时出错: {str(e)}")
@@ -65,6 +50,12 @@ def view_alpha_history():
         print(f"  总测试数: {stats['total_count']}")
         print(f"  成功数: {stats['success_count']}")
         print(f"  成功率: {stats['success_rate']*100:.1f}%")
+
+        # 用各阈值方案重新评估全部历史记录
+        print("\n🧮 各阈值方案下的合格数:")
+        for name, profile in QUALIFICATION_PROFILES.items():
+            scored = rescore_history(history_manager, name)
+            print(f"  {name}: {int(scored['qualified'].sum())}/{len(scored)} - {profile.get('description', '')}")
         
     except Exception as e:
         print(f"❌ 查看历史记录时出错: {str(e)}")
@@ -80,6 +71,9 @@ def print_strategy_mode_tips():
     print("  5. 价值策略模式      - 专注于价值投资相关的因子")
     print("  6. Alpha101模式      - 基于经典Alpha101因子库的策略")
     print("  7. 组合型Alpha模式    - 生成多个信号组合的Alpha")
+    print("  8. 组合搜索模式      - 在模板族 × 字段 × 窗口 × 分组的空间中采样，每轮都是新组合")
+    print("  9. 自适应分配模式    - 按历史合格率把每轮名额分给表现最好的模板族和模拟设置")
+    print("  10. 遗传编程模式     - 以历史表达式为种群，通过交叉、变异和提升进化新的表达式")
     print("  建议: 如果长时间没有合格Alpha，可以尝试不同模式")
 
 
@@ -91,11 +85,16 @@ def print_dataset_tips(dataset_name):
         print(f"  {recommendation}")
 
 
-def continuous_alpha_generation(brain, strategy_mode, dataset_name):
-    """持续生成Alpha"""
+def continuous_alpha_generation(brain, strategy_mode, dataset_name, use_multi_simulation=False, metrics_port=None,
+                                use_screening=False):
+    """持续生成Alpha
+
+    metrics_port 或环境变量 BRAIN_METRICS_PORT 设置时，在本地启动 /metrics 指标端点
+    """
     print("\n🔄 启动持续Alpha生成模式...")
     print("ℹ️  按 Ctrl+C 可以停止生成并返回主菜单")
     
+    exporter = start_exporter(metrics_port, collectors=[brain.collect_metrics])
     cycle_count = 0
     try:
         while True:
@@ -107,7 +106,9 @@ def continuous_alpha_generation(brain, strategy_mode, dataset_name):
             print("\n🔍 尝试加载历史Alpha测试结果用于优化...")
             
             # 生成并测试Alpha
-            results = brain.simulate_alphas(None, strategy_mode, dataset_name, previous_results)
+            results = brain.simulate_alphas(None, strategy_mode, dataset_name, previous_results,
+                                            use_screening=use_screening,
+                                            use_multi_simulation=use_multi_simulation)
             
             if not results:
                 print("⚠️ 本轮未生成任何结果，继续下一轮...")
@@ -116,12 +117,16 @@ def continuous_alpha_generation(brain, strategy_mode, dataset_name):
             
             print(f"\n⏱️  等待5秒后开始下一轮...")
             import time
-            time.sleep(5)
+            with telemetry.span('continuous.idle'):
+                time.sleep(5)
             
     except KeyboardInterrupt:
         print(f"\n⏹️  已停止持续生成，总共完成 {cycle_count} 轮生成")
     except Exception as e:
         print(f"❌ 持续生成过程中出错: {str(e)}")
+    finally:
+        if exporter:
+            exporter.stop()
 
 
 def main():
@@ -176,24 +181,33 @@ def main():
             print("5: 价值策略模式")
             print("6: Alpha101模式")
             print("7: 组合型Alpha模式")
+            print("8: 组合搜索模式")
+            print("9: 自适应分配模式")
+            print("10: 遗传编程模式")
             
             print_strategy_mode_tips()
 
-            strategy_mode = int(input("\n请选择策略模式 (1-7): "))
-            if strategy_mode not in [1, 2, 3, 4, 5, 6, 7]:
+            strategy_mode = int(input("\n请选择策略模式 (1-10): "))
+            if strategy_mode not in range(1, 11):
                 print("❌ 无效的策略模式")
                 return
 
+            use_multi_simulation = input("\n是否使用多模拟批量提交表达式? (y/n, 默认n): ").strip().lower() == 'y'
+            use_screening = input("\n是否启用多保真度筛选(离线 → TOP500 → TOP1000 → 完整模拟)? (y/n, 默认n): ").strip().lower() == 'y'
+
             # 处理持续生成模式
             if mode == 5:
-                continuous_alpha_generation(brain, strategy_mode, dataset_name)
+                continuous_alpha_generation(brain, strategy_mode, dataset_name, use_multi_simulation,
+                                            use_screening=use_screening)
                 return
 
             # 如果选择优化策略模式，尝试加载历史结果
             previous_results = None
             print("\n🔍 尝试加载历史Alpha测试结果用于优化...")
 
-            results = brain.simulate_alphas(None, strategy_mode, dataset_name, previous_results)
+            results = brain.simulate_alphas(None, strategy_mode, dataset_name, previous_results,
+                                            use_screening=use_screening,
+                                            use_multi_simulation=use_multi_simulation)
             
             if not results:
                 print("❌ Alpha生成过程失败或未生成任何结果")
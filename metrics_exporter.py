@@ -0,0 +1,158 @@
+"""指标导出模块 - 以 OpenMetrics 文本格式通过本地 HTTP 端点暴露遥测数据"""
+
+import math
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telemetry import telemetry
+
+
+# 设置该环境变量(端口号)即可在持续生成模式下启用导出
+METRICS_PORT_ENV = 'BRAIN_METRICS_PORT'
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+# 导出直方图使用的固定桶上界(秒)
+EXPORT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _metric_name(name, prefix):
+    return f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_openmetrics(registry=telemetry, prefix='brain', started_at=None):
+    """把注册表渲染为 OpenMetrics 文本"""
+    histograms, counters, gauges = registry.items()
+    lines = []
+
+    def families(items):
+        grouped = {}
+        for (name, labels), value in sorted(items.items()):
+            grouped.setdefault(name, []).append((labels, value))
+        return grouped.items()
+
+    for name, samples in families(counters):
+        family = _metric_name(name, prefix)
+        lines.append(f"# TYPE {family} counter")
+        for labels, value in samples:
+            lines.append(f"{family}_total{_format_labels(labels)} {_format_value(value)}")
+
+    for name, samples in families(gauges):
+        family = _metric_name(name, prefix)
+        lines.append(f"# TYPE {family} gauge")
+        for labels, value in samples:
+            lines.append(f"{family}{_format_labels(labels)} {_format_value(value)}")
+
+    for name, samples in families(histograms):
+        family = _metric_name(name, prefix) + '_seconds'
+        lines.append(f"# TYPE {family} histogram")
+        lines.append(f"# UNIT {family} seconds")
+        for labels, histogram in samples:
+            for upper in EXPORT_BUCKETS:
+                lines.append(f"{family}_bucket{_format_labels(labels, [('le', upper)])} "
+                             f"{histogram.count_at_most(upper)}")
+            lines.append(f"{family}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram.count}")
+            lines.append(f"{family}_count{_format_labels(labels)} {histogram.count}")
+            lines.append(f"{family}_sum{_format_labels(labels)} {_format_value(float(histogram.total))}")
+
+    if started_at is not None:
+        family = f"{prefix}_uptime_seconds"
+        lines.append(f"# TYPE {family} gauge")
+        lines.append(f"{family} {_format_value(time.monotonic() - started_at)}")
+
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+
+        exporter = self.server.exporter
+        for collect in exporter.collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"⚠️ 采集指标时出错: {str(e)}")
+
+        body = render_openmetrics(exporter.registry, exporter.prefix, exporter.started_at).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsExporter:
+    """在后台线程中运行的 /metrics HTTP 端点
+
+    collectors 中的函数在每次抓取前调用，用于刷新队列深度等需要实时查询的仪表。
+    """
+
+    def __init__(self, port, host='127.0.0.1', registry=telemetry, prefix='brain', collectors=None):
+        """初始化导出器，port 为 0 时自动分配端口"""
+        self.registry = registry
+        self.prefix = prefix
+        self.collectors = list(collectors or [])
+        self.started_at = time.monotonic()
+        self.httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.exporter = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        """启动导出器"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止导出器"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def start_exporter(port=None, collectors=None):
+    """按端口或环境变量启动导出器，未配置或启动失败时返回 None"""
+    if port is None:
+        port = os.environ.get(METRICS_PORT_ENV)
+    if port in (None, ''):
+        return None
+    try:
+        exporter = MetricsExporter(int(port), collectors=collectors).start()
+        print(f"📡 指标导出已启动: {exporter.url}")
+        return exporter
+    except Exception as e:
+        print(f"⚠️ 启动指标导出失败: {str(e)}")
+        return None
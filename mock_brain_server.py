@@ -0,0 +1,417 @@
+"""本地模拟 WorldQuant Brain API 服务 - 用于压测而不消耗真实配额"""
+
+import datetime
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+DEFAULT_MOCK_CONFIG = {
+    'simulation_time': (2.0, 5.0),   # 单个模拟耗时范围(秒)
+    'metrics_delay': 0.5,            # 模拟完成后指标就绪所需时间(秒)
+    'submit_time': (1.0, 3.0),       # 提交检查耗时范围(秒)
+    'retry_after': 1.0,              # 进行中任务返回的 Retry-After 上限(秒)
+    'response_latency': 0.02,        # 每个请求的网络/服务端延迟(秒)
+    'max_concurrent': 3,             # 服务端允许的并发模拟数(队列深度)
+    'rate_429': 0.0,                 # 随机返回 429 的概率
+    'rate_5xx': 0.0,                 # 随机返回 5xx 的概率
+    'submit_reject_rate': 0.2,       # 提交被拒绝(403)的概率
+    'field_count': 120,              # /data-fields 返回的字段总数
+    'session_ttl': None,             # 会话有效秒数，设置后未认证或过期的请求返回 401
+    'pnl_days': 1250,                # PnL recordset 的交易日数量
+    'seed': None,
+}
+
+
+class MockBrainState:
+    """模拟服务的内部状态"""
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.random = random.Random(config.get('seed'))
+        self.simulations = {}
+        self.alphas = {}
+        self.submissions = {}
+        self.counter = 0
+        self.request_count = 0
+        self.sessions = {}
+
+    def next_id(self, prefix):
+        self.counter += 1
+        return f"{prefix}{self.counter:06d}"
+
+    def running_simulations(self, now):
+        """统计仍在运行的顶层模拟(多模拟只占一个名额)"""
+        return sum(
+            1 for sim in self.simulations.values()
+            if sim['parent'] is None and sim['done_at'] > now
+        )
+
+    def create_simulation(self, payload, now, parent=None):
+        low, high = self.config['simulation_time']
+        sim_id = self.next_id('S')
+        sim = {
+            'id': sim_id,
+            'parent': parent,
+            'payload': payload,
+            'done_at': now + self.random.uniform(low, high),
+            'alpha': None,
+            'children': [],
+        }
+        self.simulations[sim_id] = sim
+
+        if isinstance(payload, list):
+            for child_payload in payload:
+                child = self.create_simulation(child_payload, now, parent=sim_id)
+                child['done_at'] = sim['done_at']
+                sim['children'].append(child['id'])
+        else:
+            sim['alpha'] = self.create_alpha(payload, sim['done_at'])
+
+        return sim
+
+    def create_alpha(self, payload, done_at):
+        alpha_id = self.next_id('A')
+        rnd = self.random
+        sharpe = rnd.gauss(1.0, 0.5)
+        fitness = rnd.gauss(0.7, 0.4)
+        self.alphas[alpha_id] = {
+            'ready_at': done_at + self.config['metrics_delay'],
+            'data': {
+                'id': alpha_id,
+                'type': 'REGULAR',
+                'settings': payload.get('settings', {}),
+                'regular': {'code': payload.get('regular', '')},
+                'is': {
+                    'sharpe': round(sharpe, 3),
+                    'fitness': round(fitness, 3),
+                    'turnover': round(rnd.uniform(0.02, 1.0), 4),
+                    'margin': round(rnd.uniform(0.0, 0.04), 5),
+                    'returns': round(rnd.uniform(-0.05, 0.2), 4),
+                    'drawdown': round(rnd.uniform(0.02, 0.7), 4),
+                    'capacity': round(rnd.uniform(1e5, 5e6)),
+                    'checks': [
+                        {'name': 'LOW_SHARPE', 'result': 'PASS' if sharpe >= 1.25 else 'FAIL',
+                         'limit': 1.25, 'value': round(sharpe, 3)},
+                        {'name': 'LOW_FITNESS', 'result': 'PASS' if fitness >= 1.0 else 'FAIL',
+                         'limit': 1.0, 'value': round(fitness, 3)},
+                        {'name': 'LOW_SUB_UNIVERSE_SHARPE', 'result': 'PASS',
+                         'limit': 0.5, 'value': round(sharpe * rnd.uniform(0.5, 1.1), 3)},
+                        {'name': 'SELF_CORRELATION', 'result': 'PENDING'},
+                    ],
+                },
+            },
+        }
+        return alpha_id
+
+
+    def recordset(self, alpha_id, name):
+        """按 Alpha 生成确定性的 PnL / 年度统计 recordset"""
+        alpha = self.alphas[alpha_id]['data']
+        rnd = random.Random(alpha_id)
+        sharpe = alpha['is']['sharpe']
+        days = self.config['pnl_days']
+        start = datetime.date(2018, 1, 1)
+        dates = []
+        current = start
+        while len(dates) < days:
+            if current.weekday() < 5:
+                dates.append(current)
+            current += datetime.timedelta(days=1)
+
+        daily = [rnd.gauss(sharpe / 15.87, 1.0) * 1e5 for _ in dates]
+        if name == 'pnl':
+            cumulative = list(itertools.accumulate(daily))
+            return {
+                'schema': {'name': 'pnl', 'properties': [{'name': 'date', 'type': 'date'},
+                                                          {'name': 'pnl', 'type': 'amount'}]},
+                'records': [[d.isoformat(), round(v, 2)] for d, v in zip(dates, cumulative)],
+            }
+
+        by_year = {}
+        for d, v in zip(dates, daily):
+            by_year.setdefault(d.year, []).append(v)
+        records = []
+        for year, values in sorted(by_year.items()):
+            mean = sum(values) / len(values)
+            std = (sum((v - mean) ** 2 for v in values) / len(values)) ** 0.5 or 1.0
+            records.append([str(year), round(sum(values), 2), 2e7, rnd.randint(1000, 1500), rnd.randint(1000, 1500),
+                            alpha['is']['turnover'], round(mean / std * 15.87, 2),
+                            round(sum(values) / 1e7, 4), alpha['is']['drawdown'], alpha['is']['margin'],
+                            alpha['is']['fitness']])
+        names = ['year', 'pnl', 'bookSize', 'longCount', 'shortCount', 'turnover', 'sharpe', 'returns',
+                 'drawdown', 'margin', 'fitness']
+        return {
+            'schema': {'name': 'yearly-stats', 'properties': [{'name': n} for n in names]},
+            'records': records,
+        }
+
+
+class MockBrainHandler(BaseHTTPRequestHandler):
+    """处理客户端用到的全部端点"""
+
+    server_version = 'MockBrain/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    @property
+    def config(self):
+        return self.server.state.config
+
+    def _send(self, status, body=None, headers=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def _inject_faults(self, path):
+        """按配置注入延迟和随机错误，返回 True 表示已经响应"""
+        time.sleep(self.config['response_latency'])
+        with self.state.lock:
+            self.state.request_count += 1
+            roll = self.state.random.random()
+        if path == '/authentication':
+            return False
+        if roll < self.config['rate_429']:
+            self._send(429, {'message': 'Too Many Requests'}, {'Retry-After': '1'})
+            return True
+        if roll < self.config['rate_429'] + self.config['rate_5xx']:
+            self._send(503, {'message': 'Service Unavailable'})
+            return True
+        return False
+
+    def _session_token(self):
+        for part in self.headers.get('Cookie', '').split(';'):
+            name, _, value = part.strip().partition('=')
+            if name == 't':
+                return value
+        return None
+
+    def _session_remaining(self):
+        """当前请求所带会话的剩余有效秒数，未启用会话校验时返回 ttl 默认值"""
+        ttl = self.config['session_ttl']
+        if ttl is None:
+            return 14400
+        with self.state.lock:
+            expires_at = self.state.sessions.get(self._session_token())
+        return expires_at - time.monotonic() if expires_at else 0
+
+    def _reject_unauthenticated(self, path):
+        """会话无效时返回 401，返回 True 表示已经响应"""
+        if path == '/authentication' or self._session_remaining() > 0:
+            return False
+        self._send(401, {'detail': 'Incorrect authentication credentials.'})
+        return True
+
+    def _retry_after(self, remaining):
+        return f"{max(0.1, min(remaining, self.config['retry_after'])):.2f}"
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if self._inject_faults(path) or self._reject_unauthenticated(path):
+            return
+
+        if path == '/authentication':
+            self._read_json()
+            ttl = self.config['session_ttl']
+            headers = {}
+            if ttl is not None:
+                with self.state.lock:
+                    token = self.state.next_id('T')
+                    self.state.sessions[token] = time.monotonic() + ttl
+                headers['Set-Cookie'] = f"t={token}; Path=/"
+            self._send(201, {'user': {'id': 'MOCK'}, 'token': {'expiry': ttl or 14400}}, headers)
+            return
+
+        if path == '/simulations':
+            payload = self._read_json()
+            now = time.monotonic()
+            with self.state.lock:
+                if self.state.running_simulations(now) >= self.config['max_concurrent']:
+                    self._send(429, {'detail': 'CONCURRENT_SIMULATION_LIMIT_EXCEEDED'}, {'Retry-After': '1'})
+                    return
+                sim = self.state.create_simulation(payload, now)
+            host = f"http://{self.server.server_address[0]}:{self.server.server_address[1]}"
+            self._send(201, None, {'Location': f"{host}/simulations/{sim['id']}"})
+            return
+
+        match = re.fullmatch(r'/alphas/([^/]+)/submit', path)
+        if match:
+            alpha_id = match.group(1)
+            with self.state.lock:
+                if alpha_id not in self.state.alphas:
+                    self._send(404, {'detail': 'Not found.'})
+                    return
+                if alpha_id in self.state.submissions:
+                    self._send(403, {'detail': 'ALREADY_SUBMITTED'})
+                    return
+                low, high = self.config['submit_time']
+                self.state.submissions[alpha_id] = {
+                    'done_at': time.monotonic() + self.state.random.uniform(low, high),
+                    'accepted': self.state.random.random() >= self.config['submit_reject_rate'],
+                }
+            self._send(201)
+            return
+
+        self._send(404, {'detail': 'Not found.'})
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        path = parsed.path
+        if self._inject_faults(path) or self._reject_unauthenticated(path):
+            return
+        now = time.monotonic()
+
+        if path == '/authentication':
+            remaining = self._session_remaining()
+            if remaining <= 0:
+                self._send(401, {'detail': 'Incorrect authentication credentials.'})
+            else:
+                self._send(200, {'user': {'id': 'MOCK'}, 'token': {'expiry': remaining}})
+            return
+
+        match = re.fullmatch(r'/simulations/([^/]+)', path)
+        if match:
+            with self.state.lock:
+                sim = self.state.simulations.get(match.group(1))
+            if sim is None:
+                self._send(404, {'detail': 'Not found.'})
+            elif sim['done_at'] > now:
+                self._send(200, {'progress': 0.5}, {'Retry-After': self._retry_after(sim['done_at'] - now)})
+            elif sim['children']:
+                self._send(200, {'children': sim['children'], 'status': 'COMPLETE'})
+            else:
+                self._send(200, {'alpha': sim['alpha'], 'status': 'COMPLETE'})
+            return
+
+        match = re.fullmatch(r'/alphas/([^/]+)/submit', path)
+        if match:
+            with self.state.lock:
+                submission = self.state.submissions.get(match.group(1))
+            if submission is None:
+                self._send(404, {'detail': 'Not found.'})
+            elif submission['done_at'] > now:
+                self._send(200, None, {'Retry-After': self._retry_after(submission['done_at'] - now)})
+            elif submission['accepted']:
+                self._send(200, {'status': 'ACTIVE'})
+            else:
+                self._send(403, {'is': {'checks': [{'name': 'SELF_CORRELATION', 'result': 'FAIL'}]}})
+            return
+
+        match = re.fullmatch(r'/alphas/([^/]+)/recordsets/(pnl|yearly-stats)', path)
+        if match:
+            with self.state.lock:
+                alpha = self.state.alphas.get(match.group(1))
+                if alpha is not None and alpha['ready_at'] <= now:
+                    body = self.state.recordset(match.group(1), match.group(2))
+            if alpha is None:
+                self._send(404, {'detail': 'Not found.'})
+            elif alpha['ready_at'] > now:
+                self._send(200, None, {'Retry-After': self._retry_after(alpha['ready_at'] - now)})
+            else:
+                self._send(200, body)
+            return
+
+        match = re.fullmatch(r'/alphas/([^/]+)', path)
+        if match:
+            with self.state.lock:
+                alpha = self.state.alphas.get(match.group(1))
+            if alpha is None:
+                self._send(404, {'detail': 'Not found.'})
+            elif alpha['ready_at'] > now:
+                # 指标尚未计算完成时不返回 is 字段
+                data = {key: value for key, value in alpha['data'].items() if key != 'is'}
+                self._send(200, data)
+            else:
+                self._send(200, alpha['data'])
+            return
+
+        if path == '/data-fields':
+            query = parse_qs(parsed.query)
+            limit = int(query.get('limit', ['50'])[0])
+            offset = int(query.get('offset', ['0'])[0])
+            dataset_id = query.get('dataset.id', ['mock'])[0]
+            total = self.config['field_count']
+            results = [
+                {
+                    'id': f"{dataset_id}_field_{i:04d}",
+                    'type': 'MATRIX' if i % 5 else 'VECTOR',
+                    'coverage': round(0.5 + (i % 50) / 100, 2),
+                    'dataset': {'id': dataset_id},
+                }
+                for i in range(offset, min(offset + limit, total))
+            ]
+            self._send(200, {'count': total, 'results': results})
+            return
+
+        self._send(404, {'detail': 'Not found.'})
+
+
+class MockBrainServer:
+    """在后台线程中运行的本地模拟服务"""
+
+    def __init__(self, host='127.0.0.1', port=0, **config):
+        """初始化模拟服务，port 为 0 时自动分配端口"""
+        merged = dict(DEFAULT_MOCK_CONFIG)
+        merged.update(config)
+        self.httpd = ThreadingHTTPServer((host, port), MockBrainHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = MockBrainState(merged)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def state(self):
+        return self.httpd.state
+
+    def start(self):
+        """启动服务"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    server = MockBrainServer(port=8765).start()
+    print(f"🧪 模拟 Brain API 已启动: {server.url} (Ctrl+C 停止)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,499 @@
+"""离线表达式评估模块 - 在本地 (日期 × 股票) 面板数据上用 NumPy 执行 FASTEXPR 表达式"""
+
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from fastexpr import (
+    BinaryOp, Call, Conditional, Identifier, NaryOp, Number, String, UnaryOp,
+    parse, resolve_aliases
+)
+
+
+# 作为分组字段识别的名称
+GROUP_NAMES = {'market', 'sector', 'industry', 'subindustry', 'country', 'exchange'}
+
+# 滑动窗口计算时单批处理的最大元素数，避免长窗口占用过多内存
+_WINDOW_CHUNK_ELEMENTS = 20_000_000
+
+
+class UnsupportedExpressionError(ValueError):
+    """表达式使用了离线评估器不支持的运算符或字段"""
+
+
+class Panel:
+    """(日期 × 股票) 面板数据"""
+
+    def __init__(self, fields, groups=None, dates=None, instruments=None):
+        """初始化面板
+
+        fields: {字段名: 形状为 (T, N) 的数组}
+        groups: {分组名: 形状为 (N,) 或 (T, N) 的整数编码数组}
+        """
+        self.fields = {name: np.asarray(values, dtype=np.float64) for name, values in fields.items()}
+        if not self.fields:
+            raise ValueError("面板中没有任何字段")
+        self.shape = next(iter(self.fields.values())).shape
+        self.groups = {name: np.asarray(codes) for name, codes in (groups or {}).items()}
+        self.dates = dates
+        self.instruments = instruments
+
+        # 没有收益率时由收盘价推导
+        if 'returns' not in self.fields and 'close' in self.fields:
+            close = self.fields['close']
+            returns = np.full(self.shape, np.nan)
+            returns[1:] = close[1:] / close[:-1] - 1
+            self.fields['returns'] = returns
+
+    @classmethod
+    def load(cls, directory):
+        """从目录加载面板
+
+        目录中每个 .npy 或 .csv 文件是一个字段(CSV 第一列为日期、表头为股票代码)；
+        文件名属于 GROUP_NAMES 的视为分组编码。
+        """
+        fields = {}
+        groups = {}
+        dates = None
+        instruments = None
+
+        for filename in sorted(os.listdir(directory)):
+            name, ext = os.path.splitext(filename)
+            path = os.path.join(directory, filename)
+            if ext == '.npy':
+                values = np.load(path)
+            elif ext == '.csv':
+                frame = pd.read_csv(path, index_col=0)
+                if dates is None:
+                    dates = frame.index.to_numpy()
+                    instruments = frame.columns.to_numpy()
+                values = frame.to_numpy()
+            else:
+                continue
+
+            if name in GROUP_NAMES:
+                groups[name] = values
+            else:
+                fields[name] = values
+
+        return cls(fields, groups, dates, instruments)
+
+
+def _rolling(x, window, reducer):
+    """对时间轴做滑动窗口归约，reducer 接收形状为 (rows, N, window) 的窗口，结果前 window-1 行为 NaN"""
+    window = int(window)
+    out = np.full(x.shape, np.nan)
+    if window < 1 or window > x.shape[0]:
+        return out
+    windows = sliding_window_view(x, window, axis=0)
+    rows = max(1, _WINDOW_CHUNK_ELEMENTS // max(1, x.shape[1] * window))
+    for start in range(0, windows.shape[0], rows):
+        chunk = windows[start:start + rows]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[window - 1 + start:window - 1 + start + chunk.shape[0]] = reducer(chunk)
+    return out
+
+
+def _rolling_sum(x, window):
+    """基于累加和的滑动求和，返回 (和, 有效数量)"""
+    window = int(window)
+    valid = ~np.isnan(x)
+    filled = np.where(valid, x, 0.0)
+    zeros = np.zeros((1, x.shape[1]))
+    csum = np.concatenate([zeros, np.cumsum(filled, axis=0)])
+    ccount = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    total = np.full(x.shape, np.nan)
+    count = np.zeros(x.shape)
+    if 1 <= window <= x.shape[0]:
+        total[window - 1:] = csum[window:] - csum[:-window]
+        count[window - 1:] = ccount[window:] - ccount[:-window]
+    return total, count
+
+
+def _delay(x, days):
+    days = int(days)
+    out = np.full(x.shape, np.nan)
+    if days == 0:
+        return x.copy()
+    if 0 < days < x.shape[0]:
+        out[days:] = x[:-days]
+    return out
+
+
+def _ts_mean(x, window):
+    total, count = _rolling_sum(x, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def _ts_sum(x, window):
+    total, count = _rolling_sum(x, window)
+    return np.where(count > 0, total, np.nan)
+
+
+def _ts_std_dev(x, window):
+    total, count = _rolling_sum(x, window)
+    total_sq, _ = _rolling_sum(x * x, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        variance = np.maximum(total_sq / count - mean * mean, 0.0)
+        return np.where(count > 1, np.sqrt(variance), np.nan)
+
+
+def _ts_covariance(x, y, window, correlation=False):
+    both = ~(np.isnan(x) | np.isnan(y))
+    x = np.where(both, x, np.nan)
+    y = np.where(both, y, np.nan)
+    sx, count = _rolling_sum(x, window)
+    sy, _ = _rolling_sum(y, window)
+    sxy, _ = _rolling_sum(x * y, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sxy / count - (sx / count) * (sy / count)
+        if not correlation:
+            return np.where(count > 1, cov, np.nan)
+        sxx, _ = _rolling_sum(x * x, window)
+        syy, _ = _rolling_sum(y * y, window)
+        var_x = sxx / count - (sx / count) ** 2
+        var_y = syy / count - (sy / count) ** 2
+        corr = cov / np.sqrt(var_x * var_y)
+        return np.where((count > 1) & (var_x > 1e-12) & (var_y > 1e-12), corr, np.nan)
+
+
+def _ts_rank_reducer(windows):
+    last = windows[..., -1]
+    valid = ~np.isnan(windows)
+    less = (windows < last[..., None]).sum(axis=-1)
+    equal = (windows == last[..., None]).sum(axis=-1) - 1
+    count = valid.sum(axis=-1)
+    rank = (less + 0.5 * equal) / np.maximum(count - 1, 1)
+    return np.where(np.isnan(last) | (count < 2), np.nan, rank)
+
+
+def _decay_reducer(weights):
+    weights = np.asarray(weights, dtype=np.float64)
+
+    def reducer(windows):
+        valid = ~np.isnan(windows)
+        filled = np.where(valid, windows, 0.0)
+        weight_sum = valid @ weights
+        return np.where(weight_sum > 0, (filled @ weights) / weight_sum, np.nan)
+    return reducer
+
+
+def _cs_rank(x):
+    """截面排名，映射到 [0, 1] (NaN 保持为 NaN)"""
+    # argsort 会把 NaN 排到最后，因此有效值的名次从 0 开始连续
+    order = np.argsort(x, axis=1, kind='stable')
+    ranks = np.empty(x.shape)
+    np.put_along_axis(ranks, order, np.arange(x.shape[1], dtype=np.float64)[None, :], axis=1)
+    count = np.sum(~np.isnan(x), axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ranks = np.where(count > 1, ranks / (count - 1), 0.5)
+    return np.where(np.isnan(x), np.nan, ranks)
+
+
+def _cs_zscore(x):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nanmean(x, axis=1, keepdims=True)
+        std = np.nanstd(x, axis=1, keepdims=True)
+        return (x - mean) / np.where(std > 0, std, np.nan)
+
+
+def _group_index(x, groups):
+    """把分组编码转为 (行号 * 分组数 + 分组) 的扁平索引，缺失值单独成组"""
+    codes = np.broadcast_to(groups, x.shape)
+    codes = np.where(np.isnan(codes), -1, codes).astype(np.int64) if codes.dtype.kind == 'f' else codes.astype(np.int64)
+    _, codes = np.unique(codes, return_inverse=True)
+    codes = codes.reshape(x.shape)
+    n_groups = int(codes.max()) + 2
+    codes = np.where(np.isnan(x), n_groups - 1, codes)
+    rows = np.arange(x.shape[0])[:, None]
+    return rows * n_groups + codes, x.shape[0] * n_groups
+
+
+def _group_mean(x, groups):
+    index, size = _group_index(x, groups)
+    valid = ~np.isnan(x)
+    sums = np.bincount(index.ravel(), weights=np.where(valid, x, 0.0).ravel(), minlength=size)
+    counts = np.bincount(index.ravel(), weights=valid.ravel().astype(np.float64), minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(valid, (sums / counts)[index], np.nan)
+
+
+def _group_std_dev(x, groups):
+    mean = _group_mean(x, groups)
+    return np.sqrt(_group_mean((x - mean) ** 2, groups))
+
+
+def _group_rank(x, groups):
+    index, size = _group_index(x, groups)
+    flat_index = index.ravel()
+    flat_x = x.ravel()
+    order = np.lexsort((flat_x, flat_index))
+    sorted_index = flat_index[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_index)) + 1]
+    segment_start = np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    position = np.arange(len(order)) - segment_start
+    counts = np.bincount(flat_index, weights=(~np.isnan(flat_x)).astype(np.float64), minlength=size)
+    ranks = np.empty(len(order))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ranks[order] = np.where(counts[sorted_index] > 1, position / (counts[sorted_index] - 1), 0.5)
+    return np.where(np.isnan(x), np.nan, ranks.reshape(x.shape))
+
+
+def _regression_residual(y, x):
+    """截面回归残差 y - (a + b * x)"""
+    both = ~(np.isnan(x) | np.isnan(y))
+    xm = np.where(both, x, np.nan)
+    ym = np.where(both, y, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = np.nanmean(xm, axis=1, keepdims=True)
+        y_mean = np.nanmean(ym, axis=1, keepdims=True)
+        beta = np.nansum((xm - x_mean) * (ym - y_mean), axis=1, keepdims=True) / \
+            np.nansum((xm - x_mean) ** 2, axis=1, keepdims=True)
+        return ym - y_mean - beta * (xm - x_mean)
+
+
+def _vector_neut(y, x):
+    """截面上去除 y 在 x 方向上的投影"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        projection = np.nansum(y * x, axis=1, keepdims=True) / np.nansum(x * x, axis=1, keepdims=True)
+        return y - projection * x
+
+
+def _bucket(x, range_spec):
+    start, stop, step = (float(part) for part in str(range_spec).split(','))
+    edges = np.arange(start, stop + step / 2, step)
+    codes = np.digitize(x, edges).astype(np.float64)
+    return np.where(np.isnan(x), np.nan, codes)
+
+
+def _trade_when(trigger, alpha, exit_condition):
+    """满足触发条件时更新为 alpha，满足退出条件时为 NaN，否则保持上一期的值"""
+    shape = np.broadcast_shapes(np.shape(trigger), np.shape(alpha), np.shape(exit_condition))
+    trigger = np.broadcast_to(trigger, shape)
+    alpha = np.broadcast_to(alpha, shape)
+    exit_condition = np.broadcast_to(exit_condition, shape)
+    out = np.full(shape, np.nan)
+    previous = np.full(shape[1:], np.nan)
+    for t in range(shape[0]):
+        current = np.where(trigger[t] > 0, alpha[t], previous)
+        current = np.where(exit_condition[t] > 0, np.nan, current)
+        out[t] = current
+        previous = current
+    return out
+
+
+def _truthy(x):
+    return np.where(np.isnan(x), np.nan, (x != 0).astype(np.float64))
+
+
+def _if_else(condition, if_true, if_false):
+    condition = np.asarray(condition, dtype=np.float64)
+    result = np.where(condition > 0, if_true, if_false)
+    return np.where(np.isnan(condition), np.nan, result)
+
+
+def _signed_log(x):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(x > 0, np.log(x), np.nan)
+
+
+class OfflineEvaluator:
+    """在面板数据上执行表达式并给出快速评估指标"""
+
+    def __init__(self, panel):
+        """初始化评估器"""
+        self.panel = panel
+        self._forward_return_ranks = None
+        self.operators = {
+            # 时间序列
+            'delay': lambda x, d: _delay(x, d),
+            'ts_delta': lambda x, d: x - _delay(x, d),
+            'ts_mean': _ts_mean,
+            'ts_sum': _ts_sum,
+            'ts_std_dev': _ts_std_dev,
+            'ts_zscore': lambda x, d: (x - _ts_mean(x, d)) / np.where(_ts_std_dev(x, d) > 0, _ts_std_dev(x, d), np.nan),
+            'ts_corr': lambda x, y, d: _ts_covariance(x, y, d, correlation=True),
+            'ts_covariance': lambda x, y, d: _ts_covariance(x, y, d),
+            'ts_rank': lambda x, d: _rolling(x, d, _ts_rank_reducer),
+            'ts_min': lambda x, d: _rolling(x, d, lambda w: np.nanmin(w, axis=-1)),
+            'ts_max': lambda x, d: _rolling(x, d, lambda w: np.nanmax(w, axis=-1)),
+            'ts_decay_linear': lambda x, d: _rolling(x, d, _decay_reducer(np.arange(1, int(d) + 1))),
+            'ts_decay_exp_window': lambda x, d, factor=0.5: _rolling(
+                x, d, _decay_reducer(float(factor) ** np.arange(int(d) - 1, -1, -1))),
+            # 截面
+            'rank': _cs_rank,
+            'zscore': _cs_zscore,
+            'scale': lambda x: x / np.nansum(np.abs(x), axis=1, keepdims=True),
+            'regression_neut': _regression_residual,
+            'vector_neut': _vector_neut,
+            # 分组
+            'group_rank': _group_rank,
+            'group_neutralize': lambda x, g: x - _group_mean(x, g),
+            'group_mean': lambda x, *rest: _group_mean(x, rest[-1]),
+            'group_std_dev': _group_std_dev,
+            'group_zscore': lambda x, g: (x - _group_mean(x, g)) / _group_std_dev(x, g),
+            'bucket': lambda x, range='0,1,0.1': _bucket(x, range),
+            # 条件
+            'if_else': _if_else,
+            'trade_when': _trade_when,
+            # 逐元素
+            'abs': np.abs,
+            'sign': np.sign,
+            'log': _signed_log,
+            'sqrt': lambda x: np.sqrt(np.where(x >= 0, x, np.nan)),
+            'power': lambda x, p: np.power(x, p),
+            'signed_power': lambda x, p: np.sign(x) * np.power(np.abs(x), p),
+            'max': np.fmax,
+            'min': np.fmin,
+            'inverse': lambda x: 1.0 / x,
+        }
+
+    @classmethod
+    def from_directory(cls, directory):
+        """从本地数据目录创建评估器"""
+        return cls(Panel.load(directory))
+
+    def evaluate(self, expression):
+        """执行表达式，返回形状为 (T, N) 的数组"""
+        node = resolve_aliases(parse(expression)) if isinstance(expression, str) else expression
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'), warnings.catch_warnings():
+            # 全为 NaN 的截面会触发 "Mean of empty slice" 警告，结果按 NaN 处理即可
+            warnings.simplefilter('ignore', RuntimeWarning)
+            result = self._eval(node)
+        return np.broadcast_to(np.asarray(result, dtype=np.float64), self.panel.shape).copy()
+
+    def _eval(self, node):
+        if isinstance(node, Number):
+            return node.value
+        if isinstance(node, String):
+            return node.value
+        if isinstance(node, Identifier):
+            if node.name in self.panel.fields:
+                return self.panel.fields[node.name]
+            if node.name in self.panel.groups:
+                return self.panel.groups[node.name]
+            if node.name == 'market':
+                return np.zeros(self.panel.shape[1])
+            raise UnsupportedExpressionError(f"面板中没有字段: {node.name}")
+        if isinstance(node, Call):
+            operator = self.operators.get(node.name)
+            if operator is None:
+                raise UnsupportedExpressionError(f"不支持的运算符: {node.name}")
+            args = [self._eval(arg) for arg in node.args]
+            kwargs = {key: self._eval(value) for key, value in node.kwargs}
+            try:
+                return operator(*args, **kwargs)
+            except TypeError as e:
+                raise UnsupportedExpressionError(f"{node.name} 参数错误: {str(e)}")
+        if isinstance(node, UnaryOp):
+            operand = self._eval(node.operand)
+            if node.op == '-':
+                return -operand
+            if node.op == '!':
+                return 1.0 - _truthy(np.asarray(operand, dtype=np.float64))
+            return operand
+        if isinstance(node, BinaryOp):
+            return self._binary(node.op, self._eval(node.left), self._eval(node.right))
+        if isinstance(node, NaryOp):
+            result = self._eval(node.operands[0])
+            for operand in node.operands[1:]:
+                result = self._binary(node.op, result, self._eval(operand))
+            return result
+        if isinstance(node, Conditional):
+            return _if_else(self._eval(node.condition), self._eval(node.if_true), self._eval(node.if_false))
+        raise UnsupportedExpressionError(f"未知的节点类型: {type(node).__name__}")
+
+    @staticmethod
+    def _binary(op, left, right):
+        if op == '+':
+            return left + right
+        if op == '-':
+            return left - right
+        if op == '*':
+            return left * right
+        if op == '/':
+            return left / np.where(right == 0, np.nan, right)
+        if op == '^':
+            return np.power(left, right)
+        if op in ('<', '<=', '>', '>=', '==', '!='):
+            result = {
+                '<': np.less, '<=': np.less_equal, '>': np.greater,
+                '>=': np.greater_equal, '==': np.equal, '!=': np.not_equal,
+            }[op](left, right).astype(np.float64)
+            return np.where(np.isnan(left) | np.isnan(right), np.nan, result)
+        if op == '&&':
+            return _truthy(np.asarray(left, dtype=np.float64)) * _truthy(np.asarray(right, dtype=np.float64))
+        if op == '||':
+            return np.fmax(_truthy(np.asarray(left, dtype=np.float64)), _truthy(np.asarray(right, dtype=np.float64)))
+        raise UnsupportedExpressionError(f"不支持的运算符: {op}")
+
+    def score(self, expression, annualization=252, recent_days=None):
+        """计算表达式的快速评估指标
+
+        组合权重为截面去均值后按绝对值归一化的信号，收益为次日收益率。
+        recent_days: 只在最近的交易日上计算指标(信号仍用完整历史计算)
+        返回 sharpe / ic_mean / turnover / coverage 指标字典。
+        """
+        signal = self.evaluate(expression)
+        returns = self.panel.fields.get('returns')
+        if returns is None:
+            raise UnsupportedExpressionError("面板中没有 returns 或 close 字段，无法评估")
+
+        start = 0 if recent_days is None else max(len(signal) - int(recent_days) - 1, 0)
+
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            if self._forward_return_ranks is None:
+                self._forward_return_ranks = _cs_rank(returns[1:])
+            signal, returns, forward_ranks = signal[start:], returns[start:], self._forward_return_ranks[start:]
+
+            demeaned = signal - np.nanmean(signal, axis=1, keepdims=True)
+            gross = np.nansum(np.abs(demeaned), axis=1, keepdims=True)
+            weights = np.nan_to_num(demeaned / np.where(gross > 0, gross, np.nan))
+
+            forward = np.nan_to_num(returns[1:])
+            pnl = np.sum(weights[:-1] * forward, axis=1)
+            active = gross[:-1, 0] > 0
+            pnl = pnl[active]
+            sharpe = float(np.mean(pnl) / np.std(pnl) * np.sqrt(annualization)) if len(pnl) > 1 and np.std(pnl) > 0 else 0.0
+            turnover = float(np.mean(np.sum(np.abs(np.diff(weights, axis=0)), axis=1))) if len(weights) > 1 else 0.0
+
+            ic = _row_corr(_cs_rank(signal[:-1]), forward_ranks)
+            ic_mean = float(np.nanmean(ic)) if np.any(~np.isnan(ic)) else 0.0
+
+        return {
+            'sharpe': sharpe,
+            'ic_mean': ic_mean,
+            'turnover': turnover,
+            'coverage': float(np.mean(~np.isnan(signal))),
+        }
+
+    def rank_candidates(self, expressions, key='sharpe', recent_days=None):
+        """评估一批表达式并按指标降序排列
+
+        返回 [(表达式, 指标字典)]；无法评估的表达式指标为 None，排在最后。
+        """
+        scored = []
+        failed = []
+        for expression in expressions:
+            try:
+                scored.append((expression, self.score(expression, recent_days=recent_days)))
+            except (UnsupportedExpressionError, ValueError):
+                failed.append((expression, None))
+        scored.sort(key=lambda item: item[1][key], reverse=True)
+        return scored + failed
+
+
+def _row_corr(a, b):
+    """逐行计算两个矩阵的相关系数"""
+    both = ~(np.isnan(a) | np.isnan(b))
+    a = np.where(both, a, np.nan)
+    b = np.where(both, b, np.nan)
+    a = a - np.nanmean(a, axis=1, keepdims=True)
+    b = b - np.nanmean(b, axis=1, keepdims=True)
+    return np.nansum(a * b, axis=1) / np.sqrt(np.nansum(a * a, axis=1) * np.nansum(b * b, axis=1))
@@ -0,0 +1,258 @@
+"""PnL 存储模块 - 以列式 float32 文件保存每个 Alpha 的日度 PnL，并在 SQLite 中保存年度统计"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+class PnlStore:
+    """日度 PnL 与年度统计存储
+
+    所有 Alpha 的日度 PnL 依次追加到同一个 float32 文件，对应的日期(自 1970-01-01 起的天数)
+    追加到平行的 int32 文件；SQLite 中的 pnl_index 表记录每个 Alpha 的偏移和长度。
+    读取时通过 np.memmap 直接映射文件，单个序列是零拷贝视图。
+    """
+
+    TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+    # 年度统计中保存为独立列的字段(平台字段名 -> 列名)
+    YEARLY_COLUMNS = {
+        'year': 'year',
+        'pnl': 'pnl',
+        'bookSize': 'book_size',
+        'longCount': 'long_count',
+        'shortCount': 'short_count',
+        'turnover': 'turnover',
+        'sharpe': 'sharpe',
+        'returns': 'returns',
+        'drawdown': 'drawdown',
+        'margin': 'margin',
+        'fitness': 'fitness',
+    }
+
+    def __init__(self, root_dir="pnl_store", db_file="alpha_history.db"):
+        """初始化 PnL 存储"""
+        self.root_dir = root_dir
+        self.db_file = db_file
+        self.values_path = os.path.join(root_dir, 'pnl_values.f32')
+        self.dates_path = os.path.join(root_dir, 'pnl_dates.i32')
+        self._values = None
+        self._dates = None
+        os.makedirs(root_dir, exist_ok=True)
+        for path in (self.values_path, self.dates_path):
+            open(path, 'ab').close()
+        self.init_database()
+
+    def init_database(self):
+        """初始化索引表和年度统计表"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS pnl_index (
+                        alpha_id TEXT PRIMARY KEY,
+                        offset INTEGER,
+                        length INTEGER,
+                        start_day INTEGER,
+                        end_day INTEGER,
+                        fetched_at TEXT
+                    )
+                ''')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS alpha_yearly_stats (
+                        alpha_id TEXT,
+                        year INTEGER,
+                        pnl REAL,
+                        book_size REAL,
+                        long_count REAL,
+                        short_count REAL,
+                        turnover REAL,
+                        sharpe REAL,
+                        returns REAL,
+                        drawdown REAL,
+                        margin REAL,
+                        fitness REAL,
+                        raw TEXT,  -- JSON格式存储完整记录
+                        PRIMARY KEY (alpha_id, year)
+                    )
+                ''')
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 初始化 PnL 存储时出错: {str(e)}")
+
+    @staticmethod
+    def parse_recordset(data):
+        """把平台 recordset 响应({'schema': {'properties': [...]}, 'records': [...]})转换为字典列表"""
+        names = [prop.get('name') for prop in (data.get('schema') or {}).get('properties', [])]
+        return [dict(zip(names, record)) for record in data.get('records', [])]
+
+    @classmethod
+    def daily_pnl_from_recordset(cls, data):
+        """从 PnL recordset 中提取 (日期天数数组, 日度 PnL 数组)
+
+        平台返回的 pnl 为累计值，这里差分为日度 PnL。
+        """
+        rows = [row for row in cls.parse_recordset(data) if row.get('date') and row.get('pnl') is not None]
+        if not rows:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        days = np.array([row['date'] for row in rows], dtype='datetime64[D]').astype(np.int32)
+        cumulative = np.array([row['pnl'] for row in rows], dtype=np.float64)
+        order = np.argsort(days, kind='stable')
+        days, cumulative = days[order], cumulative[order]
+        daily = np.diff(cumulative, prepend=0.0)
+        return days, daily.astype(np.float32)
+
+    def has(self, alpha_id):
+        """是否已经保存了该 Alpha 的 PnL"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                row = conn.execute('SELECT 1 FROM pnl_index WHERE alpha_id = ?', (alpha_id,)).fetchone()
+                return row is not None
+        except Exception:
+            return False
+
+    def put_pnl(self, alpha_id, days, values):
+        """追加一个 Alpha 的日度 PnL
+
+        偏移在 BEGIN IMMEDIATE 事务中分配，多个进程同时写入也不会互相覆盖。
+        重复保存同一 Alpha 时旧数据保留在文件中但不再被索引。
+        """
+        days = np.ascontiguousarray(days, dtype=np.int32)
+        values = np.ascontiguousarray(values, dtype=np.float32)
+        if len(days) != len(values):
+            raise ValueError("日期和 PnL 长度不一致")
+        if not len(days):
+            return
+
+        try:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                offset = conn.execute('SELECT COALESCE(MAX(offset + length), 0) FROM pnl_index').fetchone()[0]
+                # 以文件实际长度为准，避免覆盖此前写入失败留下的数据
+                offset = max(offset, os.path.getsize(self.values_path) // 4, os.path.getsize(self.dates_path) // 4)
+                for path, array in ((self.values_path, values), (self.dates_path, days)):
+                    with open(path, 'r+b') as f:
+                        f.seek(offset * 4)
+                        f.write(array.tobytes())
+                conn.execute('''
+                    INSERT OR REPLACE INTO pnl_index (alpha_id, offset, length, start_day, end_day, fetched_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (alpha_id, offset, len(values), int(days[0]), int(days[-1]),
+                      datetime.now().strftime(self.TIME_FORMAT)))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"❌ 保存 Alpha {alpha_id} 的 PnL 时出错: {str(e)}")
+
+    def put_yearly_stats(self, alpha_id, data):
+        """保存年度统计 recordset"""
+        rows = self.parse_recordset(data)
+        try:
+            with sqlite3.connect(self.db_file, timeout=30) as conn:
+                conn.executemany(f'''
+                    INSERT OR REPLACE INTO alpha_yearly_stats
+                    (alpha_id, {', '.join(self.YEARLY_COLUMNS.values())}, raw)
+                    VALUES (?, {', '.join('?' for _ in self.YEARLY_COLUMNS)}, ?)
+                ''', [
+                    (alpha_id,) + tuple(row.get(key) for key in self.YEARLY_COLUMNS) + (json.dumps(row),)
+                    for row in rows if row.get('year') is not None
+                ])
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 保存 Alpha {alpha_id} 的年度统计时出错: {str(e)}")
+
+    def _mapped(self):
+        """返回映射整个数据文件的 (values, dates)，文件增长后重新映射"""
+        size = min(os.path.getsize(self.values_path), os.path.getsize(self.dates_path)) // 4
+        if self._values is None or len(self._values) < size:
+            if size == 0:
+                return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int32)
+            self._values = np.memmap(self.values_path, dtype=np.float32, mode='r', shape=(size,))
+            self._dates = np.memmap(self.dates_path, dtype=np.int32, mode='r', shape=(size,))
+        return self._values, self._dates
+
+    def _index_rows(self, alpha_ids=None):
+        with sqlite3.connect(self.db_file) as conn:
+            if alpha_ids is None:
+                return conn.execute('SELECT alpha_id, offset, length, start_day, end_day FROM pnl_index ORDER BY rowid').fetchall()
+            rows = {}
+            alpha_ids = list(alpha_ids)
+            # SQLite 参数个数有限，分批查询
+            for start in range(0, len(alpha_ids), 500):
+                chunk = alpha_ids[start:start + 500]
+                placeholders = ', '.join('?' for _ in chunk)
+                for row in conn.execute(
+                        f'SELECT alpha_id, offset, length, start_day, end_day FROM pnl_index WHERE alpha_id IN ({placeholders})', chunk):
+                    rows[row[0]] = row
+            return [rows[alpha_id] for alpha_id in alpha_ids if alpha_id in rows]
+
+    def get_series(self, alpha_id):
+        """获取单个 Alpha 的 (日期, 日度 PnL)，均为内存映射视图；不存在时返回 None"""
+        rows = self._index_rows([alpha_id])
+        if not rows:
+            return None
+        _, offset, length, _, _ = rows[0]
+        values, dates = self._mapped()
+        return dates[offset:offset + length].astype('datetime64[D]'), values[offset:offset + length]
+
+    @staticmethod
+    def _gather(values, offsets, length):
+        """收集若干等长序列为二维数组，按顺序连续存放时直接返回内存映射上的视图(零拷贝)"""
+        if (np.diff(offsets) == length).all():
+            return values[offsets[0]:offsets[0] + len(offsets) * length].reshape(len(offsets), length)
+        return values[offsets[:, None] + np.arange(length)]
+
+    def load_matrix(self, alpha_ids=None):
+        """加载按日期对齐的 PnL 矩阵
+
+        返回 (alpha_id 列表, 日期数组 datetime64[D], float32 矩阵[alpha, 日期])，
+        某个 Alpha 在某日没有数据时为 NaN。alpha_ids 为 None 时加载全部。
+        日历相同且连续存放时矩阵是只读的内存映射视图，需要修改时先 copy()。
+        """
+        rows = self._index_rows(alpha_ids)
+        if not rows:
+            return [], np.empty(0, dtype='datetime64[D]'), np.empty((0, 0), dtype=np.float32)
+
+        values, dates = self._mapped()
+        ids = [row[0] for row in rows]
+        offsets, lengths, starts, ends = (np.array(column, dtype=np.int64) for column in list(zip(*rows))[1:])
+
+        # 常见情况: 同一交易日历(起止日和长度都相同)，不需要按日期对齐
+        length = lengths[0]
+        if (lengths == length).all() and (starts == starts[0]).all() and (ends == ends[0]).all():
+            common_dates = np.asarray(dates[offsets[0]:offsets[0] + length]).astype('datetime64[D]')
+            return ids, common_dates, self._gather(values, offsets, length)
+
+        # 不同日历: 按 (起止日, 长度) 分组，每组一次性收集并映射到日期并集上的列
+        groups = {}
+        for i, key in enumerate(zip(starts, ends, lengths)):
+            groups.setdefault(key, []).append(i)
+        group_dates = {key: dates[offsets[members[0]]:offsets[members[0]] + key[2]] for key, members in groups.items()}
+        union = np.unique(np.concatenate(list(group_dates.values())))
+        matrix = np.full((len(rows), len(union)), np.nan, dtype=np.float32)
+        for key, members in groups.items():
+            members = np.array(members)
+            columns = np.searchsorted(union, group_dates[key])
+            matrix[members[:, None], columns] = self._gather(values, offsets[members], key[2])
+        return ids, union.astype('datetime64[D]'), matrix
+
+    def get_yearly_stats(self, alpha_ids=None):
+        """以 DataFrame 形式获取年度统计"""
+        query = f"SELECT alpha_id, {', '.join(self.YEARLY_COLUMNS.values())} FROM alpha_yearly_stats ORDER BY alpha_id, year"
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                stats = pd.read_sql_query(query, conn)
+        except Exception as e:
+            print(f"⚠️ 读取年度统计时出错: {str(e)}")
+            stats = pd.DataFrame(columns=['alpha_id'] + list(self.YEARLY_COLUMNS.values()))
+        if alpha_ids is not None:
+            stats = stats[stats['alpha_id'].isin(list(alpha_ids))].reset_index(drop=True)
+        return stats
@@ -0,0 +1,102 @@
+"""进度轮询调度模块 - 在单线程中统一轮询所有进行中的模拟与提交"""
+
+import heapq
+import itertools
+from time import monotonic, sleep
+
+
+class ProgressScheduler:
+    """基于定时堆的进度调度器
+
+    每个待轮询的 Location URL 按 "下次轮询时间" 存放在堆中，调度器只在
+    最早的任务到期时醒来并发出请求，再根据 Retry-After 重新排期。
+    这样成百上千个进行中的任务可以共享一个线程，既不忙等也不多睡。
+    """
+
+    # 就绪检查(如 Alpha 指标尚未计算完成)与 429/5xx 重试的退避参数
+    READY_BACKOFF_BASE = 1.0
+    READY_BACKOFF_MAX = 10.0
+    # 轮询遇到 429/5xx 时的最大重试次数
+    MAX_ERROR_RETRIES = 5
+
+    def __init__(self, session):
+        """初始化调度器"""
+        self.session = session
+        self._heap = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def call_later(self, delay, callback, *args):
+        """在 delay 秒后执行 callback(*args)"""
+        due = monotonic() + max(0.0, delay)
+        heapq.heappush(self._heap, (due, next(self._counter), callback, args))
+
+    def watch(self, url, on_complete, on_error=None, is_ready=None, delay=0, max_wait=None):
+        """跟踪一个进度 URL
+
+        当 Retry-After 为 0 且 is_ready(response) 为真时调用 on_complete(response)；
+        超过 max_wait 秒、请求出错或返回错误状态码时调用 on_error(exception)，
+        错误状态码对应的 requests.HTTPError 带有 response。429 和 5xx 先按指数退避重试。
+        """
+        deadline = monotonic() + max_wait if max_wait else None
+        self.call_later(delay, self._poll, url, on_complete, on_error, is_ready, deadline, 0, 0)
+
+    def _backoff(self, attempt):
+        return min(self.READY_BACKOFF_BASE * (2 ** attempt), self.READY_BACKOFF_MAX)
+
+    def _poll(self, url, on_complete, on_error, is_ready, deadline, attempt, errors):
+        """轮询一次进度 URL 并决定是完成、重新排期还是报错"""
+        try:
+            resp = self.session.get(url)
+            retry_after = float(resp.headers.get("Retry-After", 0))
+
+            if resp.status_code == 429 or resp.status_code >= 500:
+                # 限流或平台暂时出错: 有上限的指数退避，重试耗尽后按错误处理
+                if errors >= self.MAX_ERROR_RETRIES:
+                    resp.raise_for_status()
+                retry_after = max(retry_after, self._backoff(errors))
+                errors += 1
+            elif resp.status_code >= 400:
+                resp.raise_for_status()
+            elif retry_after == 0 and is_ready is not None and not is_ready(resp):
+                # 进度已完成但结果尚未就绪，按指数退避重新检查
+                retry_after = self._backoff(attempt)
+                attempt += 1
+
+            if retry_after > 0:
+                if deadline is not None and monotonic() + retry_after > deadline:
+                    raise TimeoutError(f"等待超时: {url}")
+                self.call_later(retry_after, self._poll, url, on_complete, on_error, is_ready, deadline,
+                                attempt, errors)
+                return
+
+            on_complete(resp)
+
+        except Exception as e:
+            if on_error is not None:
+                on_error(e)
+            else:
+                print(f"⚠️ 轮询 {url} 时出错: {str(e)}")
+
+    def step(self):
+        """执行最早到期的一个任务，必要时先休眠到其到期时间
+
+        返回 False 表示没有任何待执行的任务。
+        """
+        if not self._heap:
+            return False
+
+        wait = self._heap[0][0] - monotonic()
+        if wait > 0:
+            sleep(wait)
+
+        _, _, callback, args = heapq.heappop(self._heap)
+        callback(*args)
+        return True
+
+    def run(self):
+        """执行所有任务直到堆为空"""
+        while self.step():
+            pass
@@ -0,0 +1,180 @@
+"""Alpha 资格评分模块 - 用可配置的阈值方案批量、向量化地评估 Alpha 指标"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+
+# 每个检查项: min/max 为达标阈值，near_min/near_max 为接近达标阈值
+# near_pass_ratio: 存在不达标项时，接近达标项占比不低于该比例仍视为接近合格；为 None 时不启用
+QUALIFICATION_PROFILES = {
+    'default': {
+        'description': "原有标准 (Sharpe 1.5 / Fitness 1.0，75% 接近达标规则)",
+        'near_pass_ratio': 0.75,
+        'checks': {
+            'sharpe': {'min': 1.5, 'near_min': 1.3},
+            'fitness': {'min': 1.0, 'near_min': 0.8},
+            'turnover': {'min': 0.1, 'max': 0.9, 'near_min': 0.05, 'near_max': 0.95},
+            'margin': {'min': 0.02, 'near_min': 0.015},
+            'sub_universe_ratio': {'min': 1.0, 'near_min': 0.8},
+            'returns': {'min': 0.05, 'near_min': 0.03},
+            'drawdown': {'max': 0.5, 'near_max': 0.6},
+            'capacity': {'min': 1000000, 'near_min': 500000},
+        },
+    },
+    'platform': {
+        'description': "平台提交检查 (Sharpe 1.25 / Fitness 1.0 / Turnover 1%-70%)",
+        'near_pass_ratio': None,
+        'checks': {
+            'sharpe': {'min': 1.25, 'near_min': 1.1},
+            'fitness': {'min': 1.0, 'near_min': 0.9},
+            'turnover': {'min': 0.01, 'max': 0.7, 'near_min': 0.005, 'near_max': 0.8},
+            'sub_universe_ratio': {'min': 1.0, 'near_min': 0.9},
+        },
+    },
+    'strict': {
+        'description': "严格标准 (Sharpe 2.0 / Fitness 1.3，不接受接近达标)",
+        'near_pass_ratio': None,
+        'checks': {
+            'sharpe': {'min': 2.0, 'near_min': 1.75},
+            'fitness': {'min': 1.3, 'near_min': 1.1},
+            'turnover': {'min': 0.1, 'max': 0.6, 'near_min': 0.05, 'near_max': 0.7},
+            'margin': {'min': 0.03, 'near_min': 0.02},
+            'sub_universe_ratio': {'min': 1.0, 'near_min': 0.9},
+            'drawdown': {'max': 0.3, 'near_max': 0.4},
+        },
+    },
+}
+
+# 指标表中的数值列
+METRIC_COLUMNS = [
+    'sharpe', 'fitness', 'turnover', 'margin', 'returns', 'drawdown', 'capacity',
+    'sub_universe_sharpe', 'sub_universe_limit',
+]
+
+
+def register_profile(name, profile):
+    """注册或覆盖一个阈值方案"""
+    QUALIFICATION_PROFILES[name] = profile
+
+
+def load_profiles(path):
+    """从 JSON 文件加载阈值方案({名称: 方案})，返回加载的名称列表"""
+    with open(path, encoding='utf-8') as f:
+        profiles = json.load(f)
+    for name, profile in profiles.items():
+        register_profile(name, profile)
+    return list(profiles)
+
+
+def get_profile(profile):
+    """按名称获取阈值方案，传入字典时直接使用"""
+    if isinstance(profile, dict):
+        return profile
+    if profile not in QUALIFICATION_PROFILES:
+        raise ValueError(f"未知的阈值方案: {profile} (可选: {', '.join(QUALIFICATION_PROFILES)})")
+    return QUALIFICATION_PROFILES[profile]
+
+
+def _metric_row(is_data):
+    """从 Alpha 的 is 数据中提取一行指标"""
+    is_data = is_data or {}
+    sub_universe = next(
+        (check for check in is_data.get('checks', []) if check.get('name') == 'LOW_SUB_UNIVERSE_SHARPE'),
+        {}
+    )
+    row = {column: is_data.get(column) for column in METRIC_COLUMNS[:7]}
+    row['sub_universe_sharpe'] = sub_universe.get('value')
+    row['sub_universe_limit'] = sub_universe.get('limit')
+    return row
+
+
+def metrics_frame(records):
+    """把 Alpha 记录转换为指标表
+
+    records 可以是 Alpha 详情(含 is 字段)或历史记录(含 metrics 字段)，
+    缺失的指标记为 0，与原有逐个检查的行为一致。
+    """
+    rows = []
+    alpha_ids = []
+    for record in records:
+        is_data = record.get('is') if 'is' in record else record.get('metrics')
+        rows.append(_metric_row(is_data))
+        alpha_ids.append(record.get('alpha_id', record.get('id')))
+
+    frame = pd.DataFrame(rows, columns=METRIC_COLUMNS).apply(pd.to_numeric, errors='coerce').fillna(0.0)
+    frame.insert(0, 'alpha_id', alpha_ids)
+
+    # 子宇宙 Sharpe 以相对平台限制的比例评估；限制为 0 时只要求非负
+    value = frame['sub_universe_sharpe'].to_numpy()
+    limit = frame['sub_universe_limit'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frame['sub_universe_ratio'] = np.where(limit > 0, value / limit, np.where(value >= 0, np.inf, -np.inf))
+    return frame
+
+
+class QualificationScorer:
+    """按阈值方案批量评估 Alpha 指标"""
+
+    STATUS_PASS = 'pass'
+    STATUS_NEAR = 'near'
+    STATUS_FAIL = 'fail'
+
+    def __init__(self, profile='default'):
+        """初始化评分器，profile 为方案名称或方案字典"""
+        self.profile = get_profile(profile)
+
+    @staticmethod
+    def _margin(values, low, high):
+        """到阈值区间的带符号距离，非负表示在区间内"""
+        margin = np.full(len(values), np.inf)
+        if low is not None:
+            margin = np.minimum(margin, values - low)
+        if high is not None:
+            margin = np.minimum(margin, high - values)
+        return margin
+
+    def score(self, frame):
+        """一次性评估整张指标表
+
+        返回的 DataFrame 对每个检查项给出 margin_<检查项>(达标余量，负数为差距)
+        和 status_<检查项>，以及 near_count、fail_count、status(pass/near_pass/fail)和 qualified。
+        """
+        checks = self.profile['checks']
+        result = pd.DataFrame(index=frame.index)
+        near_count = np.zeros(len(frame), dtype=int)
+        fail_count = np.zeros(len(frame), dtype=int)
+
+        for name, rule in checks.items():
+            values = frame[name].to_numpy(dtype=float)
+            margin = self._margin(values, rule.get('min'), rule.get('max'))
+            near_margin = self._margin(values, rule.get('near_min', rule.get('min')), rule.get('near_max', rule.get('max')))
+            passed = margin >= 0
+            near = ~passed & (near_margin >= 0)
+            failed = ~passed & ~near
+
+            result[f'margin_{name}'] = margin
+            result[f'status_{name}'] = np.select([passed, near], [self.STATUS_PASS, self.STATUS_NEAR], self.STATUS_FAIL)
+            near_count += near
+            fail_count += failed
+
+        # 与原规则一致: 没有不达标项即合格(接近达标项不影响)；
+        # 有不达标项但接近达标项占比足够时视为接近合格
+        ratio = self.profile.get('near_pass_ratio')
+        near_pass = (fail_count > 0) & (near_count >= len(checks) * ratio) if ratio is not None else np.zeros(len(frame), bool)
+        result['near_count'] = near_count
+        result['fail_count'] = fail_count
+        result['status'] = np.select([fail_count == 0, near_pass], ['pass', 'near_pass'], 'fail')
+        result['qualified'] = result['status'] != 'fail'
+        return result
+
+    def score_records(self, records):
+        """评估 Alpha 记录列表，返回指标表与评分结果合并后的 DataFrame"""
+        frame = metrics_frame(records)
+        return frame.join(self.score(frame))
+
+
+def rescore_history(history_manager, profile='default'):
+    """用指定方案重新评估全部历史记录"""
+    return QualificationScorer(profile).score_records(history_manager.get_history())
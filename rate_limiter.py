@@ -0,0 +1,239 @@
+"""请求速率控制模块 - 按端点类别的令牌桶限速、连接池、重试配置与会话过期处理"""
+
+import random
+import re
+import threading
+from collections import defaultdict
+from time import monotonic, sleep
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from telemetry import telemetry
+
+
+# 各端点类别的初始速率(每秒请求数)与突发容量
+DEFAULT_RATE_LIMITS = {
+    'authentication': (0.2, 1),
+    'simulation': (1.0, 3),
+    'progress': (5.0, 10),
+    'alpha': (5.0, 10),
+    'submit': (1.0, 4),
+    'datafields': (4.0, 8),
+    'other': (2.0, 4),
+}
+
+
+def classify_endpoint(method, url):
+    """把请求归类到端点类别"""
+    path = urlparse(url).path
+    if path.startswith('/authentication'):
+        return 'authentication'
+    if path.startswith('/data-fields'):
+        return 'datafields'
+    if re.search(r'/alphas/[^/]+/submit', path):
+        return 'submit' if method.upper() == 'POST' else 'progress'
+    if path.startswith('/simulations'):
+        return 'simulation' if method.upper() == 'POST' else 'progress'
+    if path.startswith('/alphas/'):
+        return 'alpha'
+    return 'other'
+
+
+class TokenBucket:
+    """自适应令牌桶
+
+    遇到 429 时按 Retry-After 暂停并把速率减半，之后每次成功请求线性回升，
+    从而逐步逼近平台允许的最大持续速率(AIMD)。
+    """
+
+    def __init__(self, rate, capacity, min_rate=None, max_rate=None, increase=None):
+        """初始化令牌桶"""
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.min_rate = min_rate if min_rate is not None else self.rate / 16
+        self.max_rate = max_rate if max_rate is not None else self.rate * 4
+        self.increase = increase if increase is not None else self.rate / 20
+        self.tokens = float(capacity)
+        self.updated = monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """获取一个令牌，必要时休眠等待，返回等待的秒数"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            sleep(wait)
+            waited += wait
+
+    def penalize(self, retry_after=None):
+        """收到 429：暂停到 Retry-After 之后并降低速率"""
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, monotonic() + retry_after)
+
+    def reward(self):
+        """请求成功：线性提高速率"""
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+
+class RateGovernor:
+    """客户端全局的速率控制器，为每个端点类别维护一个令牌桶"""
+
+    def __init__(self, rate_limits=None):
+        """初始化速率控制器"""
+        limits = dict(DEFAULT_RATE_LIMITS)
+        limits.update(rate_limits or {})
+        self.buckets = {name: TokenBucket(rate, capacity) for name, (rate, capacity) in limits.items()}
+        self.wait_seconds = defaultdict(float)
+        self.throttled = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def bucket_for(self, endpoint):
+        return self.buckets.get(endpoint, self.buckets['other'])
+
+    def before_request(self, endpoint):
+        """请求发出前获取令牌"""
+        waited = self.bucket_for(endpoint).acquire()
+        if waited:
+            with self.lock:
+                self.wait_seconds[endpoint] += waited
+            telemetry.observe('rate_limit.wait', waited, endpoint=endpoint)
+
+    def after_response(self, endpoint, response):
+        """根据响应调整速率"""
+        bucket = self.bucket_for(endpoint)
+        if response.status_code == 429:
+            with self.lock:
+                self.throttled[endpoint] += 1
+            try:
+                retry_after = float(response.headers.get('Retry-After', 0))
+            except ValueError:
+                retry_after = 0
+            bucket.penalize(retry_after)
+        elif response.status_code < 400:
+            # 只有成功的响应说明还有余量；其他 4xx(会话过期、无权限、不存在)与 5xx 不调整速率
+            bucket.reward()
+
+    def get_statistics(self):
+        """获取各端点类别的当前速率、等待时间和 429 次数"""
+        return {
+            name: {
+                'rate': bucket.rate,
+                'wait_seconds': self.wait_seconds.get(name, 0.0),
+                'throttled': self.throttled.get(name, 0),
+            }
+            for name, bucket in self.buckets.items()
+        }
+
+
+def build_retry(total=5, backoff_factor=0.5, backoff_jitter=0.5):
+    """5xx 与连接错误的指数退避重试策略(带随机抖动)
+
+    POST 只在连接建立失败时重试，避免重复创建模拟或提交。
+    """
+    options = dict(
+        total=total,
+        connect=total,
+        read=2,
+        status=total,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS']),
+        backoff_factor=backoff_factor,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    try:
+        return Retry(backoff_jitter=backoff_jitter, **options)
+    except TypeError:
+        # urllib3 < 2.0 不支持 backoff_jitter，改为在退避时间上手动加抖动
+        return _JitteredRetry(jitter=backoff_jitter, **options)
+
+
+class _JitteredRetry(Retry):
+    """为旧版 urllib3 的退避时间加入随机抖动"""
+
+    def __init__(self, jitter=0.5, **kwargs):
+        self.jitter = jitter
+        super().__init__(**kwargs)
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.jitter = self.jitter
+        return retry
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return backoff + random.uniform(0, self.jitter) if backoff else backoff
+
+
+class GovernedSession(requests.Session):
+    """带令牌桶限速、连接池、自动重试和自动重新认证的 requests 会话"""
+
+    def __init__(self, rate_limits=None, pool_size=16, retry=None):
+        """初始化会话
+
+        pool_size: 每个主机保持的最大连接数，应不小于并发请求数
+        """
+        super().__init__()
+        self.governor = RateGovernor(rate_limits)
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=pool_size,
+            max_retries=retry if retry is not None else build_retry(),
+        )
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+        # 收到 401 时调用的重新认证函数，由客户端设置
+        self.authenticator = None
+        self.auth_generation = 0
+        self._auth_lock = threading.Lock()
+
+    def refresh_authentication(self, generation):
+        """重新认证
+
+        并发请求同时收到 401 时只有第一个执行认证，其余请求等待锁释放后
+        发现 generation 已经变化，直接使用新会话重试。返回是否可以重试。
+        """
+        with self._auth_lock:
+            if self.auth_generation != generation:
+                return True
+            try:
+                self.authenticator()
+            except Exception as e:
+                print(f"❌ 重新认证失败: {str(e)}")
+                return False
+            self.auth_generation += 1
+            return True
+
+    def request(self, method, url, *args, **kwargs):
+        endpoint = classify_endpoint(method, url)
+        generation = self.auth_generation
+        self.governor.before_request(endpoint)
+        response = super().request(method, url, *args, **kwargs)
+        self.governor.after_response(endpoint, response)
+
+        if response.status_code == 401 and self.authenticator and endpoint != 'authentication':
+            print("🔑 会话已过期，正在重新认证...")
+            if self.refresh_authentication(generation):
+                self.governor.before_request(endpoint)
+                response = super().request(method, url, *args, **kwargs)
+                self.governor.after_response(endpoint, response)
+        return response
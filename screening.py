@@ -0,0 +1,196 @@
+"""多保真度筛选模块 - 连续减半(successive halving)的筛选阶梯与分级结果存储"""
+
+import json
+import math
+import sqlite3
+from datetime import datetime
+
+
+# 筛选方案: 候选先在低保真度(离线评估、小股票池)上大量测试，每一级只让排名靠前的
+# promote 比例(且达到该级最低指标)的候选晋级，通过全部阶梯的候选再做完整模拟。
+# pool_factor: 启用筛选时每轮生成的候选数是完整模拟数量的倍数
+# offline 级在没有本地面板数据时跳过(此时候选数量按 pool_size 缩小)；settings 覆盖模拟设置中的对应字段
+SCREENING_SCHEDULES = {
+    'default': {
+        'description': "离线(近一年) → TOP500 → TOP1000 → 完整模拟，每级约保留三分之一",
+        'pool_factor': 3,
+        'rungs': [
+            {'name': 'offline', 'offline': True, 'recent_days': 252, 'promote': 0.5, 'min_sharpe': 0.0},
+            {'name': 'TOP500', 'settings': {'universe': 'TOP500'}, 'promote': 1 / 3,
+             'min_sharpe': 0.5, 'min_fitness': 0.3},
+            {'name': 'TOP1000', 'settings': {'universe': 'TOP1000'}, 'promote': 0.5,
+             'min_sharpe': 0.8, 'min_fitness': 0.5},
+        ],
+    },
+    'aggressive': {
+        'description': "大候选池，每级只保留四分之一 (Hyperband 风格的激进淘汰)",
+        'pool_factor': 6,
+        'rungs': [
+            {'name': 'offline', 'offline': True, 'recent_days': 252, 'promote': 0.25, 'min_sharpe': 0.2},
+            {'name': 'TOP500', 'settings': {'universe': 'TOP500'}, 'promote': 0.25,
+             'min_sharpe': 0.7, 'min_fitness': 0.4},
+            {'name': 'TOP1000', 'settings': {'universe': 'TOP1000'}, 'promote': 0.5,
+             'min_sharpe': 1.0, 'min_fitness': 0.7},
+        ],
+    },
+    'platform_only': {
+        'description': "不使用离线评估: TOP1000 → 完整模拟",
+        'pool_factor': 2,
+        'rungs': [
+            {'name': 'TOP1000', 'settings': {'universe': 'TOP1000'}, 'promote': 0.5,
+             'min_sharpe': 0.7, 'min_fitness': 0.4},
+        ],
+    },
+}
+
+
+def register_schedule(name, schedule):
+    """注册或覆盖一个筛选方案"""
+    SCREENING_SCHEDULES[name] = schedule
+
+
+def get_schedule(schedule):
+    """按名称获取筛选方案，传入字典时直接使用"""
+    if isinstance(schedule, dict):
+        return schedule
+    if schedule not in SCREENING_SCHEDULES:
+        raise ValueError(f"未知的筛选方案: {schedule} (可选: {', '.join(SCREENING_SCHEDULES)})")
+    return SCREENING_SCHEDULES[schedule]
+
+
+def promote(candidates, metrics, rung):
+    """按 Sharpe 降序选出晋级的候选
+
+    metrics: 与 candidates 对应的指标字典列表，None 表示该级评估失败(不晋级)
+    未达到该级最低 Sharpe / Fitness 的候选不晋级；晋级数量为 ceil(总数 × promote)。
+    """
+    eligible = [
+        (metric.get('sharpe', 0.0), index) for index, metric in enumerate(metrics)
+        if metric is not None
+        and metric.get('sharpe', 0.0) >= rung.get('min_sharpe', float('-inf'))
+        and ('fitness' not in metric or metric['fitness'] >= rung.get('min_fitness', float('-inf')))
+    ]
+    eligible.sort(key=lambda item: -item[0])
+    quota = math.ceil(len(candidates) * rung.get('promote', 1.0))
+    return [candidates[index] for _, index in eligible[:quota]]
+
+
+def simulation_cost(pool, rungs):
+    """pool 个候选走完给定阶梯并完整模拟晋级者，最多需要的平台模拟次数(离线级不计)"""
+    cost = 0
+    for rung in rungs:
+        if not rung.get('offline'):
+            cost += pool
+        pool = math.ceil(pool * rung.get('promote', 1.0))
+    return cost + pool
+
+
+def pool_size(schedule, budget, offline_available=True):
+    """启用筛选时每轮生成的候选数量
+
+    有离线级可用时为 budget × pool_factor。没有离线级可用时，平台级筛选和完整模拟消耗同样的
+    模拟配额，候选数量缩小到总模拟次数不超过 budget(即不超过不筛选时的模拟次数)。
+    """
+    rungs = [rung for rung in schedule['rungs'] if offline_available or not rung.get('offline')]
+    pool = budget * schedule.get('pool_factor', 1)
+    if any(rung.get('offline') for rung in rungs):
+        return pool
+    while pool > 1 and simulation_cost(pool, rungs) > budget:
+        pool -= 1
+    return pool
+
+
+class ScreeningStore:
+    """按 (模拟请求键, 保真度) 保存各级筛选结果，存储在 alpha_history.db 中
+
+    同一表达式与设置在同一级上已经筛选过时直接复用结果。
+    """
+
+    TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+    def __init__(self, db_file="alpha_history.db"):
+        """初始化存储"""
+        self.db_file = db_file
+        self.init_database()
+
+    def init_database(self):
+        """初始化筛选结果表"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS screening_results (
+                        alpha_key TEXT,
+                        fidelity TEXT,
+                        expression TEXT,
+                        alpha_id TEXT,
+                        sharpe REAL,
+                        fitness REAL,
+                        metrics TEXT,  -- JSON格式存储指标
+                        promoted BOOLEAN DEFAULT 0,
+                        screened_at TEXT,
+                        PRIMARY KEY (alpha_key, fidelity)
+                    )
+                ''')
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 初始化筛选结果表时出错: {str(e)}")
+
+    def get(self, alpha_key, fidelity):
+        """查询某一级的筛选指标，没有记录时返回 None"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                row = conn.execute(
+                    'SELECT metrics FROM screening_results WHERE alpha_key = ? AND fidelity = ?',
+                    (alpha_key, fidelity)
+                ).fetchone()
+        except Exception as e:
+            print(f"⚠️ 查询筛选结果时出错: {str(e)}")
+            return None
+        return json.loads(row[0]) if row and row[0] else None
+
+    def put(self, alpha_key, fidelity, expression, metrics, alpha_id=None):
+        """保存一次筛选的指标"""
+        metrics = metrics or {}
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO screening_results
+                    (alpha_key, fidelity, expression, alpha_id, sharpe, fitness, metrics, promoted, screened_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
+                ''', (
+                    alpha_key, fidelity, expression, alpha_id,
+                    metrics.get('sharpe'), metrics.get('fitness'), json.dumps(metrics),
+                    datetime.now().strftime(self.TIME_FORMAT)
+                ))
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 保存筛选结果时出错: {str(e)}")
+
+    def mark_promoted(self, alpha_keys, fidelity):
+        """标记在某一级晋级的候选"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                conn.executemany(
+                    'UPDATE screening_results SET promoted = 1 WHERE alpha_key = ? AND fidelity = ?',
+                    [(alpha_key, fidelity) for alpha_key in alpha_keys]
+                )
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 更新筛选结果时出错: {str(e)}")
+
+    def get_summary(self):
+        """各保真度的筛选数量、晋级数量与平均 Sharpe"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                rows = conn.execute('''
+                    SELECT fidelity, COUNT(*), SUM(promoted), AVG(sharpe)
+                    FROM screening_results GROUP BY fidelity
+                ''').fetchall()
+        except Exception as e:
+            print(f"⚠️ 读取筛选统计时出错: {str(e)}")
+            return {}
+        return {
+            fidelity: {'screened': count, 'promoted': int(promoted or 0), 'mean_sharpe': mean_sharpe}
+            for fidelity, count, promoted, mean_sharpe in rows
+        }
@@ -0,0 +1,310 @@
+"""组合搜索空间模块 - 模板族 × 字段 × 窗口 × 分组的按索引寻址枚举与采样"""
+
+import itertools
+import math
+import random
+import re
+from bisect import bisect_right
+
+from fastexpr import iter_unique_expressions
+
+
+# 每种槽位类型的默认取值；field 类型的取值是运行时传入的数据字段
+SLOT_DOMAINS = {
+    'window': (5, 10, 20, 60, 120, 252),
+    'short_window': (3, 5, 10, 20),
+    'long_window': (60, 120, 252),
+    'group': ('market', 'sector', 'industry', 'subindustry'),
+}
+
+# 模板族: template 中的 {槽位} 由 slots 声明类型；同一族内的多个 field 槽位取不同字段
+TEMPLATE_FAMILIES = {
+    'ts_rank': {
+        'description': "时间序列排名",
+        'template': "ts_rank({field}, {window})",
+        'slots': {'field': 'field', 'window': 'window'},
+    },
+    'group_zscore': {
+        'description': "分组内的时间序列标准分",
+        'template': "group_rank(ts_zscore({field}, {window}), {group})",
+        'slots': {'field': 'field', 'window': 'window', 'group': 'group'},
+    },
+    'mean_reversion': {
+        'description': "偏离均值的反转",
+        'template': "-group_neutralize(({field} - ts_mean({field}, {window})) / ts_std_dev({field}, {window}), {group})",
+        'slots': {'field': 'field', 'window': 'window', 'group': 'group'},
+    },
+    'momentum': {
+        'description': "变化率动量",
+        'template': "ts_rank({field}/delay({field}, {short}) - 1, {window})",
+        'slots': {'field': 'field', 'short': 'short_window', 'window': 'window'},
+    },
+    'volatility_ratio': {
+        'description': "波动率期限结构",
+        'template': "group_rank(ts_std_dev({field}, {short}) / ts_std_dev({field}, {long}) - 1, {group})",
+        'slots': {'field': 'field', 'short': 'short_window', 'long': 'long_window', 'group': 'group'},
+    },
+    'relative_value': {
+        'description': "分组内的相对价值",
+        'template': "({field} - group_mean({field}, 1, {group})) / group_std_dev({field}, {group})",
+        'slots': {'field': 'field', 'group': 'group'},
+    },
+    'conditional': {
+        'description': "低波动状态下交易",
+        'template': "trade_when(ts_rank(ts_std_dev(returns, {short}), 252) < 0.9, group_rank({field}, {group}), -1)",
+        'slots': {'field': 'field', 'short': 'short_window', 'group': 'group'},
+    },
+    'pair_spread': {
+        'description': "两字段排名差",
+        'template': "ts_rank({field1}, {window}) - ts_rank({field2}, {window})",
+        'slots': {'field1': 'field', 'field2': 'field', 'window': 'window'},
+    },
+    'pair_correlation': {
+        'description': "两字段滚动相关",
+        'template': "group_rank(ts_corr({field1}, {field2}, {window}), {group})",
+        'slots': {'field1': 'field', 'field2': 'field', 'window': 'window', 'group': 'group'},
+    },
+    'pair_neutralized': {
+        'description': "对另一字段回归中性化",
+        'template': "regression_neut(group_rank({field1}, {group}), group_rank({field2}, {group}))",
+        'slots': {'field1': 'field', 'field2': 'field', 'group': 'group'},
+    },
+    'triple_composite': {
+        'description': "三因子排名合成",
+        'template': "ts_rank({field1}, {window}) * ts_rank({field2}, {window}) - ts_rank({field3}, {window})",
+        'slots': {'field1': 'field', 'field2': 'field', 'field3': 'field', 'window': 'window'},
+    },
+}
+
+_SLOT_PATTERN = re.compile(r'\{(\w+)\}')
+
+
+def register_family(name, family):
+    """注册或覆盖一个模板族"""
+    missing = set(_SLOT_PATTERN.findall(family['template'])) - set(family['slots'])
+    if missing:
+        raise ValueError(f"模板族 {name} 的槽位未声明类型: {', '.join(sorted(missing))}")
+    TEMPLATE_FAMILIES[name] = family
+
+
+def _quasi_random_steps(dimensions):
+    """R_d 低差异序列的步长: 1/φ_d^(k+1)，φ_d 为 x^(d+1) = x + 1 的正根"""
+    phi = 2.0
+    for _ in range(50):
+        phi = (1 + phi) ** (1.0 / (dimensions + 1))
+    return [(1.0 / phi) ** (k + 1) for k in range(dimensions)]
+
+
+class _FamilySpace:
+    """单个模板族的取值空间，按混合进制在 [0, size) 上寻址"""
+
+    def __init__(self, name, family, datafields, domains):
+        self.name = name
+        self.template = family['template']
+        self.slots = list(family['slots'].items())
+        self.datafields = datafields
+        # 每个槽位一位: field 槽位按无放回顺序选择，基数依次减一
+        self.radices = []
+        field_count = 0
+        for _, slot_type in self.slots:
+            if slot_type == 'field':
+                self.radices.append(max(len(datafields) - field_count, 0))
+                field_count += 1
+            else:
+                self.radices.append(len(domains[slot_type]))
+        self.domains = domains
+        self.size = math.prod(self.radices) if self.radices else 1
+
+    def digits(self, index):
+        digits = []
+        for radix in reversed(self.radices):
+            index, digit = divmod(index, radix)
+            digits.append(digit)
+        return digits[::-1]
+
+    def index(self, digits):
+        index = 0
+        for digit, radix in zip(digits, self.radices):
+            index = index * radix + digit
+        return index
+
+    def decode(self, index):
+        """族内索引 -> {槽位: 取值}"""
+        assignment = {}
+        used = []
+        for (slot, slot_type), digit in zip(self.slots, self.digits(index)):
+            if slot_type == 'field':
+                # 第 digit 个尚未使用的字段
+                position = digit
+                for taken in sorted(used):
+                    if taken <= position:
+                        position += 1
+                used.append(position)
+                assignment[slot] = self.datafields[position]
+            else:
+                assignment[slot] = self.domains[slot_type][digit]
+        return assignment
+
+    def render(self, index):
+        return self.template.format(**self.decode(index))
+
+
+class SearchSpace:
+    """模板族与数据字段构成的组合搜索空间
+
+    所有族的取值空间首尾相接成一个 [0, len(space)) 的全局索引，任何索引都可以
+    直接解码为表达式，无需物化整个乘积空间。采样器按索引去重，同一个空间实例
+    在多轮之间不会重复产出同一个组合。
+    """
+
+    SAMPLERS = ('uniform', 'stratified', 'quasi_random')
+    # 均匀采样连续命中已采样索引的次数上限，超过后改为顺序查找下一个未采样索引
+    MAX_REJECTIONS = 64
+
+    def __init__(self, datafields, families=None, domains=None, seed=None):
+        """初始化搜索空间
+
+        families: 使用的模板族名称列表，默认使用全部已注册的模板族
+        domains: 覆盖默认的槽位取值，如 {'window': (10, 20)}
+        """
+        self.datafields = list(dict.fromkeys(datafields))
+        self.domains = {**SLOT_DOMAINS, **(domains or {})}
+        names = list(families) if families else list(TEMPLATE_FAMILIES)
+        self.families = [
+            space for space in (_FamilySpace(name, TEMPLATE_FAMILIES[name], self.datafields, self.domains) for name in names)
+            if space.size > 0
+        ]
+        self.offsets = [0]
+        for space in self.families:
+            self.offsets.append(self.offsets[-1] + space.size)
+        self.rng = random.Random(seed)
+        self.drawn = set()
+        self.seen_hashes = set()
+        self._quasi_positions = {space.name: 0 for space in self.families}
+        self._quasi_steps = {}
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def family_sizes(self):
+        """各模板族的组合数量"""
+        return {space.name: space.size for space in self.families}
+
+    def _locate(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(f"索引超出搜索空间范围: {index}")
+        position = bisect_right(self.offsets, index) - 1
+        return self.families[position], index - self.offsets[position]
+
+    def decode(self, index):
+        """全局索引 -> (模板族名称, {槽位: 取值})"""
+        space, local = self._locate(index)
+        return space.name, space.decode(local)
+
+    def expression(self, index):
+        """全局索引 -> 表达式"""
+        space, local = self._locate(index)
+        return space.render(local)
+
+    def _take(self, index):
+        """登记一个未采样过的索引，已采样过时返回 False"""
+        if index in self.drawn:
+            return False
+        self.drawn.add(index)
+        return True
+
+    def _draw_in_range(self, start, size):
+        """在 [start, start + size) 中均匀抽取一个未采样的索引，全部采样过时返回 None"""
+        for _ in range(self.MAX_REJECTIONS):
+            index = start + self.rng.randrange(size)
+            if self._take(index):
+                return index
+        # 该区间已接近采样完: 从随机位置开始顺序查找
+        begin = self.rng.randrange(size)
+        for step in range(size):
+            index = start + (begin + step) % size
+            if self._take(index):
+                return index
+        return None
+
+    def iter_uniform(self):
+        """在整个空间上无放回地均匀采样索引(组合多的模板族被抽中的概率更高)"""
+        while len(self.drawn) < len(self):
+            index = self._draw_in_range(0, len(self))
+            if index is None:
+                return
+            yield index
+
+    def iter_stratified(self):
+        """按模板族分层: 轮流从每个族中均匀抽取，小族与大族得到同样多的样本"""
+        active = list(range(len(self.families)))
+        self.rng.shuffle(active)
+        while active:
+            for position in list(active):
+                index = self._draw_in_range(self.offsets[position], self.families[position].size)
+                if index is None:
+                    active.remove(position)
+                else:
+                    yield index
+
+    def _draw_quasi_random(self, position):
+        """沿第 position 个族的 R_d 低差异序列抽取一个未采样的索引，该族已采样完时返回 None"""
+        space = self.families[position]
+        steps = self._quasi_steps.setdefault(space.name, _quasi_random_steps(len(space.radices)))
+        # 低差异序列会落在已采样的点上，多次落空后改为随机抽取
+        for _ in range(min(space.size, 4 * self.MAX_REJECTIONS)):
+            n = self._quasi_positions[space.name] = self._quasi_positions[space.name] + 1
+            digits = [
+                min(int(((0.5 + n * step) % 1.0) * radix), radix - 1)
+                for step, radix in zip(steps, space.radices)
+            ]
+            candidate = self.offsets[position] + space.index(digits)
+            if self._take(candidate):
+                return candidate
+        return self._draw_in_range(self.offsets[position], space.size)
+
+    def iter_quasi_random(self):
+        """按模板族分层，族内沿 R_d 低差异序列取点，各槽位的取值比随机采样覆盖得更均匀
+
+        序列位置保存在实例中，下一轮从上次停下的位置继续。
+        """
+        active = list(range(len(self.families)))
+        while active:
+            for position in list(active):
+                index = self._draw_quasi_random(position)
+                if index is None:
+                    active.remove(position)
+                else:
+                    yield index
+
+    def iter_family_expressions(self, name):
+        """只从指定模板族中(沿低差异序列)产出新的表达式"""
+        position = next((i for i, space in enumerate(self.families) if space.name == name), None)
+        if position is None:
+            return iter(())
+
+        def indices():
+            while True:
+                index = self._draw_quasi_random(position)
+                if index is None:
+                    return
+                yield index
+
+        return iter_unique_expressions((self.expression(index) for index in indices()), seen=self.seen_hashes)
+
+    def iter_indices(self, method='stratified'):
+        """按采样方法产出未采样过的索引"""
+        if method not in self.SAMPLERS:
+            raise ValueError(f"未知的采样方法: {method} (可选: {', '.join(self.SAMPLERS)})")
+        return getattr(self, f"iter_{method}")()
+
+    def iter_expressions(self, method='stratified'):
+        """惰性产出新的表达式(按结构哈希跳过与之前产出过的等价表达式)"""
+        return iter_unique_expressions(
+            (self.expression(index) for index in self.iter_indices(method)),
+            seen=self.seen_hashes
+        )
+
+    def sample(self, count, method='stratified'):
+        """采样 count 个之前没有产出过的表达式"""
+        return list(itertools.islice(self.iter_expressions(method), count))
@@ -0,0 +1,166 @@
+"""自相关检查模块 - 用本地保存的日度 PnL 估算候选 Alpha 与已提交组合的相关性"""
+
+import numpy as np
+
+
+class SelfCorrelationEngine:
+    """维护已提交 Alpha 的相关矩阵，并批量计算候选的最大相关性
+
+    日期窗口取已提交组合与评估过的候选的日期并集中最近的 lookback_days 个交易日。
+    每个序列在窗口上去均值并归一化为单位向量(缺失日记为 0)，两个序列的相关系数即为
+    向量点积。新增 Alpha 时只计算新行与已有行的点积并扩展矩阵；只有窗口移动时才用
+    保存的原始 PnL 重新对齐组合并重算矩阵。候选评分是一次矩阵乘法。
+    """
+
+    # 平台的自相关上限
+    DEFAULT_THRESHOLD = 0.7
+    # 参与计算的交易日数量(约 4 年)
+    DEFAULT_LOOKBACK_DAYS = 1000
+
+    def __init__(self, pnl_store, threshold=DEFAULT_THRESHOLD, lookback_days=DEFAULT_LOOKBACK_DAYS):
+        """初始化自相关引擎"""
+        self.pnl_store = pnl_store
+        self.threshold = threshold
+        self.lookback_days = lookback_days
+        self.alpha_ids = []
+        # 已提交组合的原始 PnL，每次加入的一批为一块 (日期, 矩阵)，窗口移动时重新对齐
+        self._pnl_blocks = []
+        # 已见过的全部日期(组合与候选的并集)
+        self._seen_dates = np.empty(0, dtype='datetime64[D]')
+        self.dates = None
+        self.vectors = None
+        self.correlation = np.empty((0, 0))
+
+    def __len__(self):
+        return len(self.alpha_ids)
+
+    @staticmethod
+    def _align(dates, matrix, window):
+        """把按 dates 排列的矩阵对齐到 window，缺失日为 NaN"""
+        aligned = np.full((len(matrix), len(window)), np.nan)
+        if len(dates):
+            columns = np.minimum(np.searchsorted(dates, window), len(dates) - 1)
+            valid = dates[columns] == window
+            aligned[:, valid] = matrix[:, columns[valid]]
+        return aligned
+
+    @staticmethod
+    def _normalize(aligned):
+        """去均值并归一化为单位向量"""
+        observed = ~np.isnan(aligned)
+        counts = observed.sum(axis=1, keepdims=True)
+        means = np.where(observed, aligned, 0.0).sum(axis=1, keepdims=True) / np.maximum(counts, 1)
+        centered = np.where(observed, aligned - means, 0.0)
+        norms = np.linalg.norm(centered, axis=1, keepdims=True)
+        # 常数或没有数据的序列与任何序列的相关性都记为 0
+        return np.divide(centered, norms, out=np.zeros_like(centered), where=norms > 0)
+
+    def _use_window(self, dates):
+        """把 dates 并入已见日期，窗口移动时重新对齐组合向量并重算相关矩阵，返回当前窗口"""
+        seen = np.union1d(self._seen_dates, dates)
+        if self.dates is not None and len(seen) == len(self._seen_dates):
+            return self.dates
+        self._seen_dates = seen
+        window = seen[-self.lookback_days:]
+        if self.dates is None or not np.array_equal(window, self.dates):
+            self.dates = window
+            if self._pnl_blocks:
+                self.vectors = np.vstack([
+                    self._normalize(self._align(block_dates, matrix, window))
+                    for block_dates, matrix in self._pnl_blocks
+                ])
+                self.correlation = self.vectors @ self.vectors.T
+        return window
+
+    def _load_vectors(self, alpha_ids):
+        """从 PnL 存储加载候选并归一化到当前窗口，返回 (找到的 alpha_id 列表, 日期, 原始矩阵, 向量矩阵)"""
+        ids, dates, matrix = self.pnl_store.load_matrix(alpha_ids)
+        if not ids:
+            return [], dates, matrix, np.empty((0, 0 if self.dates is None else len(self.dates)))
+        window = self._use_window(dates)
+        return ids, dates, matrix, self._normalize(self._align(dates, matrix, window))
+
+    def add(self, alpha_ids):
+        """把 Alpha 加入已提交组合(增量扩展相关矩阵)，返回实际加入的数量"""
+        known = set(self.alpha_ids)
+        ids, dates, matrix, vectors = self._load_vectors(
+            [alpha_id for alpha_id in dict.fromkeys(alpha_ids) if alpha_id not in known])
+        if not ids:
+            return 0
+
+        # 存储返回的可能是只读的内存映射视图，保存副本
+        self._pnl_blocks.append((np.array(dates), np.array(matrix, dtype=np.float64)))
+        if self.vectors is None:
+            self.vectors = vectors
+            self.correlation = vectors @ vectors.T
+        else:
+            cross = self.vectors @ vectors.T
+            self.correlation = np.block([[self.correlation, cross], [cross.T, vectors @ vectors.T]])
+            self.vectors = np.vstack([self.vectors, vectors])
+        self.alpha_ids.extend(ids)
+        return len(ids)
+
+    def score(self, alpha_ids):
+        """计算每个候选与已提交组合的最大相关性
+
+        返回 {alpha_id: (最大相关系数, 最相关的已提交 alpha_id)}；
+        本地没有 PnL 的候选不在结果中，组合为空时相关系数为 0。
+        """
+        ids, _, _, vectors = self._load_vectors(alpha_ids)
+        if not ids:
+            return {}
+        if not self.alpha_ids:
+            return {alpha_id: (0.0, None) for alpha_id in ids}
+
+        correlations = vectors @ self.vectors.T
+        best = correlations.argmax(axis=1)
+        return {
+            alpha_id: (float(correlations[i, best[i]]), self.alpha_ids[best[i]])
+            for i, alpha_id in enumerate(ids)
+        }
+
+    def filter_candidates(self, alpha_ids):
+        """按顺序筛选候选，剔除与已提交组合或本批中已保留候选相关性超过阈值的 Alpha
+
+        返回 (保留的 alpha_id 列表, {被剔除的 alpha_id: (相关系数, 最相关的 alpha_id)})。
+        本地没有 PnL 的候选无法判断，直接保留。
+        """
+        alpha_ids = list(dict.fromkeys(alpha_ids))
+        ids, _, _, vectors = self._load_vectors(alpha_ids)
+        position = {alpha_id: i for i, alpha_id in enumerate(ids)}
+
+        if ids and self.alpha_ids:
+            portfolio = vectors @ self.vectors.T
+            portfolio_best = portfolio.argmax(axis=1)
+            portfolio_max = portfolio[np.arange(len(ids)), portfolio_best]
+        else:
+            portfolio_best = np.zeros(len(ids), dtype=int)
+            portfolio_max = np.full(len(ids), -np.inf)
+        within = vectors @ vectors.T
+
+        kept = []
+        kept_rows = []
+        dropped = {}
+        for alpha_id in alpha_ids:
+            i = position.get(alpha_id)
+            if i is None:
+                kept.append(alpha_id)
+                continue
+
+            corr, peer = portfolio_max[i], self.alpha_ids[portfolio_best[i]] if self.alpha_ids else None
+            if kept_rows:
+                batch = within[i, kept_rows]
+                j = int(batch.argmax())
+                if batch[j] > corr:
+                    corr, peer = batch[j], ids[kept_rows[j]]
+
+            if corr > self.threshold:
+                dropped[alpha_id] = (float(corr), peer)
+            else:
+                kept.append(alpha_id)
+                kept_rows.append(i)
+        return kept, dropped
+
+    def get_correlation_matrix(self):
+        """返回 (alpha_id 列表, 已提交组合的相关矩阵)"""
+        return list(self.alpha_ids), self.correlation
@@ -0,0 +1,84 @@
+"""会话持久化模块 - 在磁盘上保存认证 Cookie，启动时复用仍然有效的会话"""
+
+import json
+import os
+import time
+from os.path import expanduser
+
+from requests.cookies import create_cookie
+
+
+class SessionStore:
+    """把 requests 会话的 Cookie 保存到仅当前用户可读写(0600)的文件中"""
+
+    # 剩余有效期少于该秒数时不再复用，直接重新认证
+    MIN_REMAINING_SECONDS = 300
+
+    def __init__(self, path="~/.brain_session.json"):
+        """初始化会话存储"""
+        self.path = expanduser(path)
+
+    def load(self, session, username):
+        """把保存的 Cookie 加载到会话中
+
+        只有属于同一用户且未过期的会话才会被加载，返回是否加载成功
+        """
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"⚠️ 读取保存的会话时出错: {str(e)}")
+            return False
+
+        if data.get('username') != username:
+            return False
+        if data.get('expires_at', 0) - time.time() < self.MIN_REMAINING_SECONDS:
+            return False
+
+        for cookie in data.get('cookies', []):
+            session.cookies.set_cookie(create_cookie(**cookie))
+        return True
+
+    def save(self, session, username, expiry_seconds=None):
+        """保存会话 Cookie
+
+        expiry_seconds: 服务端返回的会话有效秒数，缺省时使用 Cookie 自身的过期时间
+        """
+        cookies = [
+            {
+                'name': cookie.name,
+                'value': cookie.value,
+                'domain': cookie.domain,
+                'path': cookie.path,
+                'expires': cookie.expires,
+                'secure': cookie.secure,
+            }
+            for cookie in session.cookies
+        ]
+        if expiry_seconds is not None:
+            expires_at = time.time() + float(expiry_seconds)
+        else:
+            expires = [c['expires'] for c in cookies if c['expires']]
+            expires_at = min(expires) if expires else 0
+
+        data = {'username': username, 'expires_at': expires_at, 'cookies': cookies}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️ 保存会话时出错: {str(e)}")
+
+    def clear(self):
+        """删除保存的会话"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ 删除保存的会话时出错: {str(e)}")
@@ -0,0 +1,172 @@
+"""模拟结果缓存模块 - 跳过已经模拟过的表达式 + 设置组合"""
+
+import hashlib
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+from fastexpr import FastExprSyntaxError, canonical_form
+
+
+class SimulationCache:
+    """以 (规范化表达式, 完整设置) 的哈希为键缓存模拟结果，存储在 alpha_history.db 中"""
+
+    TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+    def __init__(self, db_file="alpha_history.db", ttl_days=30):
+        """初始化缓存
+
+        ttl_days: 缓存有效天数，过期条目视为未命中；为 None 时永不过期
+        """
+        self.db_file = db_file
+        self.ttl_days = ttl_days
+        self.hits = 0
+        self.misses = 0
+        self.init_database()
+
+    def init_database(self):
+        """初始化缓存表"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS simulation_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        expression TEXT,
+                        settings TEXT,  -- JSON格式存储模拟设置
+                        alpha_id TEXT,
+                        passed_all_checks BOOLEAN,
+                        metrics TEXT,  -- JSON格式存储指标
+                        created_at TEXT
+                    )
+                ''')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_simulation_cache_created ON simulation_cache (created_at)')
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 初始化模拟缓存时出错: {str(e)}")
+
+    @staticmethod
+    def normalize_expression(expression):
+        """规范化表达式(语义等价的写法得到相同结果，无法解析时只去除空白)"""
+        try:
+            return canonical_form(expression or '')
+        except FastExprSyntaxError:
+            return ''.join((expression or '').split())
+
+    @classmethod
+    def make_key(cls, alpha):
+        """根据模拟请求生成缓存键"""
+        payload = {
+            'type': alpha.get('type', 'REGULAR'),
+            'regular': cls.normalize_expression(alpha.get('regular')),
+            'settings': alpha.get('settings', {}),
+        }
+        raw = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _expiry_cutoff(self):
+        if self.ttl_days is None:
+            return None
+        return (datetime.now() - timedelta(days=self.ttl_days)).strftime(self.TIME_FORMAT)
+
+    def get(self, alpha, scorer=None):
+        """查询缓存，命中时返回结果记录，未命中或已过期返回 None
+
+        scorer: 当前使用的 QualificationScorer，提供时按其阈值方案重新评估缓存的指标，
+        而不是沿用写入缓存时的结论
+        """
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT expression, alpha_id, passed_all_checks, metrics, created_at
+                    FROM simulation_cache
+                    WHERE cache_key = ?
+                ''', (self.make_key(alpha),))
+                row = cursor.fetchone()
+        except Exception as e:
+            print(f"⚠️ 查询模拟缓存时出错: {str(e)}")
+            row = None
+
+        cutoff = self._expiry_cutoff()
+        if row is None or (cutoff is not None and row[4] < cutoff):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        metrics = json.loads(row[3]) if row[3] else {}
+        passed = bool(row[2])
+        if scorer is not None:
+            passed = bool(scorer.score_records([{'metrics': metrics}]).iloc[0]['qualified'])
+        return {
+            'expression': alpha.get('regular', row[0]),
+            'alpha_id': row[1],
+            'passed_all_checks': passed,
+            'metrics': metrics,
+            'timestamp': row[4],
+            'cached': True
+        }
+
+    def put(self, alpha, result):
+        """写入一次模拟的结果"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT OR REPLACE INTO simulation_cache
+                    (cache_key, expression, settings, alpha_id, passed_all_checks, metrics, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    self.make_key(alpha),
+                    alpha.get('regular'),
+                    json.dumps(alpha.get('settings', {}), sort_keys=True),
+                    result.get('alpha_id'),
+                    result.get('passed_all_checks', False),
+                    json.dumps(result.get('metrics', {})),
+                    datetime.now().strftime(self.TIME_FORMAT)
+                ))
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 写入模拟缓存时出错: {str(e)}")
+
+    def invalidate(self, alpha=None):
+        """使缓存失效，alpha 为 None 时清空全部缓存"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                if alpha is None:
+                    cursor.execute('DELETE FROM simulation_cache')
+                else:
+                    cursor.execute('DELETE FROM simulation_cache WHERE cache_key = ?', (self.make_key(alpha),))
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 清除模拟缓存时出错: {str(e)}")
+
+    def purge_expired(self):
+        """删除所有过期条目，返回删除数量"""
+        cutoff = self._expiry_cutoff()
+        if cutoff is None:
+            return 0
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM simulation_cache WHERE created_at < ?', (cutoff,))
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            print(f"❌ 清理过期模拟缓存时出错: {str(e)}")
+            return 0
+
+    def reset_stats(self):
+        """重置命中统计(每轮开始时调用)"""
+        self.hits = 0
+        self.misses = 0
+
+    def get_statistics(self):
+        """获取命中统计"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total > 0 else 0
+        }
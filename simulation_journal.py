@@ -0,0 +1,176 @@
+"""模拟日志模块 - 预写式记录每个候选的生命周期，进程中断后可以恢复进行中的模拟"""
+
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+from simulation_cache import SimulationCache
+
+
+class SimulationJournal:
+    """记录候选从排队到入库的各个阶段，存储在 alpha_history.db 中
+
+    状态流转: queued -> posted(已获得 Location) -> completed(已获得 alpha_id)
+             -> scored(已生成结果) -> persisted(已写入历史)；出错时为 failed。
+    每次状态变化都立即提交，进程随时退出都不会丢失已经提交给平台的模拟。
+    分阶段筛选的模拟同样登记，fidelity 为筛选级名称，candidate 为对应的原始候选。
+    """
+
+    TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+    # 可以恢复的状态(平台已经接受，但结果尚未入库)
+    RESUMABLE_STATES = ('posted', 'completed', 'scored')
+
+    def __init__(self, db_file="alpha_history.db"):
+        """初始化模拟日志"""
+        self.db_file = db_file
+        self.init_database()
+
+    def init_database(self):
+        """初始化日志表"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS simulation_journal (
+                        journal_key TEXT PRIMARY KEY,
+                        payload TEXT,  -- JSON格式存储模拟请求
+                        state TEXT,
+                        location TEXT,
+                        child_index INTEGER,  -- 多模拟中的子模拟序号，普通模拟为 NULL
+                        alpha_id TEXT,
+                        result TEXT,  -- JSON格式存储结果记录
+                        created_at TEXT,
+                        updated_at TEXT,
+                        fidelity TEXT,  -- 筛选级名称，完整模拟为 NULL
+                        candidate TEXT  -- 筛选模拟对应的原始候选(JSON)
+                    )
+                ''')
+                # 旧版本创建的表没有筛选相关的列
+                columns = {row[1] for row in cursor.execute('PRAGMA table_info(simulation_journal)')}
+                for column in ('fidelity', 'candidate'):
+                    if column not in columns:
+                        cursor.execute(f'ALTER TABLE simulation_journal ADD COLUMN {column} TEXT')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_simulation_journal_state ON simulation_journal (state)')
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 初始化模拟日志时出错: {str(e)}")
+
+    def _now(self):
+        return datetime.now().strftime(self.TIME_FORMAT)
+
+    def enqueue(self, alpha_list):
+        """把一批候选记录为 queued"""
+        self._insert([(alpha, None, None) for alpha in alpha_list])
+
+    def enqueue_screening(self, pairs, fidelity):
+        """把一批筛选模拟记录为 queued
+
+        pairs: [(筛选用的模拟请求, 原始候选), ...]
+        """
+        self._insert([(screening_alpha, fidelity, alpha) for screening_alpha, alpha in pairs])
+
+    def _insert(self, rows):
+        now = self._now()
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO simulation_journal
+                    (journal_key, payload, state, location, child_index, alpha_id, result, created_at, updated_at,
+                     fidelity, candidate)
+                    VALUES (?, ?, 'queued', NULL, NULL, NULL, NULL, ?, ?, ?, ?)
+                ''', [
+                    (SimulationCache.make_key(alpha), json.dumps(alpha), now, now,
+                     fidelity, json.dumps(candidate) if candidate else None)
+                    for alpha, fidelity, candidate in rows
+                ])
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 写入模拟日志时出错: {str(e)}")
+
+    def _update(self, alpha, **columns):
+        """更新一个候选的记录，未登记的候选不做处理"""
+        columns['updated_at'] = self._now()
+        assignments = ', '.join(f"{column} = ?" for column in columns)
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f'UPDATE simulation_journal SET {assignments} WHERE journal_key = ?',
+                    list(columns.values()) + [SimulationCache.make_key(alpha)]
+                )
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 更新模拟日志时出错: {str(e)}")
+
+    def mark_posted(self, alpha, location, child_index=None):
+        """模拟请求已被平台接受"""
+        self._update(alpha, state='posted', location=location, child_index=child_index)
+
+    def mark_completed(self, alpha, alpha_id):
+        """模拟已完成并生成 Alpha"""
+        self._update(alpha, state='completed', alpha_id=alpha_id)
+
+    def mark_scored(self, alpha, result):
+        """已获取指标并生成结果记录"""
+        self._update(alpha, state='scored', result=json.dumps(result))
+
+    def mark_persisted(self, alpha):
+        """结果已写入缓存和历史记录"""
+        self._update(alpha, state='persisted')
+
+    def mark_failed(self, alpha):
+        """模拟失败，不再恢复"""
+        self._update(alpha, state='failed')
+
+    def get_outstanding(self):
+        """获取需要恢复的记录，同时把从未提交的 queued 记录标记为 abandoned"""
+        placeholders = ', '.join('?' for _ in self.RESUMABLE_STATES)
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "UPDATE simulation_journal SET state = 'abandoned', updated_at = ? WHERE state = 'queued'",
+                    (self._now(),)
+                )
+                cursor.execute(f'''
+                    SELECT payload, state, location, child_index, alpha_id, result, fidelity, candidate
+                    FROM simulation_journal
+                    WHERE state IN ({placeholders})
+                    ORDER BY created_at
+                ''', self.RESUMABLE_STATES)
+                rows = cursor.fetchall()
+                conn.commit()
+        except Exception as e:
+            print(f"⚠️ 读取模拟日志时出错: {str(e)}")
+            return []
+
+        return [
+            {
+                'alpha': json.loads(row[0]),
+                'state': row[1],
+                'location': row[2],
+                'child_index': row[3],
+                'alpha_id': row[4],
+                'result': json.loads(row[5]) if row[5] else None,
+                'fidelity': row[6],
+                'candidate': json.loads(row[7]) if row[7] else None
+            }
+            for row in rows
+        ]
+
+    def purge_finished(self, days=7):
+        """删除 days 天前已结束(persisted/failed/abandoned)的记录，返回删除数量"""
+        cutoff = (datetime.now() - timedelta(days=days)).strftime(self.TIME_FORMAT)
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    DELETE FROM simulation_journal
+                    WHERE state IN ('persisted', 'failed', 'abandoned') AND updated_at < ?
+                ''', (cutoff,))
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            print(f"❌ 清理模拟日志时出错: {str(e)}")
+            return 0
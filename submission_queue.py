@@ -0,0 +1,205 @@
+"""提交队列模块 - 用事务性的队列表取代 alpha_ids.txt"""
+
+import os
+import socket
+import sqlite3
+from datetime import datetime, timedelta
+
+
+class SubmissionQueue:
+    """待提交 Alpha 的持久化队列，存储在 alpha_history.db 中
+
+    状态流转: pending -> claimed -> submitted / rejected；失败次数未达上限的回到 pending。
+    认领使用 BEGIN IMMEDIATE 事务，多个生产者/消费者进程可以同时安全使用。
+    """
+
+    TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+    STATES = ('pending', 'claimed', 'submitted', 'rejected')
+
+    def __init__(self, db_file="alpha_history.db", claim_timeout_minutes=30, max_attempts=3):
+        """初始化提交队列
+
+        claim_timeout_minutes: 认领后超过该时间仍未完成(如进程崩溃)的条目重新变为 pending
+        max_attempts: 提交失败达到该次数后标记为 rejected
+        """
+        self.db_file = db_file
+        self.claim_timeout_minutes = claim_timeout_minutes
+        self.max_attempts = max_attempts
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.init_database()
+
+    def _connect(self):
+        # isolation_level=None 由代码显式控制事务；timeout 让并发写入等待锁而不是直接失败
+        return sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+
+    def _now(self):
+        return datetime.now().strftime(self.TIME_FORMAT)
+
+    def init_database(self):
+        """初始化队列表"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS submission_queue (
+                        alpha_id TEXT PRIMARY KEY,
+                        expression TEXT,
+                        state TEXT,
+                        attempts INTEGER DEFAULT 0,
+                        claimed_by TEXT,
+                        claimed_at TEXT,
+                        error TEXT,
+                        created_at TEXT,
+                        updated_at TEXT
+                    )
+                ''')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_submission_queue_state ON submission_queue (state, created_at)')
+                conn.commit()
+        except Exception as e:
+            print(f"❌ 初始化提交队列时出错: {str(e)}")
+
+    def add(self, alpha_id, expression=None):
+        """加入队列，已存在的 alpha_id 不会重复加入，返回是否新加入"""
+        now = self._now()
+        try:
+            conn = self._connect()
+            try:
+                cursor = conn.execute('''
+                    INSERT OR IGNORE INTO submission_queue
+                    (alpha_id, expression, state, attempts, created_at, updated_at)
+                    VALUES (?, ?, 'pending', 0, ?, ?)
+                ''', (alpha_id, expression, now, now))
+                return cursor.rowcount > 0
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"❌ 加入提交队列时出错: {str(e)}")
+            return False
+
+    def import_file(self, path):
+        """导入旧的 alpha_ids.txt，导入后把文件重命名为 *.imported，返回导入数量"""
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path) as f:
+                alpha_ids = [line.strip() for line in f if line.strip()]
+            now = self._now()
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                before = conn.total_changes
+                conn.executemany('''
+                    INSERT OR IGNORE INTO submission_queue
+                    (alpha_id, state, attempts, created_at, updated_at)
+                    VALUES (?, 'pending', 0, ?, ?)
+                ''', [(alpha_id, now, now) for alpha_id in alpha_ids])
+                imported = conn.total_changes - before
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            finally:
+                conn.close()
+            os.replace(path, f"{path}.imported")
+            print(f"📥 已从 {path} 导入 {imported} 个 Alpha ID 到提交队列")
+            return imported
+        except Exception as e:
+            print(f"❌ 导入 {path} 时出错: {str(e)}")
+            return 0
+
+    def claim(self, limit):
+        """原子地认领最多 limit 个待提交的 Alpha，返回 alpha_id 列表"""
+        now = self._now()
+        expired = (datetime.now() - timedelta(minutes=self.claim_timeout_minutes)).strftime(self.TIME_FORMAT)
+        try:
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                # 回收超时未完成的认领
+                conn.execute('''
+                    UPDATE submission_queue SET state = 'pending', claimed_by = NULL, updated_at = ?
+                    WHERE state = 'claimed' AND claimed_at < ?
+                ''', (now, expired))
+                alpha_ids = [row[0] for row in conn.execute('''
+                    SELECT alpha_id FROM submission_queue
+                    WHERE state = 'pending'
+                    ORDER BY created_at
+                    LIMIT ?
+                ''', (limit,))]
+                conn.executemany('''
+                    UPDATE submission_queue SET state = 'claimed', claimed_by = ?, claimed_at = ?, updated_at = ?
+                    WHERE alpha_id = ?
+                ''', [(self.worker_id, now, now, alpha_id) for alpha_id in alpha_ids])
+                conn.execute('COMMIT')
+                return alpha_ids
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"❌ 认领提交队列时出错: {str(e)}")
+            return []
+
+    def mark_submitted(self, alpha_id):
+        """提交成功"""
+        self._finish(alpha_id, "state = 'submitted', error = NULL")
+
+    def mark_failed(self, alpha_id, error=None):
+        """提交失败，失败次数达到上限时标记为 rejected，否则回到 pending 等待下次认领"""
+        self._finish(alpha_id, '''
+            attempts = attempts + 1,
+            state = CASE WHEN attempts + 1 >= ? THEN 'rejected' ELSE 'pending' END,
+            error = ?
+        ''', (self.max_attempts, error))
+
+    def mark_rejected(self, alpha_id, error=None):
+        """确定无法提交(如本地自相关检查不通过)，不再重试"""
+        self._finish(alpha_id, "state = 'rejected', error = ?", (error,))
+
+    def release(self, alpha_ids):
+        """放弃认领(未尝试提交)，条目回到 pending"""
+        for alpha_id in alpha_ids:
+            self._finish(alpha_id, "state = 'pending'")
+
+    def _finish(self, alpha_id, assignments, params=()):
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(f'''
+                    UPDATE submission_queue
+                    SET {assignments}, claimed_by = NULL, claimed_at = NULL, updated_at = ?
+                    WHERE alpha_id = ?
+                ''', tuple(params) + (self._now(), alpha_id))
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"❌ 更新提交队列时出错: {str(e)}")
+
+    def get_entries(self, state='pending', limit=None):
+        """按加入顺序获取某个状态的条目"""
+        query = 'SELECT alpha_id, expression, attempts, created_at FROM submission_queue WHERE state = ? ORDER BY created_at'
+        params = [state]
+        if limit:
+            query += ' LIMIT ?'
+            params.append(limit)
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                return [
+                    {'alpha_id': row[0], 'expression': row[1], 'attempts': row[2], 'created_at': row[3]}
+                    for row in conn.execute(query, params)
+                ]
+        except Exception as e:
+            print(f"⚠️ 读取提交队列时出错: {str(e)}")
+            return []
+
+    def get_statistics(self):
+        """获取各状态的条目数量"""
+        stats = {state: 0 for state in self.STATES}
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                for state, count in conn.execute('SELECT state, COUNT(*) FROM submission_queue GROUP BY state'):
+                    stats[state] = count
+        except Exception as e:
+            print(f"⚠️ 读取提交队列时出错: {str(e)}")
+        return stats
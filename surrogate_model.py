@@ -0,0 +1,208 @@
+"""代理模型模块 - 用表达式特征预测 Sharpe / Fitness / Turnover，决定候选的模拟顺序"""
+
+import json
+import re
+import sqlite3
+import zlib
+
+import numpy as np
+
+from fastexpr import OPERATOR_ALIASES
+from offline_evaluator import GROUP_NAMES
+
+
+# 只提取特征需要的词法单元: 标识符(含紧随的左括号)、数值和运算符
+_FEATURE_TOKEN = re.compile(r"([A-Za-z_][A-Za-z0-9_.]*)(\s*\()?|(\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+)|(&&|\|\||[-+*/^<>]|[(),])")
+
+
+def _window_bucket(value):
+    """窗口按量级分桶，相近的窗口共享特征"""
+    for bound in (3, 5, 10, 20, 40, 60, 120, 252):
+        if value <= bound:
+            return bound
+    return 'long'
+
+
+class SurrogateModel:
+    """基于哈希特征的贝叶斯线性回归代理模型
+
+    特征包括运算符词袋、父子运算符对、窗口、字段、字段所属数据集、嵌套深度和表达式长度，
+    经哈希映射到固定维数。模型只保存充分统计量(XᵀX、XᵀY、YᵀY)，可以只用新增的
+    历史记录增量训练；预测同时给出均值和标准差(参数不确定性 + 观测噪声)。
+    """
+
+    TARGETS = ('sharpe', 'fitness', 'turnover')
+    # 参数先验精度(岭回归系数)
+    PRIOR_PRECISION = 1.0
+    # 批量预测时每块的候选数量(控制内存)
+    PREDICT_CHUNK = 20000
+
+    def __init__(self, db_file="alpha_history.db", dimensions=512):
+        """初始化代理模型"""
+        self.db_file = db_file
+        self.dimensions = dimensions
+        self.xtx = np.zeros((dimensions, dimensions))
+        self.xty = np.zeros((dimensions, len(self.TARGETS)))
+        self.yty = np.zeros(len(self.TARGETS))
+        self.count = 0
+        self.last_id = 0
+        self.field_datasets = {}
+        self._token_index = {}
+        self._fitted = None
+
+    def __len__(self):
+        return self.count
+
+    def _index(self, token):
+        index = self._token_index.get(token)
+        if index is None:
+            index = self._token_index[token] = zlib.crc32(token.encode('utf-8')) % self.dimensions
+        return index
+
+    def features(self, expression):
+        """提取一个表达式的特征 token 列表"""
+        tokens = ['bias']
+        calls = []
+        depth = max_depth = 0
+        previous = None
+        for name, opening, number, symbol in _FEATURE_TOKEN.findall(expression):
+            if name:
+                if opening:
+                    name = OPERATOR_ALIASES.get(name, name)
+                    tokens.append(f"op:{name}")
+                    if calls:
+                        tokens.append(f"pair:{calls[-1]}>{name}")
+                    calls.append(name)
+                    depth += 1
+                    if depth > max_depth:
+                        max_depth = depth
+                elif name in GROUP_NAMES:
+                    tokens.append(f"group:{name}")
+                else:
+                    tokens.append(f"field:{name}")
+                    dataset = self.field_datasets.get(name)
+                    if dataset:
+                        tokens.append(f"dataset:{dataset}")
+            elif number:
+                if previous == ',' and calls:
+                    tokens.append(f"window:{calls[-1]}:{_window_bucket(float(number))}")
+                else:
+                    tokens.append("const")
+            elif symbol == '(':
+                calls.append('(')
+                depth += 1
+                if depth > max_depth:
+                    max_depth = depth
+            elif symbol == ')':
+                if calls:
+                    calls.pop()
+                depth -= 1
+            elif symbol != ',':
+                tokens.append(f"bin:{symbol}")
+            previous = symbol or None
+        tokens.append(f"depth:{min(max_depth, 8)}")
+        tokens.append(f"length:{min(len(tokens) // 8, 6)}")
+        return tokens
+
+    def featurize(self, expressions):
+        """把表达式列表转换为特征矩阵 (n, dimensions)"""
+        cache = self._token_index
+        flat = []
+        for row, expression in enumerate(expressions):
+            offset = row * self.dimensions
+            for token in self.features(expression):
+                index = cache.get(token)
+                if index is None:
+                    index = self._index(token)
+                flat.append(offset + index)
+        counts = np.bincount(np.asarray(flat, dtype=np.int64), minlength=len(expressions) * self.dimensions)
+        return counts.astype(np.float32).reshape(len(expressions), self.dimensions)
+
+    def load_field_datasets(self):
+        """从数据字段目录读取字段所属的数据集"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                self.field_datasets.update(conn.execute('SELECT field_id, dataset_id FROM datafield_catalog'))
+        except sqlite3.Error:
+            pass
+
+    def update(self, expressions, targets):
+        """用一批 (表达式, [sharpe, fitness, turnover]) 增量训练"""
+        if not len(expressions):
+            return
+        x = self.featurize(expressions).astype(np.float64)
+        y = np.asarray(targets, dtype=np.float64)
+        self.xtx += x.T @ x
+        self.xty += x.T @ y
+        self.yty += (y * y).sum(axis=0)
+        self.count += len(expressions)
+        self._fitted = None
+
+    def train(self):
+        """读取上次训练之后新增的历史记录并增量训练，返回新增的样本数"""
+        self.load_field_datasets()
+        expressions = []
+        targets = []
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                rows = conn.execute(
+                    'SELECT id, expression, metrics FROM alpha_history WHERE id > ? ORDER BY id', (self.last_id,)
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"⚠️ 读取历史记录训练代理模型时出错: {str(e)}")
+            return 0
+
+        for row_id, expression, metrics in rows:
+            self.last_id = max(self.last_id, row_id)
+            try:
+                metrics = json.loads(metrics) if metrics else {}
+                values = [float(metrics[target]) for target in self.TARGETS]
+            except (ValueError, KeyError, TypeError):
+                continue
+            if expression and all(np.isfinite(values)):
+                expressions.append(expression)
+                targets.append(values)
+
+        self.update(expressions, targets)
+        return len(expressions)
+
+    def _fit(self):
+        """求解后验均值、后验协方差和各目标的噪声方差"""
+        if self._fitted is None:
+            precision = self.xtx + self.PRIOR_PRECISION * np.eye(self.dimensions)
+            covariance = np.linalg.inv(precision)
+            weights = covariance @ self.xty
+            residual = self.yty - 2 * (weights * self.xty).sum(axis=0) + (weights * (self.xtx @ weights)).sum(axis=0)
+            noise = np.maximum(residual, 0.0) / max(self.count - 1, 1)
+            self._fitted = (weights.astype(np.float32), covariance.astype(np.float32), np.maximum(noise, 1e-6))
+        return self._fitted
+
+    def predict(self, expressions):
+        """预测每个表达式的指标，返回 (均值, 标准差)，形状均为 (n, 3)，列顺序同 TARGETS"""
+        weights, covariance, noise = self._fit()
+        means = []
+        stds = []
+        for start in range(0, len(expressions), self.PREDICT_CHUNK):
+            x = self.featurize(expressions[start:start + self.PREDICT_CHUNK])
+            means.append(x @ weights)
+            leverage = np.einsum('ij,ij->i', x @ covariance, x)
+            stds.append(np.sqrt(noise[None, :] * (1.0 + leverage[:, None])))
+        if not means:
+            return np.empty((0, len(self.TARGETS))), np.empty((0, len(self.TARGETS)))
+        return np.vstack(means), np.vstack(stds)
+
+    def rank(self, expressions, exploration=1.0, skip_below=None):
+        """按 Sharpe 的乐观估计(均值 + exploration × 标准差)排序
+
+        skip_below: Sharpe 的乐观上界(均值 + 2 × 标准差)低于该值的候选被跳过
+        返回 (排序后保留的表达式, 被跳过的表达式)。
+        """
+        if not expressions:
+            return [], []
+        mean, std = self.predict(expressions)
+        sharpe_mean, sharpe_std = mean[:, 0], std[:, 0]
+        order = np.argsort(-(sharpe_mean + exploration * sharpe_std), kind='stable')
+        if skip_below is None:
+            return [expressions[i] for i in order], []
+        hopeless = sharpe_mean + 2 * sharpe_std < skip_below
+        return [expressions[i] for i in order if not hopeless[i]], [expressions[i] for i in order if hopeless[i]]
@@ -0,0 +1,230 @@
+"""遥测模块 - 计时区间、HDR 风格延迟直方图、带标签的计数器和仪表"""
+
+import functools
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter
+
+
+class LatencyHistogram:
+    """HDR 风格的对数-线性直方图
+
+    以微秒为单位记录，每个 2 的幂区间再等分为 64 个子桶，任何数值的相对误差都小于 1/64，
+    内存只与出现过的桶数有关，适合记录从毫秒到数分钟的延迟。
+    """
+
+    SUB_BUCKET_BITS = 7
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def _bucket(cls, micros):
+        if micros < (1 << cls.SUB_BUCKET_BITS):
+            return micros
+        shift = micros.bit_length() - cls.SUB_BUCKET_BITS
+        return (shift << cls.SUB_BUCKET_BITS) + (micros >> shift)
+
+    @classmethod
+    def _bucket_value(cls, bucket):
+        """桶的代表值(微秒，取桶的中点)"""
+        shift = bucket >> cls.SUB_BUCKET_BITS
+        if shift == 0:
+            return bucket
+        mantissa = bucket & ((1 << cls.SUB_BUCKET_BITS) - 1)
+        return (mantissa << shift) + (1 << (shift - 1))
+
+    def record(self, seconds):
+        """记录一个延迟(秒)"""
+        seconds = max(0.0, seconds)
+        bucket = self._bucket(int(seconds * 1e6))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def merge(self, other):
+        """合并另一个直方图"""
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, p):
+        """第 p 百分位数(秒)，没有数据时返回 None"""
+        if not self.count:
+            return None
+        target = max(1, int(round(self.count * p / 100.0)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return min(max(self._bucket_value(bucket) / 1e6, self.min), self.max)
+        return self.max
+
+    def buckets(self):
+        """按升序返回 [(桶上界秒数, 累计数量)]"""
+        cumulative = 0
+        result = []
+        for bucket in sorted(self.counts):
+            cumulative += self.counts[bucket]
+            shift = bucket >> self.SUB_BUCKET_BITS
+            upper = self._bucket_value(bucket) + (1 << max(shift - 1, 0)) if shift else bucket + 1
+            result.append((upper / 1e6, cumulative))
+        return result
+
+    def count_at_most(self, seconds):
+        """不大于 seconds 的记录数(按桶上界近似)"""
+        total = 0
+        for upper, cumulative in self.buckets():
+            if upper > seconds:
+                break
+            total = cumulative
+        return total
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Telemetry:
+    """线程安全的指标注册表"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空全部指标"""
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+            self.gauges = {}
+            self.started_at = datetime.now()
+
+    def observe(self, name, seconds, **labels):
+        """记录一个延迟"""
+        key = _key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.record(seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """计时区间: with telemetry.span('name'): ...，异常时额外记录 status=error"""
+        start = perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            self.observe(name, perf_counter() - start, status=status, **labels)
+
+    def increment(self, name, value=1, **labels):
+        """计数器加 value"""
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        """设置仪表的当前值"""
+        with self.lock:
+            self.gauges[_key(name, labels)] = value
+
+    def add_gauge(self, name, delta, **labels):
+        """仪表加减 delta(如进行中的任务数)"""
+        key = _key(name, labels)
+        with self.lock:
+            self.gauges[key] = self.gauges.get(key, 0) + delta
+
+    def get_counter(self, name, **labels):
+        with self.lock:
+            return self.counters.get(_key(name, labels), 0)
+
+    def get_histogram(self, name, **labels):
+        """获取直方图；不指定标签时合并该名称下所有标签组合"""
+        merged = LatencyHistogram()
+        with self.lock:
+            for (hist_name, hist_labels), histogram in self.histograms.items():
+                if hist_name == name and (not labels or dict(hist_labels) == {k: str(v) for k, v in labels.items()}):
+                    merged.merge(histogram)
+        return merged
+
+    def items(self):
+        """返回 (直方图, 计数器, 仪表) 的副本，键为 (名称, 标签元组)"""
+        with self.lock:
+            histograms = {}
+            for key, histogram in self.histograms.items():
+                histograms[key] = LatencyHistogram()
+                histograms[key].merge(histogram)
+            return histograms, dict(self.counters), dict(self.gauges)
+
+    def snapshot(self):
+        """返回全部指标的可序列化快照"""
+        with self.lock:
+            def entries(items, render):
+                return [
+                    {'name': name, 'labels': dict(labels), **render(value)}
+                    for (name, labels), value in sorted(items.items())
+                ]
+
+            return {
+                'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S'),
+                'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'histograms': entries(self.histograms, lambda h: h.summary()),
+                'counters': entries(self.counters, lambda v: {'value': v}),
+                'gauges': entries(self.gauges, lambda v: {'value': v}),
+            }
+
+    def dump_json(self, path):
+        """把快照写入 JSON 文件"""
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"⚠️ 写入遥测数据时出错: {str(e)}")
+
+
+# 进程内共享的默认注册表
+telemetry = Telemetry()
+
+
+def timed(name):
+    """装饰器: 用计时区间包裹函数调用"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with telemetry.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator